@@ -1,9 +1,12 @@
 import os
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
-import ast
 import subprocess
 import json
+import hashlib
+import pyarrow as pa
+import pyarrow.feather as feather
 import time
 import requests
 import mimetypes
@@ -15,6 +18,15 @@ from typing import Dict, List
 # 将根目录添加到系统路径中
 sys.path.append(os.getcwd())
 from global_utils import ROOT_PATH, logger, GlobalUtils
+from scraping.dataset import (
+    dataset_path,
+    list_column,
+    load_dataset,
+    partition_files,
+    size_mb,
+)
+from scraping.normalize import build_tags
+from scraping.tag_index import TagIndex, parse_tag_lists, tags_path
 
 
 ANAL_PATH = os.path.join(ROOT_PATH, "analysis")
@@ -31,6 +43,17 @@ DEFAULT_WEIGHTS: Dict[str, int] = {
     "comment": 1,
 }
 
+# DataHandler.score_profiles 对各项指标的归一化方法：
+# raw 原值，zscore 标准分，log1p 取 log(1 + x)，rank 在同一UP主的视频中的百分位排名
+NORMALIZATIONS: List[str] = ["raw", "zscore", "log1p", "rank"]
+
+DETAIL_PATH = Path(ANAL_PATH).parent / "scraping" / "res" / "detail.csv"
+
+# DataHandler.parse 的缓存文件后缀：detail.csv -> detail.csv.cache.feather
+CACHE_SUFFIX = ".cache.feather"
+# 缓存格式的版本，修改 DataHandler.parse 的解析规则（列、类型、去重等）后加一，旧缓存随之失效
+CACHE_VERSION = 1
+
 DETAIL_KEYS: List[str] = [
     "pubtime",
     "duration",
@@ -51,20 +74,36 @@ class DataHandler:
     Functions:
     - get_detail: 获取视频信息
     - parse: 解析csv文件
+    - compare_formats: 比较读取csv文件与Parquet数据集的耗时和文件大小
+    - get_tags: 获取字典编码的标签及其倒排索引
     - are_relavant: 计算数据每两列之间的相关性
     - get_tops: 获取top视频数据
+    - check_weights: 检查权重键和值的有效性
+    - score: 计算所有视频的加权得分
     - top_video:根据权重筛选特定UP主的顶级视频，根据权重排序并返回。
+    - top_videos: 一次计算所有视频的得分，为每个UP主选出得分最高的若干个视频
+    - select_top: 按uid分组，部分选择每组得分最高的若干行
+    - top_positions: 对多组得分同时按uid分组部分选择，返回选出的行的位置
+    - normalize_metrics: 按指定方法归一化各项指标
+    - score_profiles: 用一次矩阵乘法计算多个权重方案下所有视频的得分
+    - top_profiles: 每个权重方案下每个UP主得分最高的若干个视频
     """
 
-    def get_detail() -> DataFrame:
-        """获取视频信息"""
-        # 使用 Path 构建路径
-        detail_path = Path(ANAL_PATH).parent / "scraping" / "res" / "detail.csv"
+    def get_detail(cache: bool = True) -> DataFrame:
+        """
+        获取视频信息，优先读取与 detail.csv 同名的 Parquet 数据集，不需要再解析各列
+
+        - Args:
+            - cache: 读取 detail.csv 时是否使用同目录下的缓存文件，见 parse
+        """
+        detail_path = DETAIL_PATH
 
-        if not os.path.exists(detail_path):
+        if partition_files(dataset_path(detail_path)):
+            detail = load_dataset(dataset_path(detail_path))
+        elif not os.path.exists(detail_path):
             raise FileNotFoundError("视频信息不存在")
         else:
-            detail = DataHandler.parse(detail_path)
+            detail = DataHandler.parse(detail_path, cache)
 
         return detail
 
@@ -95,8 +134,21 @@ class DataHandler:
         # 对于不支持的类型，返回原始序列
         return data
 
-    def parse(path: str) -> DataFrame:
-        """解析csv文件"""
+    def parse(path: str, cache: bool = True) -> DataFrame:
+        """
+        解析csv文件
+
+        - Args:
+            - path: csv文件的路径
+            - cache: 是否使用同目录下的缓存文件，源文件未变化时直接读取已解析的结果
+        """
+        if cache:
+            detail = ParseCache.load(path)
+            if detail is not None:
+                return detail
+            # 在读取前记录源文件的指纹，解析期间源文件被修改时，下次读取会重新解析
+            fingerprint = ParseCache.fingerprint(path)
+
         # 定义数据类型
         dtypes = {
             "bv": str,
@@ -116,27 +168,102 @@ class DataHandler:
             "pubtime"
         ]  # 'duration' 列可能需要额外处理，因为它不是标准的日期时间格式
 
+        # 写入视频信息时同时写入了标签表，从标签表按BV号取标签，不再读取和切分标签字符串
+        tag_table = tags_path(path)
+        skipped = ["Unnamed: 0"]
+        if TagIndex.exists(tag_table):
+            skipped.append("tags")
+
         # 读取CSV文件，同时指定需要跳过的列
         detail = pd.read_csv(
             path,
             dtype=dtypes,
             parse_dates=parse_dates,
-            usecols=lambda x: x not in ["Unnamed: 0"],
+            usecols=lambda x: x not in skipped,
         )
+        # 重爬的视频追加在文件末尾，同一个视频保留最后一条
+        if "bv" in detail.columns:
+            detail = detail[~detail["bv"].duplicated(keep="last")].reset_index(
+                drop=True
+            )
 
         # 对于非标准的日期时间格式（如 'duration' 列），需要进行额外的处理
         # 如果 'duration' 是以 'HH:MM:SS' 格式存储的，将其转换为 timedelta 类型
         if "duration" in detail.columns:
             detail["duration"] = pd.to_timedelta(detail["duration"].fillna("00:00:00"))
 
-        # 转换 'tags' 列中的字符串表示为列表
-        if "tags" in detail.columns:
-            detail["tags"] = detail["tags"].apply(
-                lambda x: ast.literal_eval(x) if pd.notnull(x) else []
-            )
+        # 转换 'tags' 列中的字符串表示为列表，只切分不重复的字符串，不再逐行 literal_eval
+        if "tags" in skipped:
+            detail["tags"] = TagIndex.load(tag_table).to_lists(detail["bv"])
+        elif "tags" in detail.columns:
+            detail["tags"] = parse_tag_lists(detail["tags"])
 
+        if cache:
+            ParseCache.save(path, detail, fingerprint)
         return detail
 
+    def get_tags(detail_path: str = DETAIL_PATH) -> TagIndex:
+        """
+        获取字典编码的标签：标签字典、(bv, uid, tag_id) 表和标签到视频的倒排索引。
+        标签表保存在 detail_tags 目录中，由写入视频信息的 append_detail 同时追加；
+        没有标签表时（如本功能之前爬取的视频信息）由视频信息构建一次
+
+        Example:
+            >>> tags = DataHandler.get_tags()
+            >>> tags.videos("日常", uid="304578055")  # 用户 304578055 带有“日常”标签的视频
+        """
+        path = tags_path(detail_path)
+        if TagIndex.exists(path):
+            return TagIndex.load(path)
+
+        dataset = dataset_path(detail_path)
+        if os.path.exists(detail_path):
+            # 标签列保持字符串，由 TagIndex 直接切分
+            return build_tags(detail_path)
+        if not partition_files(dataset):
+            raise FileNotFoundError("视频信息不存在")
+        tags = TagIndex.from_detail(
+            load_dataset(dataset, columns=["bv", "uid", "tags"])
+        )
+        tags.save(path)
+        return tags
+
+    def compare_formats(detail_path: str, repeat: int = 3) -> DataFrame:
+        """
+        比较 parse 读取csv文件与 load_dataset 读取同名Parquet数据集的耗时和文件大小
+
+        Args:
+            detail_path (str): csv文件的路径，数据集为同名目录，可由 scraping.dataset.import_csv 生成
+            repeat (int): 每种格式读取的次数，取最短的耗时
+
+        Returns:
+            DataFrame: 每种格式一行，包括视频数、大小（MB）、最短读取耗时（秒）和文件数
+        """
+        path = dataset_path(detail_path)
+        rows = []
+        for name, source, load in [
+            ("csv", detail_path, lambda: DataHandler.parse(detail_path, cache=False)),
+            ("parquet", path, lambda: load_dataset(path)),
+        ]:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                detail = load()
+                timings.append(time.perf_counter() - start)
+            rows.append(
+                {
+                    "format": name,
+                    "rows": len(detail),
+                    "mb": size_mb(source),
+                    "seconds": min(timings),
+                    "files": 1 if name == "csv" else len(partition_files(path)),
+                }
+            )
+
+        report = DataFrame(rows).set_index("format")
+        logger.info(f"csv文件与Parquet数据集的对比：\n{report.to_string()}")
+        return report
+
     def are_relevant(data: pd.DataFrame, columns: list[str]) -> dict[str, DataFrame]:
         """
         计算 DataFrame 中指定列之间的相关性。
@@ -201,6 +328,21 @@ class DataHandler:
 
         return res
 
+    def check_weights(weights: dict[str, int]):
+        """确保权重键和值的有效性：键与 DEFAULT_WEIGHTS 相同，值在1到10之间"""
+        expected_keys = set(DEFAULT_WEIGHTS.keys())
+        if not weights.keys() == expected_keys or not all(
+            1 <= w <= 10 for w in weights.values()
+        ):
+            raise ValueError("权重键或值无效。")
+
+    def score(detail: pd.DataFrame, weights: dict[str, int]) -> pd.Series:
+        """所有视频的加权得分，指标缺失的视频得分为缺失值"""
+        total_weight = sum(weights.values())
+        return sum(
+            (detail[key] * (weight / total_weight) for key, weight in weights.items())
+        )
+
     def top_video(
         uid: str, detail: pd.DataFrame, weights: dict[str, int] = DEFAULT_WEIGHTS
     ) -> pd.DataFrame:
@@ -216,25 +358,315 @@ class DataHandler:
             DataFrame: 根据权重排序的视频信息DataFrame。
         """
 
-        # 确保权重键和值的有效性
-        expected_keys = set(DEFAULT_WEIGHTS.keys())
-        if not weights.keys() == expected_keys or not all(
-            1 <= w <= 10 for w in weights.values()
-        ):
-            raise ValueError("权重键或值无效。")
+        DataHandler.check_weights(weights)
 
-        # 筛选指定UID的视频
+        # 筛选指定UID的视频，得分写入副本而不是原数据的切片
         uid_data = detail[detail["uid"] == uid]
-
-        # 计算加权得分
-        total_weight = sum(weights.values())
-        uid_data["score"] = sum(
-            (uid_data[key] * (weight / total_weight) for key, weight in weights.items())
-        )
+        uid_data = uid_data.assign(score=DataHandler.score(uid_data, weights))
 
         # 根据得分排序并返回结果
         return uid_data.sort_values(by="score", ascending=False).reset_index(drop=True)
 
+    def top_videos(
+        detail: pd.DataFrame, top: int = 5, weights: dict[str, int] = DEFAULT_WEIGHTS
+    ) -> dict[str, DataFrame]:
+        """
+        一次计算所有视频的加权得分，为每个UP主选出得分最高的 top 个视频。
+        结果与对每个UP主调用 top_video(...).head(top) 相同，得分相同的视频按原顺序排列，
+        但不需要为每个UP主筛选整个表，也不需要对每个UP主的全部视频排序
+
+        - Args:
+            - detail: 视频信息
+            - top: 每个UP主保留的视频数
+            - weights: 各项指标的权重，权重值应在1到10之间
+
+        - Returns:
+            - dict[str, DataFrame]: 键为uid（按在 detail 中首次出现的顺序），
+                值为得分从高到低排列的视频信息，带有 score 列
+        """
+
+        DataHandler.check_weights(weights)
+        score = DataHandler.score(detail, weights)
+        return DataHandler.select_top(detail, score, top)
+
+    def select_top(
+        detail: pd.DataFrame, score: pd.Series, top: int
+    ) -> dict[str, DataFrame]:
+        """
+        按 uid 分组，在每组中选出 score 最高的 top 行，缺失的得分排在最后
+
+        - Returns:
+            - dict[str, DataFrame]: 键为uid，值为带有 score 列的选出的行
+        """
+
+        keys = score.to_numpy(dtype="float64", na_value=-np.inf)
+        uids, positions, bounds = DataHandler.top_positions(
+            detail["uid"], keys[:, None], top
+        )
+        positions = positions[0]
+        tops = detail.iloc[positions].assign(score=score.iloc[positions].array)
+        return {
+            uid: tops.iloc[bounds[i] : bounds[i + 1]].reset_index(drop=True)
+            for i, uid in enumerate(uids)
+        }
+
+    def top_positions(
+        uid: pd.Series, keys: np.ndarray, top: int
+    ) -> tuple[pd.Index, np.ndarray, np.ndarray]:
+        """
+        对 keys 的每一列（如每个权重方案的得分）按 uid 分组选出最大的 top 行。
+        各组的行按 uid 编码稳定排序后相邻，组内只做部分选择（np.partition），
+        再对选出的 top 行排序；值相同的行按原顺序排列，所有列在同一次遍历中完成
+
+        - Args:
+            - uid: 每行的uid
+            - keys: (行数, 列数) 的数组，不能含有缺失值（缺失的得分记为 -inf）
+            - top: 每组保留的行数
+
+        - Returns:
+            - Index: uid，按首次出现的顺序
+            - ndarray: (列数, 选出的行数) 的行位置，第 j 行为第 j 列选出的行
+            - ndarray: 第 i 个uid选出的行位于 [bounds[i], bounds[i + 1])，各列相同
+        """
+
+        top = max(int(top), 0)
+        codes, uids = pd.factorize(uid)
+        # 第 i 组的行位于 order 的 offsets[i] 到 offsets[i + 1]，组内保持原顺序
+        order = np.argsort(codes, kind="stable")
+        offsets = np.searchsorted(codes[order], np.arange(len(uids) + 1))
+
+        selected = []
+        for i in range(len(uids)):
+            rows = order[offsets[i] : offsets[i + 1] if top else offsets[i]]
+            group = keys[rows]
+            # 每列选出的行在组内的下标，形状为 (列数, 选出的行数)
+            index = np.broadcast_to(np.arange(len(rows)), (keys.shape[1], len(rows)))
+            if len(rows) > top:
+                # 第 top 大的值：大于它的全部保留，等于它的按原顺序补足 top 个
+                kth = np.partition(group, len(rows) - top, axis=0)[len(rows) - top]
+                above = group > kth
+                ties = group == kth
+                room = top - above.sum(axis=0)
+                keep = above | (ties & (np.cumsum(ties, axis=0) <= room))
+                index = np.nonzero(keep.T)[1].reshape(keys.shape[1], top)
+            values = np.take_along_axis(group.T, index, axis=1)
+            index = np.take_along_axis(index, np.lexsort((index, -values)), axis=1)
+            selected.append(rows[index])
+
+        positions = (
+            np.concatenate(selected, axis=1)
+            if selected
+            else np.empty((keys.shape[1], 0), dtype=int)
+        )
+        bounds = np.cumsum([0] + [rows.shape[1] for rows in selected])
+        return uids, positions, bounds
+
+    def normalize_metrics(
+        detail: pd.DataFrame, normalize: str | dict[str, str] = "raw"
+    ) -> np.ndarray:
+        """
+        按 DEFAULT_WEIGHTS 的顺序取出各项指标并归一化，缺失值保持为 NaN
+
+        - Args:
+            - normalize: NORMALIZATIONS 之一，应用于所有指标；
+                或 {指标: 方法}，未指定的指标使用原值
+
+        - Returns:
+            - ndarray: (视频数, 指标数) 的矩阵
+        """
+
+        keys = list(DEFAULT_WEIGHTS.keys())
+        methods = (
+            {key: normalize for key in keys}
+            if isinstance(normalize, str)
+            else {**{key: "raw" for key in keys}, **normalize}
+        )
+        if methods.keys() != set(keys) or not all(
+            method in NORMALIZATIONS for method in methods.values()
+        ):
+            raise ValueError(f"归一化方法无效：{normalize}")
+
+        metrics = np.column_stack(
+            [detail[key].to_numpy(dtype="float64", na_value=np.nan) for key in keys]
+        )
+        for j, key in enumerate(keys):
+            if methods[key] == "zscore":
+                column = metrics[:, j]
+                std = np.nanstd(column) if len(column) else 0
+                metrics[:, j] = (
+                    (column - np.nanmean(column)) / std if std > 0 else column * 0
+                )
+            elif methods[key] == "log1p":
+                metrics[:, j] = np.log1p(metrics[:, j])
+
+        # 百分位排名在同一UP主的视频中计算，所有需要排名的指标一起分组
+        ranked = [j for j, key in enumerate(keys) if methods[key] == "rank"]
+        if ranked:
+            metrics[:, ranked] = (
+                DataFrame(metrics[:, ranked])
+                .groupby(detail["uid"].to_numpy())
+                .rank(pct=True)
+                .to_numpy(dtype="float64")
+            )
+        return metrics
+
+    def score_profiles(
+        detail: pd.DataFrame,
+        profiles: dict[str, dict[str, int]] | DataFrame,
+        normalize: str | dict[str, str] = "raw",
+    ) -> DataFrame:
+        """
+        计算多个权重方案下所有视频的得分：(视频数 × 指标数) @ (指标数 × 方案数)，
+        方案数对耗时几乎没有影响。raw 方法下每个方案的得分与 score 相同（至多相差浮点舍入误差）
+
+        - Args:
+            - detail: 视频信息
+            - profiles: {方案名: 权重} 或以方案名为索引、指标为列的 DataFrame，
+                每个方案的权重键与 DEFAULT_WEIGHTS 相同，值在1到10之间
+            - normalize: 各项指标的归一化方法，见 normalize_metrics
+
+        - Returns:
+            - DataFrame: 索引与 detail 相同，每列为一个方案的得分
+        """
+
+        profiles = (
+            profiles
+            if isinstance(profiles, DataFrame)
+            else DataFrame.from_dict(profiles, orient="index")
+        )
+        for weights in profiles.to_dict(orient="index").values():
+            DataHandler.check_weights(weights)
+
+        # 每个方案的权重除以其总和，形状为 (指标数, 方案数)
+        weights = profiles[list(DEFAULT_WEIGHTS.keys())].to_numpy(dtype="float64")
+        weights = (weights / weights.sum(axis=1, keepdims=True)).T
+        scores = DataHandler.normalize_metrics(detail, normalize) @ weights
+        return DataFrame(scores, index=detail.index, columns=profiles.index)
+
+    def top_profiles(
+        detail: pd.DataFrame,
+        profiles: dict[str, dict[str, int]] | DataFrame,
+        top: int = 5,
+        normalize: str | dict[str, str] = "raw",
+    ) -> DataFrame:
+        """
+        每个权重方案下每个UP主得分最高的 top 个视频，所有方案的得分和选择各只做一次。
+        只有一个方案且 normalize 为 raw 时，结果与 top_videos 相同
+        （得分仅差舍入误差的视频之间顺序可能不同）
+
+        - Args:
+            - detail: 视频信息
+            - profiles: 权重方案，见 score_profiles
+            - top: 每个方案下每个UP主保留的视频数
+            - normalize: 各项指标的归一化方法，见 normalize_metrics
+
+        - Returns:
+            - DataFrame: 每行为一个方案下的一个视频，列为 profile、rank（从1开始）、
+                detail 的各列和 score；按方案、uid（按首次出现的顺序）和名次排列
+        """
+
+        scores = DataHandler.score_profiles(detail, profiles, normalize)
+        keys = np.nan_to_num(scores.to_numpy(), nan=-np.inf)
+        _, positions, bounds = DataHandler.top_positions(detail["uid"], keys, top)
+
+        n_profiles, n_selected = positions.shape
+        ranks = np.arange(n_selected) - np.repeat(bounds[:-1], np.diff(bounds)) + 1
+        tops = detail.iloc[positions.ravel()].reset_index(drop=True)
+        tops.insert(0, "profile", np.repeat(scores.columns.to_numpy(), n_selected))
+        tops.insert(1, "rank", np.tile(ranks, n_profiles))
+        tops["score"] = np.take_along_axis(
+            scores.to_numpy(), positions.T, axis=0
+        ).T.ravel()
+        return tops
+
+
+class ParseCache:
+    """
+    DataHandler.parse 结果的缓存：与csv文件同目录的 Feather 文件，保存解析后的各列类型。
+    以缓存格式的版本和源文件的大小、修改时间、内容哈希为键，源文件或解析规则变化后重新解析。
+
+    Functions:
+    - cache_path: 缓存文件的路径
+    - fingerprint: 缓存格式的版本和源文件的大小、修改时间、内容哈希
+    - load: 读取缓存，缓存不存在或源文件已变化时返回None
+    - save: 保存解析结果
+    """
+
+    def cache_path(path: str) -> str:
+        return f"{path}{CACHE_SUFFIX}"
+
+    def content_hash(path: str) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def fingerprint(path: str) -> dict:
+        stat = os.stat(path)
+        return {
+            "version": CACHE_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": ParseCache.content_hash(path),
+        }
+
+    def load(path: str) -> DataFrame | None:
+        """
+        大小和修改时间都未变化时直接读取缓存；只有修改时间变化（如文件被重新复制）时，
+        比较内容哈希，内容未变化则仍然使用缓存，并更新缓存中的修改时间
+        """
+        cache = ParseCache.cache_path(path)
+        if not os.path.exists(cache):
+            return None
+        try:
+            with pa.OSFile(cache) as source:
+                reader = pa.ipc.open_file(source)
+                saved = json.loads(reader.schema.metadata[b"fingerprint"])
+                stat = os.stat(path)
+                if saved.get("version") != CACHE_VERSION:
+                    return None
+                if saved["size"] != stat.st_size:
+                    return None
+                touched = saved["mtime_ns"] != stat.st_mtime_ns
+                if touched and saved["hash"] != ParseCache.content_hash(path):
+                    return None
+                table = reader.read_all()
+            saved["mtime_ns"] = stat.st_mtime_ns
+        except Exception as e:
+            logger.debug(f"读取缓存 {cache} 时发生错误：{e}")
+            return None
+
+        # 列表列转换为 Python 列表，与解析csv文件的结果一致
+        lists = [
+            name
+            for name, kind in zip(table.column_names, table.schema.types)
+            if pa.types.is_list(kind)
+        ]
+        detail = table.drop_columns(lists).to_pandas()
+        for name in lists:
+            detail[name] = list_column(table[name])
+        detail = detail[table.column_names]
+        if touched:
+            ParseCache.save(path, detail, saved)
+        return detail
+
+    def save(path: str, detail: DataFrame, fingerprint: dict):
+        """写入临时文件后再替换，其他进程不会读到写了一半的缓存"""
+        cache = ParseCache.cache_path(path)
+        temp = f"{cache}.tmp"
+        try:
+            table = pa.Table.from_pandas(detail, preserve_index=False)
+            metadata = {
+                **table.schema.metadata,
+                b"fingerprint": json.dumps(fingerprint),
+            }
+            feather.write_feather(table.replace_schema_metadata(metadata), temp)
+            os.replace(temp, cache)
+        except Exception as e:
+            # 缓存写入失败不影响解析结果
+            logger.debug(f"写入缓存 {cache} 时发生错误：{e}")
+
 
 class FileSystemOperator:
     """
@@ -6,7 +6,7 @@ from global_utils import logger
 from analysis.analysis_utils import (
     DataHandler,
     FileSystemOperator,
-)  # get_detail, top_video, ANAL_PATH, make_directory
+)  # get_detail, top_videos, ANAL_PATH, make_directory
 from pandas import DataFrame
 
 
@@ -35,26 +35,19 @@ def get_top(
         - DataFrame: up主的top视频
     """
 
-    # 获取up主id
-    uids = detail["uid"].unique()
+    # 一次计算所有视频的得分，为每个up主选出top视频；若用户未指定权重，则使用默认权重
+    res: dict[str, DataFrame] = (
+        DataHandler.top_videos(detail, top, weights)
+        if weights
+        else DataHandler.top_videos(detail, top)
+    )  # 保存结果，key为up主id，value为top视频
 
-    res: dict[str, DataFrame] = {}  # 保存结果，key为up主id，value为top视频
-
-    for uid in uids:
-        # 计算top视频
-        tops: DataFrame = (
-            DataHandler.top_video(uid, detail, weights)
-            if weights
-            else DataHandler.top_video(uid, detail)  # 若用户未指定权重，则使用默认权重
-        )
-        # 保存top视频
-        res[uid] = tops.head(top)
-
-        if save:
+    if save:
+        for uid, tops in res.items():
             # 保存top视频 创建文件夹
             path = FileSystemOperator.make_result_directory(uid, "top")
             # 保存top视频
-            res[uid].to_csv(f"{path}\\top.csv")
+            tops.to_csv(f"{path}\\top.csv")
             logger.info(f"up主{uid}的top视频已保存在{path}/top.csv")
 
     return res
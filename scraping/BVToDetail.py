@@ -4,55 +4,92 @@ import os
 sys.path.append(os.getcwd())
 from global_utils import logger
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from pandas import DataFrame
-from scraping.scraping_utils import (
-    monitor_verification_window,
-    wait,
-    convert_to_int,
-    SCRP_PATH,
-    DRIVER_PATH,
+from scraping.scraping_utils import SCRP_PATH
+from scraping.detail_backends import (
+    DetailBackend,
+    SeleniumBackend,
+    UselessVideoError,
+    FetchError,
 )
+from scraping.records import RecordBuffer, VideoRecord
+from scraping.normalize import append_detail, normalize_detail
+from scraping.frontier import Frontier
 import pandas as pd
-import threading
-from datetime import datetime
-from typing import Optional
+from queue import Queue
+from typing import Iterator, Optional
 
 
-def format_duration(duration: str, logger=logger):
-    """将时长格式化为 HH:MM:SS"""
-    parts = duration.split(":")
-    if len(parts) == 2:
-        # 如果是MM:SS格式，添加小时部分
-        return "00:" + duration
-    elif len(parts) == 3:
-        # 如果已经是HH:MM:SS格式，直接返回
-        return duration
-    else:
-        logger.warning(f"未知的时长格式：{duration}")
-        # 如果格式未知，返回原始数据或者一个默认值
-        return duration  # 或者 '00:00:00'
+# 不存在或不具备可比性的视频，正式爬取时不再爬取
+USELESS_PATH = f"{SCRP_PATH}\\useless.csv"
+
 
+def to_useless(bv: str, path: str = USELESS_PATH):
+    useless = DataFrame(columns=["bv"])
+    useless.loc[0] = bv
+    header = not os.path.exists(path)
+    useless.to_csv(path, mode="a", header=header)
+
+
+def fetch_one(
+    backend: DetailBackend,
+    uid: str,
+    bv: str,
+    frontier: Optional[Frontier] = None,
+    raise_errors: bool = False,
+    useless_path: str = USELESS_PATH,
+) -> VideoRecord | None:
+    """
+    获取单个视频的详情，视频不存在时写入useless.csv，获取失败时返回None
+    浏览器崩溃等其他异常会继续抛出，由调用方决定是否重启浏览器
 
-def format_pubtime(pubtime: str, logger=logger) -> str:
-    """将发布时间格式化为 YYYY-MM-DD HH:MM:SS"""
-    # 检查格式是否一致，若一致则直接返回
+    - frontier: Frontier - 若传入，则同时在爬取队列中记录视频不存在或获取失败
+    - raise_errors: bool - 获取失败时记录后继续抛出 FetchError，而不是返回None，
+        供限速器把失败（如被限流）计入错误率
+    - useless_path: str - 不存在的视频写入的文件
+    """
     try:
-        datetime.strptime(pubtime, "%Y-%m-%d %H:%M:%S")
-        return pubtime
-    except ValueError:
-        logger.warning(f"未知的发布时间格式：{pubtime}")
-        return pubtime
+        data = backend.fetch(uid, bv)
+    except UselessVideoError as e:
+        logger.info(e)
+        # 将BV号写入useless.csv文件，下次不再爬取该视频信息
+        to_useless(bv, useless_path)
+        if frontier is not None:
+            frontier.mark_useless(uid, bv)
+        return None
+    except FetchError as e:
+        logger.error(e)
+        if frontier is not None:
+            frontier.mark_failed(uid, bv)
+        if raise_errors:
+            raise
+        return None
 
+    logger.info(f"已获取视频 {bv} 的信息：{data}")
+    return data
 
-def to_useless(bv: str):
-    useless = DataFrame(columns=["bv"])
-    useless.loc[0] = bv
-    header = not os.path.exists(f"{SCRP_PATH}\\useless.csv")
-    useless.to_csv(f"{SCRP_PATH}\\useless.csv", mode="a", header=header)
+
+def iter_details(
+    df: DataFrame, backend: DetailBackend, frontier: Optional[Frontier] = None
+) -> Iterator[VideoRecord]:
+    """
+    逐个获取视频详情，每获取一个视频立即产出，不在内存中积攒结果
+
+    - df: DataFrame - 包含BV号的DataFrame，列名为uid，每列包含一个用户的所有BV号
+    - backend: DetailBackend - 抓取后端
+    - frontier: Frontier - 若传入，则同时在爬取队列中记录视频不存在或获取失败
+    """
+    # 遍历每一列
+    for uid in df.columns:
+        # 遍历每一行
+        for bv in df[uid].dropna():
+            try:
+                data = fetch_one(backend, uid, bv, frontier)
+            except Exception as e:
+                logger.error(f"发生错误：{e}，相关视频：{bv}")
+                continue
+            if data is not None:
+                yield data
 
 
 def bv_to_detail(
@@ -60,6 +97,11 @@ def bv_to_detail(
     driver: Optional[webdriver.Chrome],
     output_size=20,
     multi: bool = False,
+    backend: Optional[DetailBackend] = None,
+    lean: bool = True,
+    navigation: str = "direct",
+    extraction: str = "network",
+    output_queue: Optional[Queue] = None,
 ) -> DataFrame | None:
     """
     通过BV号获取视频详情：标题、发布时间、播放量、弹幕数、评论数、收藏数、点赞数、硬币数、分享数、标签
@@ -69,243 +111,62 @@ def bv_to_detail(
         - 若为单线程模式，则可以传入一个ChromeDriver实例，也可以不传入
     - output_size: int - 代表‘单线程’模式下，每凑够多少条数据就写入一次文件，即分批次写入
     - multi: bool - 是否为‘多线程’模式
+    - backend: DetailBackend - 抓取后端，若为None则使用driver创建浏览器后端，
+        传入的后端由调用方负责关闭
+    - lean: bool - driver为None时，新建的浏览器是否使用精简模式（无头、屏蔽图片和媒体）
+    - navigation: str - 浏览器后端的导航方式，'direct' 直接打开视频页，'search' 经由搜索页
+    - extraction: str - 浏览器后端的提取方式，'network' 读取页面的接口响应，'dom' 解析页面元素
+    - output_queue: Queue - ‘多线程’模式下，若传入则每获取一个视频立即放入该队列，交给写入线程，
+        函数返回None；否则积攒整块结果后返回DataFrame
     """
 
-    if driver is None:
-        # 创建一个ChromeDriver实例
-        cService = webdriver.ChromeService(executable_path=DRIVER_PATH)
-        driver = webdriver.Chrome(service=cService)
-
-    # 创建 Event 对象
-    stop_event = threading.Event()
-    # 创建并启动监控线程
-    monitor_thread = threading.Thread(
-        target=monitor_verification_window, args=(driver, stop_event)
-    )
-    monitor_thread.start()
+    # 未指定抓取后端时使用浏览器后端，并由本函数负责关闭
+    own_backend = backend is None
+    if own_backend:
+        backend = SeleniumBackend(driver, lean, navigation, extraction)
 
-    data_list = []
-    # 遍历每一列
-    for uid in df.columns:
-        # 遍历每一行
-        for bv in df[uid].dropna():
-            if pd.isna(bv):
-                # 如果是空值，则跳过
-                continue
-            url = f"https://search.bilibili.com/all?keyword={bv}"
-            driver.get(url)
-
-            # 等待页面加载完成
-            wait(driver)
-
-            element = driver.find_element(By.CLASS_NAME, "vui_tabs--nav-num")
-            if element.text == "0":
-                logger.info(f"视频 {bv} 不存在，可能是因为该视频已被删除")
-                # 将BV号写入useless.csv文件，下次不再爬取该视频信息
-                to_useless(bv)
+    # 列式缓冲区，写入文件或返回时才转换为 DataFrame
+    buffer = RecordBuffer()
+    try:
+        for data in iter_details(df, backend):
+            if multi and output_queue is not None:
+                # 逐条交给写入线程，中途崩溃最多丢失正在获取的一条
+                output_queue.put(data)
                 continue
 
-            # 时长
-            duration = driver.find_element(
-                By.XPATH, '//span[contains(@class, "bili-video-card__stats__duration")]'
-            ).text
-            duration = format_duration(duration)
-
-            # 定位视频链接
-            link = driver.find_element(
-                By.XPATH,
-                f'//a[contains(@class, "col_3") and contains(@href, "{bv}")]',
-            )
-            link.click()
-            wait(driver)
-
-            # 切换句柄
-            handles = driver.window_handles
-            driver.switch_to.window(handles[-1])
-
-            # 增加等待，等待元素出现
-            try:
-                # 播放量
-                click = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (
-                            By.XPATH,
-                            '//span[contains(@class, "view") and contains(@class, "item")]',
-                        )
-                    )
-                )
-                click = click.text
-                click = convert_to_int(click)
-
-                # 弹幕数
-                bullet = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (
-                            By.XPATH,
-                            '//span[contains(@class, "dm") and contains(@class, "item")]',
-                        )
-                    )
-                )
-                bullet = bullet.text
-                bullet = convert_to_int(bullet)
-
-                # 标题
-                title = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, '//h1[contains(@class, "video-title")]')
-                    )
-                )
-                title = title.text
-
-                # 发布时间
-                pubtime = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, '//span[contains(@class, "pubdate-text")]')
-                    )
-                )
-                pubtime = pubtime.text
-                pubtime = format_pubtime(pubtime)
-
-                # 点赞
-                like = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, '//span[contains(@class, "video-like-info")]')
-                    )
-                )
-                like = like.text
-                like = convert_to_int(like)
-
-                # 硬币
-                coin = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, '//span[contains(@class, "video-coin-info")]')
-                    )
-                )
-                coin = coin.text
-                coin = convert_to_int(coin)
-
-                # 收藏
-                favorite = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, '//span[contains(@class, "video-fav-info")]')
-                    )
-                )
-                favorite = favorite.text
-                favorite = convert_to_int(favorite)
-
-                # 分享
-                share = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, '//span[contains(@class, "video-share-info-text")]')
-                    )
-                )
-                share = share.text
-                share = convert_to_int(share)
-
-                # 评论
-                comment = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, '//span[contains(@class, "total-reply")]')
-                    )
-                )
-                comment = comment.text
-                comment = convert_to_int(comment)
-
-                # 标签
-                tag_links = WebDriverWait(driver, 10).until(
-                    EC.presence_of_all_elements_located(
-                        (By.XPATH, '//a[contains(@class, "tag-link")]')
-                    )
-                )
-                tags = [tag.text for tag in tag_links if tag.text != ""]
-
-            except NoSuchElementException as e:
-                logger.error(f"无法找到元素：{e}，相关视频：{bv}")
-            except TimeoutException as e:
-                logger.error(f"加载超时：{e}，相关视频：{bv}")
-                rating_element = driver.find_element(
-                    By.XPATH, '//div[@class="mediainfo_ratingText__N8GtM"]'
-                )
-                if rating_element:
-                    # 如果存在评分元素，则说明该视频为番剧视频
-                    # 将BV号写入useless.csv文件，下次不再爬取该视频信息
-                    to_useless(bv)
-
-                    logger.info(f"视频 {bv} 为番剧视频，数据不存在可比性，类似性，跳过")
-                    # 关闭当前标签页
-                    driver.close()
-                    # 切换句柄
-                    handles = driver.window_handles
-                    driver.switch_to.window(handles[0])
-                    continue
-
-            except Exception as e:
-                logger.error(f"发生错误：{e}，相关视频：{bv}")
-
-            # 将数据写入字典
-            data = {
-                "uid": uid,
-                "bv": bv,
-                "title": title,
-                "duration": duration,
-                "pubtime": pubtime,
-                "click": click,
-                "bullet": bullet,
-                "like": like,
-                "coin": coin,
-                "favorite": favorite,
-                "share": share,
-                "comment": comment,
-                "tags": tags,
-            }
-            # 将数据添加到列表中
-            data_list.append(data)
-            logger.info(f"已获取视频 {bv} 的信息：{data}")
+            # 将数据添加到缓冲区中
+            buffer.append(data)
 
             if not multi:
                 # 如果不是多线程模式，则直接写入文件
                 # 如果是多线程模式，则在主线程中使用队列写入文件
                 # 防止多个线程同时写入文件导致文件损坏
-                if len(data_list) >= output_size:
-                    df = pd.DataFrame(data_list)
-                    # 使用'bv'列作为DataFrame的索引
-                    df.set_index("bv", inplace=True)
-                    # 判断是否存在文件
-                    header = not os.path.exists(f"{SCRP_PATH}\\detail.csv")
-                    df.to_csv(f"{SCRP_PATH}\\detail.csv", mode="a", header=header)
-                    data_list = []
+                if len(buffer) >= output_size:
+                    write_detail(buffer)
                 else:
-                    logger.info(f"列表容量：{len(data_list)}/{output_size}")
-
-            # 关闭当前标签页
-            driver.close()
+                    logger.info(f"列表容量：{len(buffer)}/{output_size}")
+    finally:
+        if own_backend:
+            backend.close()
 
-            # 切换句柄
-            handles = driver.window_handles
-            driver.switch_to.window(handles[0])
-
-    # 停止监控线程
-    stop_event.set()
-    # 等待监控线程结束
-    monitor_thread.join()
-    driver.quit()
+    if multi and output_queue is not None:
+        return None
 
     if multi:
-        df = pd.DataFrame(data_list)
         # 使用'bv'列作为DataFrame的索引
-        df.set_index("bv", inplace=True)
-        return df
+        return normalize_detail(buffer.to_frame())
     else:
         # 将剩余数据写入文件
-        df = pd.DataFrame(data_list)
-        # 使用'bv'列作为DataFrame的索引
-        df.set_index("bv", inplace=True)
-        # 判断是否存在文件
-        header = not os.path.exists(f"{SCRP_PATH}\\detail.csv")
-        df.to_csv(f"{SCRP_PATH}\\detail.csv", mode="a", header=header)
+        write_detail(buffer)
         return None
 
 
+def write_detail(buffer: RecordBuffer):
+    """将缓冲区中的原始数据追加到detail_raw.csv，规范化后追加到detail.csv，并清空缓冲区"""
+    append_detail(buffer.to_frame(), f"{SCRP_PATH}\\detail.csv")
+    buffer.clear()
+
+
 if __name__ == "__main__":
     data = {"652151234": ["BV1RQ4y1d7gx"]}
     df = pd.DataFrame.from_dict(data, orient="index").transpose()
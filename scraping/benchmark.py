@@ -0,0 +1,187 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from scraping.nameToSpace import name_to_space
+from scraping.spaceToBV import space_to_bv
+from scraping.multithreadingDetail import multithreading_to_detail
+from scraping.frontier import Frontier, DONE
+from scraping.name_cache import NameCache
+from scraping.rate_control import RateController
+from scraping.scraping_utils import SCRP_PATH
+from scraping.replay import (
+    Archive,
+    ReplayServer,
+    start_recording,
+    stop_recording,
+    use_replay,
+)
+from pandas import DataFrame
+from typing import Callable, Iterable, Optional
+import pandas as pd
+import tempfile
+import time
+
+
+def run_stage(
+    stage: str,
+    func: Callable[[RateController], tuple[object, int]],
+    max_workers: int,
+    server: Optional[ReplayServer] = None,
+) -> tuple[object, dict]:
+    """
+    执行一个阶段并统计其吞吐量
+
+    - func: Callable - 接收该阶段的限速器，返回 (阶段的结果, 处理的条目数)
+    - server: ReplayServer - 回放服务器，用于统计每个条目加载的页面数
+
+    Returns:
+    - tuple[object, dict]: 阶段的结果，以及条目数、每分钟条目数、每个条目的页面数和请求耗时的 p95
+    """
+    # 每个阶段单独限速，分别统计耗时的分位数
+    controller = RateController(max_workers)
+    before = server.snapshot() if server is not None else None
+    start = time.monotonic()
+    result, items = func(controller)
+    elapsed = time.monotonic() - start
+
+    row = {
+        "stage": stage,
+        "items": items,
+        "elapsed": elapsed,
+        "items_per_min": items / elapsed * 60 if elapsed else None,
+        "pages_per_item": None,
+        "p95": controller.percentile(95),
+    }
+    if server is not None:
+        after = server.snapshot()
+        pages = after["pages"] - before["pages"]
+        row["pages_per_item"] = pages / items if items else None
+        row["errors"] = after["errors"] - before["errors"]
+        row["misses"] = after["misses"] - before["misses"]
+    return result, row
+
+
+def run_pipeline(
+    names: Iterable[str],
+    work_dir: str,
+    max_workers: int = 4,
+    backend: str = "selenium",
+    server: Optional[ReplayServer] = None,
+) -> DataFrame:
+    """
+    在 work_dir 中依次执行 用户名 -> 主页地址 -> BV号 -> 视频信息 三个阶段，
+    缓存、爬取队列、detail.csv、useless.csv 和浏览器用户目录都在 work_dir 中，
+    注入的错误不会把正式爬取中的视频标记为无用，也不会改动正式的用户目录
+
+    Returns:
+    - DataFrame: 每个阶段一行的统计
+    """
+    db = os.path.join(work_dir, "benchmark.db")
+    profile_root = os.path.join(work_dir, "profiles")
+    names = pd.Series(list(names)).dropna()
+    rows = []
+
+    def resolve(controller):
+        cache = NameCache(db)
+        try:
+            info = name_to_space(
+                names,
+                max_workers=max_workers,
+                cache=cache,
+                controller=controller,
+                profile_root=profile_root,
+            )
+        finally:
+            cache.close()
+        return info, len(info)
+
+    info, row = run_stage("name", resolve, max_workers, server)
+    rows.append(row)
+
+    def list_videos(controller):
+        space_bv = space_to_bv(
+            info["space"].dropna(),
+            max_workers=max_workers,
+            controller=controller,
+            profile_root=profile_root,
+        )
+        return space_bv, int(space_bv.count().sum())
+
+    space_bv, row = run_stage("space", list_videos, max_workers, server)
+    rows.append(row)
+
+    def fetch_details(controller):
+        with Frontier(db) as frontier:
+            frontier.add_space_bv(space_bv)
+            multithreading_to_detail(
+                frontier,
+                chunk_size=10,
+                max_workers=max_workers,
+                backend=backend,
+                controller=controller,
+                output_file=os.path.join(work_dir, "detail.csv"),
+                profile_root=profile_root,
+                useless_path=os.path.join(work_dir, "useless.csv"),
+            )
+            return None, frontier.counts().get(DONE, 0)
+
+    _, row = run_stage("detail", fetch_details, max_workers, server)
+    rows.append(row)
+
+    report = DataFrame(rows).set_index("stage")
+    logger.info(f"各阶段的吞吐量：\n{report.to_string()}")
+    return report
+
+
+def record(
+    names: Iterable[str],
+    archive_path: str,
+    max_workers: int = 1,
+    backend: str = "selenium",
+) -> DataFrame:
+    """访问线上页面执行一次完整的爬取，把用到的页面和接口响应保存到存档"""
+    start_recording(archive_path)
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            return run_pipeline(names, work_dir, max_workers, backend)
+    finally:
+        stop_recording()
+
+
+def benchmark(
+    names: Iterable[str],
+    archive_path: str,
+    latency: float = 0.2,
+    jitter: float = 0.1,
+    error_rate: float = 0.0,
+    max_workers: int = 4,
+    backend: str = "selenium",
+    seed: Optional[int] = 0,
+) -> DataFrame:
+    """
+    启动回放服务器，对存档执行一次完整的爬取，不访问线上页面
+
+    - latency/jitter/error_rate: 回放服务器注入的固定延迟、随机抖动和错误率
+
+    Returns:
+    - DataFrame: 每个阶段的条目数、每分钟条目数、每个条目的页面数和请求耗时的 p95
+    """
+    archive = Archive(archive_path)
+    with ReplayServer(archive, latency, jitter, error_rate, seed=seed) as server:
+        use_replay(server)
+        try:
+            with tempfile.TemporaryDirectory() as work_dir:
+                return run_pipeline(names, work_dir, max_workers, backend, server)
+        finally:
+            use_replay(None)
+
+
+if __name__ == "__main__":
+    with open(f"{SCRP_PATH}\\name.csv", "r", encoding="utf-8") as f:
+        names = pd.read_csv(f, header=None)[0]
+    archive_path = f"{SCRP_PATH}\\replay"
+    if not os.path.exists(archive_path):
+        record(names, archive_path)
+    benchmark(names, archive_path)
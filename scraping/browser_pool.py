@@ -0,0 +1,202 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from selenium import webdriver
+from scraping.scraping_utils import new_driver
+from scraping.driver_factory import DriverFactory
+from selenium.common.exceptions import WebDriverException
+from queue import Empty, Queue
+from typing import Callable, Optional
+import time
+
+try:
+    import psutil
+except ImportError:
+    # 未安装 psutil 时不按内存回收浏览器
+    psutil = None
+
+
+class PooledDriver:
+    """浏览器池中的一个浏览器实例及其使用情况"""
+
+    def __init__(self, slot: int, driver: webdriver.Chrome):
+        self.slot = slot
+        self.driver = driver
+        # 绑定在该浏览器上的抓取后端，由使用方按需创建，回收浏览器时一并关闭
+        self.backend = None
+        self.pages = 0
+        self.started_at = time.time()
+        self.rss_baseline = driver_rss_mb(driver)
+
+
+def driver_rss_mb(driver: webdriver.Chrome) -> Optional[float]:
+    """浏览器进程树（chromedriver 及其子进程）占用的物理内存，单位 MB"""
+    if psutil is None:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes) / 1024 / 1024
+    except Exception:
+        return None
+
+
+def is_healthy(driver: webdriver.Chrome) -> bool:
+    """浏览器仍能响应命令且至少有一个窗口"""
+    try:
+        driver.execute_script("return 1;")
+        return len(driver.window_handles) > 0
+    except Exception:
+        return False
+
+
+class BrowserPool:
+    """
+    长期存活的浏览器实例池。工作线程通过 acquire 借出浏览器、release 归还，
+    归还时检查浏览器状态，达到页面数上限、内存增长过多或崩溃的浏览器会被重启。
+
+    Functions:
+    - acquire: 借出一个浏览器，池为空时阻塞等待
+    - release: 归还浏览器，必要时回收并重启
+    - call: 借用一个浏览器执行函数
+    - close: 关闭池中所有浏览器
+    """
+
+    def __init__(
+        self,
+        size: int,
+        factory: Callable[[], webdriver.Chrome] = new_driver,
+        max_pages: int = 200,
+        max_rss_growth_mb: float = 1024,
+        prewarm_ahead: int = 10,
+        restart_attempts: int = 3,
+        restart_backoff: float = 5,
+    ):
+        """
+        - size: int - 浏览器数量
+        - factory: Callable - 创建浏览器的函数
+        - max_pages: int - 每个浏览器处理多少个页面后重启
+        - max_rss_growth_mb: float - 浏览器进程树内存相对启动时增长超过该值后重启，需要 psutil
+        - prewarm_ahead: int - factory 为 DriverFactory 时，浏览器距离页面数上限还剩这么多页面时
+            在后台启动替换它的浏览器，重启时无需等待；所有浏览器也在后台同时启动
+        - restart_attempts: int - 重启浏览器时最多尝试启动的次数，全部失败后抛出异常，该浏览器不再放回池中
+        - restart_backoff: float - 第一次启动失败后等待的秒数，之后每次翻倍
+        """
+        self.size = size
+        self.factory = factory
+        self.max_pages = max_pages
+        self.max_rss_growth_mb = max_rss_growth_mb
+        self.prewarm_ahead = prewarm_ahead
+        self.restart_attempts = restart_attempts
+        self.restart_backoff = restart_backoff
+        self.idle: Queue[PooledDriver] = Queue()
+        self.restarts = 0
+        # 仍在池中（空闲或借出）的浏览器数量，重启失败的浏览器不再计入
+        self.alive = size
+
+        if isinstance(factory, DriverFactory):
+            factory.prewarm(size)
+        for slot in range(size):
+            self.idle.put(self._new(slot))
+
+    def _new(self, slot: int) -> PooledDriver:
+        return PooledDriver(slot, self.factory())
+
+    def acquire(self) -> PooledDriver:
+        while True:
+            try:
+                return self.idle.get(timeout=1)
+            except Empty:
+                if self.alive == 0:
+                    raise RuntimeError("池中所有浏览器均已启动失败")
+
+    def call(self, func: Callable, *args):
+        """借用一个浏览器执行 func(driver, *args)，执行完毕后归还"""
+        pooled = self.acquire()
+        failed = False
+        try:
+            return func(pooled.driver, *args)
+        except WebDriverException:
+            failed = True
+            raise
+        finally:
+            self.release(pooled, failed)
+
+    def release(self, pooled: PooledDriver, failed: bool = False):
+        """
+        归还浏览器
+
+        - pooled: PooledDriver - 借出的浏览器
+        - failed: bool - 本次使用过程中是否发生了浏览器层面的错误（如会话失效）
+        """
+        pooled.pages += 1
+        if (
+            isinstance(self.factory, DriverFactory)
+            and pooled.pages == self.max_pages - self.prewarm_ahead
+        ):
+            self.factory.prewarm(1)
+        reason = self._recycle_reason(pooled, failed)
+        if reason:
+            logger.info(
+                f"浏览器 {pooled.slot} 已处理 {pooled.pages} 个页面，{reason}，重启"
+            )
+            pooled = self._restart(pooled)
+        self.idle.put(pooled)
+
+    def _recycle_reason(self, pooled: PooledDriver, failed: bool) -> str:
+        if failed and not is_healthy(pooled.driver):
+            return "浏览器无响应"
+        if pooled.pages >= self.max_pages:
+            return "达到页面数上限"
+        if pooled.rss_baseline is not None:
+            rss = driver_rss_mb(pooled.driver)
+            if rss is not None and rss - pooled.rss_baseline > self.max_rss_growth_mb:
+                return f"内存增长 {rss - pooled.rss_baseline:.0f}MB"
+        return ""
+
+    def _restart(self, pooled: PooledDriver) -> PooledDriver:
+        self._quit(pooled)
+        self.restarts += 1
+        delay = self.restart_backoff
+        for attempt in range(1, self.restart_attempts + 1):
+            try:
+                return self._new(pooled.slot)
+            except Exception as e:
+                if attempt == self.restart_attempts:
+                    self.alive -= 1
+                    logger.error(
+                        f"浏览器 {pooled.slot} 连续 {attempt} 次启动失败：{e}，不再重试"
+                    )
+                    raise
+                logger.error(
+                    f"浏览器 {pooled.slot} 启动失败：{e}，{delay:.0f} 秒后重试"
+                )
+                time.sleep(delay)
+                delay *= 2
+
+    def _quit(self, pooled: PooledDriver):
+        try:
+            if pooled.backend is not None:
+                pooled.backend.close()
+            if isinstance(self.factory, DriverFactory):
+                # 归还用户目录，留给下一个浏览器复用
+                self.factory.release(pooled.driver)
+            else:
+                pooled.driver.quit()
+        except Exception as e:
+            logger.debug(f"关闭浏览器 {pooled.slot} 时发生错误：{e}")
+
+    def close(self):
+        """关闭池中所有浏览器，调用前应确保所有浏览器均已归还"""
+        while not self.idle.empty():
+            self._quit(self.idle.get())
+        if isinstance(self.factory, DriverFactory):
+            self.factory.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,226 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from scraping.scraping_utils import SCRP_PATH
+from scraping.records import DETAIL_COLUMNS, NUMERIC_COLUMNS
+from pandas import DataFrame, Series
+from typing import Iterable, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import ast
+import glob
+import time
+import uuid
+
+# 列的类型在写入时确定，读取时不再解析日期、时长和标签
+DETAIL_SCHEMA = pa.schema(
+    [
+        ("bv", pa.string()),
+        ("uid", pa.string()),
+        ("title", pa.string()),
+        ("duration", pa.duration("s")),
+        ("pubtime", pa.timestamp("s")),
+        *[(key, pa.int64()) for key in NUMERIC_COLUMNS],
+        ("tags", pa.list_(pa.string())),
+    ]
+)
+# 按 uid 分区：<数据集>/uid=<uid>/part-<时间戳>-<随机串>.parquet
+PARTITIONING = ds.partitioning(pa.schema([("uid", pa.string())]), flavor="hive")
+# 与 detail.csv 相同的列顺序
+LOAD_COLUMNS = ["bv"] + [key for key in DETAIL_COLUMNS if key != "bv"]
+# 写入中断时遗留的临时文件，超过该时间后由 compact_dataset 清理，单位秒
+STALE_TEMP = 3600
+
+
+def dataset_path(output_file: str) -> str:
+    """与 csv 文件同名的数据集目录：detail.csv -> detail"""
+    return os.path.splitext(str(output_file))[0]
+
+
+def partition_files(path: str, uids: Optional[Iterable[str]] = None) -> list[str]:
+    """数据集中的文件，同一分区内按写入顺序排列；以 . 开头的临时文件不包括在内"""
+    if uids is None:
+        return sorted(glob.glob(os.path.join(str(path), "uid=*", "*.parquet")))
+    files = []
+    for uid in uids:
+        files += sorted(glob.glob(os.path.join(str(path), f"uid={uid}", "*.parquet")))
+    return files
+
+
+def parse_tags(tags: Series) -> list[list]:
+    """标签可以是列表，也可以是 csv 中的字符串形式，如 "['生活', '日常']" """
+    return [
+        (
+            list(ast.literal_eval(x))
+            if isinstance(x, str)
+            else list(x) if pd.api.types.is_list_like(x) else []
+        )
+        for x in tags
+    ]
+
+
+def to_table(detail: DataFrame) -> pa.Table:
+    """
+    将规范化后的视频信息转换为 DETAIL_SCHEMA 的表
+
+    - detail: DataFrame - normalize_detail 的结果（以 bv 为索引），
+        或从 detail.csv 读取的表（时长、发布时间和标签为字符串）
+    """
+    if "bv" not in detail.columns:
+        detail = detail.reset_index()
+    frame = DataFrame(
+        {
+            "bv": detail["bv"].astype(str),
+            "uid": detail["uid"].astype(str),
+            "title": detail["title"],
+            "duration": pd.to_timedelta(detail["duration"], errors="coerce"),
+            "pubtime": pd.to_datetime(detail["pubtime"], errors="coerce"),
+            **{
+                key: pd.to_numeric(detail[key], errors="coerce").astype("Int64")
+                for key in NUMERIC_COLUMNS
+            },
+            "tags": parse_tags(detail["tags"]),
+        }
+    )
+    return pa.Table.from_pandas(frame, schema=DETAIL_SCHEMA, preserve_index=False)
+
+
+def write_part(table: pa.Table, directory: str, name: str) -> str:
+    """先写入以 . 开头的临时文件，完整写入后再重命名，读取方不会看到写了一半的文件"""
+    os.makedirs(directory, exist_ok=True)
+    final = os.path.join(directory, f"{name}.parquet")
+    temp = os.path.join(directory, f".{name}.parquet.tmp")
+    pq.write_table(table, temp)
+    os.replace(temp, final)
+    return final
+
+
+def append_dataset(detail: DataFrame, path: str) -> list[str]:
+    """
+    将一批视频信息按 uid 追加到数据集，每个分区写入一个新文件，已有的文件不做修改
+
+    Returns:
+    - list[str]: 新写入的文件
+    """
+    table = to_table(detail)
+    if not table.num_rows:
+        return []
+    # 文件名以时间戳开头，按文件名排序即为写入顺序
+    stamp = f"{time.time_ns():020d}"
+    files = []
+    for uid in table["uid"].unique().to_pylist():
+        part = table.filter(pc.equal(table["uid"], uid)).drop_columns(["uid"])
+        name = f"part-{stamp}-{uuid.uuid4().hex[:8]}"
+        files.append(write_part(part, os.path.join(str(path), f"uid={uid}"), name))
+    return files
+
+
+def read_parts(files: list[str], path: str) -> pa.Table:
+    dataset = ds.dataset(
+        files,
+        format="parquet",
+        partitioning=PARTITIONING,
+        partition_base_dir=str(path),
+    )
+    return dataset.to_table()
+
+
+def list_column(column: pa.ChunkedArray) -> list[list]:
+    """列表列转换为 Python 列表，缺失值为空列表；经由 numpy 转换比 to_pylist 快得多"""
+    return [x.tolist() if x is not None else [] for x in column.to_pandas()]
+
+
+def load_dataset(
+    path: str, uids: Optional[Iterable[str]] = None, columns: Optional[list] = None
+) -> DataFrame:
+    """
+    读取数据集，列的类型与 DataHandler.parse 读取 detail.csv 的结果相同，
+    同一个视频出现在多个文件中时保留最后写入的一条
+
+    - uids: Iterable[str] - 只读取这些用户的分区，为None时读取全部
+    - columns: list - 只读取这些列，为None时读取全部
+    """
+    files = partition_files(path, uids)
+    if not files:
+        return DataFrame(columns=columns or LOAD_COLUMNS)
+    table = read_parts(files, path)
+    tags = list_column(table["tags"]) if "tags" in table.column_names else None
+    detail = table.drop_columns(["tags"] if tags is not None else []).to_pandas(
+        types_mapper={pa.int64(): pd.Int64Dtype()}.get,
+        coerce_temporal_nanoseconds=True,
+    )
+    if tags is not None:
+        detail["tags"] = tags
+    detail = detail[~detail["bv"].duplicated(keep="last")].reset_index(drop=True)
+    # 与 DataHandler.parse 一致，缺失的时长记为 0
+    detail["duration"] = detail["duration"].fillna(pd.Timedelta(0))
+    return detail[columns or LOAD_COLUMNS]
+
+
+def compact_dataset(path: str, min_files: int = 2) -> int:
+    """
+    将每个分区中的小文件合并为一个文件，同一个视频只保留最后写入的一条，并清理遗留的临时文件。
+    合并期间追加的文件不受影响；合并后的文件排在被合并的文件之后、之后追加的文件之前
+
+    Returns:
+    - int: 合并前后减少的文件数
+    """
+    removed = 0
+    for directory in sorted(glob.glob(os.path.join(str(path), "uid=*"))):
+        for temp in glob.glob(os.path.join(directory, ".*.tmp")):
+            if time.time() - os.path.getmtime(temp) > STALE_TEMP:
+                os.remove(temp)
+
+        files = partition_files(path, [directory.rsplit("uid=", 1)[-1]])
+        if len(files) < min_files:
+            continue
+        table = pa.concat_tables([pq.read_table(f) for f in files])
+        bvs = Series(table["bv"].to_numpy(zero_copy_only=False))
+        table = table.filter(pa.array(~bvs.duplicated(keep="last").to_numpy()))
+        # ~ 排在 . 之后，合并后的文件在被合并的最后一个文件之后
+        stem = os.path.basename(files[-1])[: -len(".parquet")].split("~")[0]
+        name = f"{stem}~compacted"
+        write_part(table, directory, name)
+        for file in files:
+            os.remove(file)
+        removed += len(files) - 1
+    logger.info(f"数据集 {path} 已合并，减少 {removed} 个文件")
+    return removed
+
+
+def move_parts(source: str, path: str) -> int:
+    """将另一个数据集（如工作进程的分片）的文件移动到 path，文件名保持不变，返回移动的文件数"""
+    files = partition_files(source)
+    for file in files:
+        partition = os.path.basename(os.path.dirname(file))
+        os.makedirs(os.path.join(str(path), partition), exist_ok=True)
+        os.replace(file, os.path.join(str(path), partition, os.path.basename(file)))
+    return len(files)
+
+
+def import_csv(csv_path: str, path: Optional[str] = None) -> int:
+    """将已有的 detail.csv 导入数据集，返回导入的视频数"""
+    path = dataset_path(csv_path) if path is None else path
+    detail = pd.read_csv(csv_path, dtype=str, usecols=lambda x: x not in ["Unnamed: 0"])
+    append_dataset(detail, path)
+    logger.info(f"已将 {csv_path} 中的 {len(detail)} 个视频导入 {path}")
+    return len(detail)
+
+
+def size_mb(path: str) -> float:
+    """文件或数据集的大小，单位 MB"""
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1024 / 1024
+    return sum(os.path.getsize(f) for f in partition_files(path)) / 1024 / 1024
+
+
+if __name__ == "__main__":
+    csv_path = f"{SCRP_PATH}\\detail.csv"
+    if not partition_files(dataset_path(csv_path)):
+        import_csv(csv_path)
+    compact_dataset(dataset_path(csv_path))
@@ -0,0 +1,447 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from scraping.scraping_utils import (
+    navigate,
+    help_wait,
+)
+from scraping.driver_factory import DriverFactory
+from scraping.extractors import (
+    snapshot,
+    extract,
+    scrape,
+    SEARCH_PAGE,
+    VIDEO_PAGE,
+)
+from scraping.network_capture import json_responses, VIDEO_RESPONSES
+from scraping.waits import poll_until
+from scraping.replay import REPLAY, replay_url
+from scraping.records import VideoRecord
+from abc import ABC, abstractmethod
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import requests
+import time
+
+
+# 哔哩哔哩接口地址，测试时可替换为本地桩服务器
+API_BASE = "https://api.bilibili.com"
+# 视频页地址
+VIDEO_URL = "https://www.bilibili.com/video/{bv}"
+# 接口返回的时间戳为 UTC，页面上显示的是北京时间
+BEIJING_TZ = timezone(timedelta(hours=8))
+# 视频不存在、已删除或仅自己可见时接口返回的错误码
+USELESS_CODES = {-404, 62002, 62004, 62012}
+
+
+class UselessVideoError(Exception):
+    """视频不存在或为番剧视频，不再爬取"""
+
+
+class FetchError(Exception):
+    """获取视频详情失败，稍后可以重试"""
+
+
+class DetailBackend(ABC):
+    """
+    视频详情抓取后端的接口，BVToDetail 通过它获取单个视频的详情。
+
+    Functions:
+    - fetch: 获取单个视频的详情，返回与 detail.csv 列一致的 VideoRecord
+    - close: 释放后端占用的资源（浏览器、连接池等）
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def fetch(self, uid: str, bv: str) -> VideoRecord:
+        """
+        获取单个视频的详情
+
+        Args:
+        - uid: str, up主id
+        - bv: str, 视频BV号
+
+        Returns:
+        - VideoRecord: uid/bv/title/duration/pubtime/click/bullet/like/coin/favorite/share/comment/tags
+
+        Raises:
+        - UselessVideoError: 视频不存在或不具备可比性，调用方应将其写入 useless.csv
+        - FetchError: 本次获取失败
+        """
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SeleniumBackend(DetailBackend):
+    """
+    通过浏览器渲染页面获取视频详情
+
+    导航方式：
+    - direct: 在当前标签页直接打开视频页，时长和视频是否存在都从视频页读取，每个视频加载一个页面
+    - search: 先打开搜索页读取时长并判断视频是否存在，再点击结果在新标签页打开视频页，每个视频加载两个页面
+
+    提取方式：
+    - network: 从性能日志中读取视频页自身请求到的视频信息和标签 JSON，计数为精确整数；
+        未捕获到响应时回退到 dom，仅在 direct 导航下生效，浏览器需开启性能日志
+    - dom: 从渲染后的页面源码中解析各个元素的文本
+    """
+
+    name = "selenium"
+    navigations = ("direct", "search")
+    extractions = ("network", "dom")
+    # network 提取方式下等待视频信息和标签接口响应的最长时间，超时后回退到 dom
+    network_timeout = 5
+
+    def __init__(
+        self,
+        driver: Optional[webdriver.Chrome] = None,
+        lean: bool = True,
+        navigation: str = "direct",
+        extraction: str = "network",
+    ):
+        """
+        - driver: webdriver.Chrome - 使用的浏览器，为None时自行创建
+        - lean: bool - 自行创建浏览器时是否使用精简模式
+        - navigation: str - 导航方式，'direct' 或 'search'
+        - extraction: str - 提取方式，'network' 或 'dom'
+        """
+        if navigation not in self.navigations:
+            raise ValueError(f"未知的导航方式：{navigation}，可选：{self.navigations}")
+        if extraction not in self.extractions:
+            raise ValueError(f"未知的提取方式：{extraction}，可选：{self.extractions}")
+        self.navigation = navigation
+        self.extraction = extraction
+        # 只关闭由本后端创建的浏览器，传入的浏览器由调用方（如浏览器池）管理
+        self.factory = None
+        if driver is None:
+            self.factory = DriverFactory("single", lean, extraction == "network")
+            driver = self.factory()
+        self.driver = driver
+        # 已获取的视频数、加载的页面数和总耗时，用于比较两种导航方式
+        self.fetched = 0
+        self.page_loads = 0
+        self.elapsed = 0.0
+        # 从网络响应中直接得到结果的视频数
+        self.captured = 0
+
+    def fetch(self, uid: str, bv: str) -> VideoRecord:
+        start = time.monotonic()
+        try:
+            if self.navigation == "direct":
+                self._open_direct(bv)
+                if self.extraction == "network":
+                    record = self._from_network(uid, bv)
+                    if record is not None:
+                        self.captured += 1
+                        return record
+                    logger.debug(f"未捕获到视频 {bv} 的接口响应，从页面元素中解析")
+                data, ready = self._scrape_video()
+            else:
+                data, ready = self._fetch_via_search(bv)
+        finally:
+            self.fetched += 1
+            self.elapsed += time.monotonic() - start
+
+        if data.pop("error") is not None:
+            raise UselessVideoError(f"视频 {bv} 不存在，可能是因为该视频已被删除")
+        if data.pop("rating") is not None:
+            # 如果存在评分元素，则说明该视频为番剧视频
+            raise UselessVideoError(
+                f"视频 {bv} 为番剧视频，数据不存在可比性，类似性，跳过"
+            )
+        # 时长缺失时与原先一样写入空字符串，不视为获取失败
+        duration = data.pop("duration") or ""
+        missing = [name for name, value in data.items() if value is None]
+        if missing:
+            state = "加载超时" if not ready else "无法找到元素"
+            raise FetchError(f"{state}：{missing}，相关视频：{bv}")
+
+        return VideoRecord(
+            uid=uid,
+            bv=bv,
+            title=data["title"],
+            duration=duration,
+            pubtime=data["pubtime"],
+            click=data["click"],
+            bullet=data["bullet"],
+            like=data["like"],
+            coin=data["coin"],
+            favorite=data["favorite"],
+            share=data["share"],
+            comment=data["comment"],
+            tags=data["tags"],
+        )
+
+    def _open_direct(self, bv: str):
+        """
+        在当前标签页打开视频页，视频不存在或为番剧时页面上的终止条件会立即结束等待。
+        network 提取方式下不等待页面元素，只等待文档加载完成，接口响应由 _from_network 等待
+        """
+        if self.extraction == "network":
+            navigate(self.driver, VIDEO_URL.format(bv=bv), page=VIDEO_PAGE.name)
+        else:
+            navigate(
+                self.driver,
+                VIDEO_URL.format(bv=bv),
+                VIDEO_PAGE.ready,
+                VIDEO_PAGE.name,
+                gone=VIDEO_PAGE.gone,
+            )
+        self.page_loads += 1
+
+    def _scrape_video(self) -> tuple[dict, bool]:
+        # 页面已就绪，读取一次页面源码后在本地解析所有字段
+        selector, ready = snapshot(
+            self.driver, VIDEO_PAGE.ready, page=VIDEO_PAGE.name, gone=VIDEO_PAGE.gone
+        )
+        return extract(selector, VIDEO_PAGE.fields), ready
+
+    def _from_network(self, uid: str, bv: str) -> VideoRecord | None:
+        """
+        轮询性能日志，直到捕获到视频信息和标签接口的响应，超时仍缺失时返回 None
+
+        Raises:
+        - UselessVideoError: 接口返回视频不存在，或视频为番剧
+        """
+        # 性能日志读取后即被清空，每次轮询读到的响应累积起来
+        responses: dict[str, list[tuple[str, dict]]] = {}
+        record = None
+
+        def captured() -> bool:
+            nonlocal record
+            latest = json_responses(self.driver, VIDEO_RESPONSES)
+            if latest is None:
+                # 未开启性能日志，不再等待
+                return True
+            for name, found in latest.items():
+                responses.setdefault(name, []).extend(found)
+            record = self._assemble(uid, bv, responses)
+            return record is not None
+
+        poll_until(captured, self.network_timeout, "video_api")
+        return record
+
+    def _assemble(
+        self, uid: str, bv: str, responses: dict[str, list[tuple[str, dict]]]
+    ) -> VideoRecord | None:
+        """从已捕获的接口响应中组装结果，视频信息或标签缺失时返回 None"""
+        view, tags = None, None
+        for url, body in responses.get("view", []):
+            data = body.get("data") or {}
+            # /view/detail 接口把视频信息和标签放在 View 和 Tags 中
+            candidate = data.get("View", data)
+            if f"bvid={bv}" not in url and candidate.get("bvid") != bv:
+                continue
+            if not usable(body, bv, url):
+                continue
+            view = candidate
+            tags = data.get("Tags", tags)
+        if view is None:
+            return None
+        if view.get("redirect_url"):
+            # 番剧视频会被重定向到番剧页面
+            raise UselessVideoError(
+                f"视频 {bv} 为番剧视频，数据不存在可比性，类似性，跳过"
+            )
+
+        for url, body in responses.get("tags", []):
+            if f"bvid={bv}" in url or f"aid={view.get('aid')}" in url:
+                if usable(body, bv, url):
+                    tags = body.get("data") or []
+        if tags is None:
+            return None
+        return parse_view(uid, bv, view, tags)
+
+    def _fetch_via_search(self, bv: str) -> tuple[dict, bool]:
+        driver = self.driver
+        url = f"https://search.bilibili.com/all?keyword={bv}"
+        # 等待页面加载完成，并检查一次验证窗口
+        navigate(driver, url, SEARCH_PAGE.ready, SEARCH_PAGE.name)
+        self.page_loads += 1
+
+        search = scrape(driver, SEARCH_PAGE)
+        if search["count"] is None:
+            raise FetchError(f"搜索页加载失败，相关视频：{bv}")
+        if search["count"] == "0":
+            raise UselessVideoError(f"视频 {bv} 不存在，可能是因为该视频已被删除")
+
+        # 定位视频链接
+        link = driver.find_element(
+            By.XPATH,
+            f'//a[contains(@class, "col_3") and contains(@href, "{bv}")]',
+        )
+        link.click()
+
+        # 切换句柄
+        handles = driver.window_handles
+        driver.switch_to.window(handles[-1])
+        try:
+            # 新标签页不继承注入的钩子，加载完成后检查一次验证窗口
+            help_wait(driver, VIDEO_PAGE.ready, VIDEO_PAGE.name, gone=VIDEO_PAGE.gone)
+            self.page_loads += 1
+            # 页面已就绪，读取一次页面源码后在本地解析所有字段
+            selector, ready = snapshot(
+                driver, VIDEO_PAGE.ready, page=VIDEO_PAGE.name, gone=VIDEO_PAGE.gone
+            )
+            data = extract(selector, VIDEO_PAGE.fields)
+        finally:
+            # 关闭当前标签页
+            driver.close()
+            # 切换句柄
+            handles = driver.window_handles
+            driver.switch_to.window(handles[0])
+
+        # 搜索卡片上的时长优先，缺失时使用视频页中的时长
+        data["duration"] = search["duration"] or data["duration"]
+        return data, ready
+
+    def close(self):
+        if self.fetched:
+            logger.info(
+                f"[{self.navigation}/{self.extraction}] 共获取 {self.fetched} 个视频，"
+                f"平均每个视频加载 {self.page_loads / self.fetched:.2f} 个页面，"
+                f"耗时 {self.elapsed / self.fetched:.2f}s，"
+                f"其中 {self.captured} 个直接取自接口响应"
+            )
+        if self.factory is not None:
+            self.factory.release(self.driver)
+
+
+class HttpBackend(DetailBackend):
+    """
+    不启动浏览器，直接请求哔哩哔哩的 JSON 接口获取视频详情。
+    一个实例持有一个带连接池的 requests.Session，同一线程内复用即可。
+    """
+
+    name = "http"
+
+    def __init__(
+        self,
+        base_url: str = API_BASE,
+        timeout: float = 10,
+        pool_size: int = 10,
+        retries: int = 3,
+        session: Optional[requests.Session] = None,
+    ):
+        # 回放时请求回放服务器上的对应地址
+        self.base_url = replay_url(base_url.rstrip("/"))
+        self.timeout = timeout
+
+        if session is None:
+            session = requests.Session()
+            # 连接池复用 TCP/TLS 连接，遇到限流或服务端错误时自动退避重试
+            retry = Retry(
+                total=retries,
+                backoff_factor=0.5,
+                status_forcelist=[412, 429, 500, 502, 503, 504],
+            )
+            adapter = HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(
+                {
+                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                    "AppleWebKit/537.36 (KHTML, like Gecko) "
+                    "Chrome/122.0.0.0 Safari/537.36",
+                    "Referer": "https://www.bilibili.com/",
+                }
+            )
+        self.session = session
+
+    def _get(self, path: str, bv: str) -> dict | list:
+        try:
+            response = self.session.get(
+                f"{self.base_url}{path}", params={"bvid": bv}, timeout=self.timeout
+            )
+            response.raise_for_status()
+            body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise FetchError(f"请求 {path} 失败：{e}，相关视频：{bv}")
+        REPLAY.record_response(response.url, body)
+
+        check_code(body, bv, path)
+        return body.get("data")
+
+    def fetch(self, uid: str, bv: str) -> VideoRecord:
+        view = self._get("/x/web-interface/view", bv)
+        if view.get("redirect_url"):
+            # 番剧视频会被重定向到番剧页面
+            raise UselessVideoError(
+                f"视频 {bv} 为番剧视频，数据不存在可比性，类似性，跳过"
+            )
+        tags = self._get("/x/web-interface/view/detail/tag", bv) or []
+        return parse_view(uid, bv, view, tags)
+
+    def close(self):
+        self.session.close()
+
+
+def check_code(body: dict, bv: str, path: str):
+    """检查接口返回的错误码，视频不存在时抛出 UselessVideoError，其他错误抛出 FetchError"""
+    code = body.get("code", 0)
+    if code in USELESS_CODES:
+        raise UselessVideoError(f"视频 {bv} 不存在，接口返回：{body.get('message')}")
+    if code != 0:
+        raise FetchError(f"接口 {path} 返回错误码 {code}，相关视频：{bv}")
+
+
+def usable(body: dict, bv: str, path: str) -> bool:
+    """页面捕获到的响应是否可用，视频不存在时抛出 UselessVideoError，其他错误（如风控）交给页面解析兜底"""
+    try:
+        check_code(body, bv, path)
+    except FetchError as e:
+        logger.debug(e)
+        return False
+    return True
+
+
+def parse_view(uid: str, bv: str, view: dict, tags: list[dict]) -> VideoRecord:
+    """将视频接口返回的 JSON 转换为与 detail.csv 列一致的 VideoRecord"""
+    stat = view["stat"]
+    pubtime = datetime.fromtimestamp(view["pubdate"], tz=BEIJING_TZ)
+    minutes, seconds = divmod(int(view["duration"]), 60)
+    hours, minutes = divmod(minutes, 60)
+    return VideoRecord(
+        uid=uid,
+        bv=bv,
+        title=view["title"],
+        duration=f"{hours:02d}:{minutes:02d}:{seconds:02d}",
+        pubtime=pubtime.strftime("%Y-%m-%d %H:%M:%S"),
+        click=stat["view"],
+        bullet=stat["danmaku"],
+        like=stat["like"],
+        coin=stat["coin"],
+        favorite=stat["favorite"],
+        share=stat["share"],
+        comment=stat["reply"],
+        tags=[tag["tag_name"] for tag in tags if tag.get("tag_name")],
+    )
+
+
+BACKENDS = {
+    SeleniumBackend.name: SeleniumBackend,
+    HttpBackend.name: HttpBackend,
+}
+
+
+def make_backend(kind: str = "selenium", **kwargs) -> DetailBackend:
+    """根据名称创建抓取后端，kind 为 'selenium' 或 'http'"""
+    if kind not in BACKENDS:
+        raise ValueError(f"未知的抓取后端：{kind}，可选：{list(BACKENDS)}")
+    return BACKENDS[kind](**kwargs)
@@ -0,0 +1,177 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from scraping.scraping_utils import SCRP_PATH
+from scraping.frontier import Frontier, FRONTIER_PATH, LEASED
+from scraping.multithreadingDetail import multithreading_to_detail
+from scraping.normalize import build_tags, raw_path
+from scraping.tag_index import TagIndex, tags_path
+from scraping.dataset import dataset_path, move_parts
+from typing import Callable, Optional
+import pandas as pd
+import glob
+import multiprocessing
+import shutil
+import socket
+import time
+
+# 每个工作进程的输出分片，合并后写入 detail.csv
+SHARD_PATTERN = "detail-{worker}.csv"
+
+
+def worker_name() -> str:
+    """工作进程的默认标识：主机名-进程号，多台机器共用一个数据库时也不会重复"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def shard_path(output_dir: str, worker: str) -> str:
+    return os.path.join(str(output_dir), SHARD_PATTERN.format(worker=worker))
+
+
+def run_worker(
+    frontier_path: str = FRONTIER_PATH,
+    output_dir: str = f"{SCRP_PATH}\\shards",
+    worker: Optional[str] = None,
+    lease_ttl: float = 600,
+    poll_interval: float = 5,
+    chunk_size: int = 10,
+    crawl: Callable = multithreading_to_detail,
+    **options,
+) -> str:
+    """
+    工作进程：从共用的爬取队列中租用视频，结果写入自己的分片，直到没有待爬取的视频。
+    其他进程还持有租约时继续等待，它们的租约到期后由本进程收回并爬取
+
+    - frontier_path: str - 爬取队列的数据库，所有工作进程共用
+    - output_dir: str - 分片所在的目录
+    - worker: str - 本进程的标识，为None时使用 主机名-进程号；
+        浏览器的用户目录按该标识命名，使用固定的标识才能在下次运行时复用
+    - lease_ttl: float - 租约的有效期，进程崩溃后其租用的视频最多等待这么久被收回
+    - crawl: Callable - 爬取函数，参数与 multithreading_to_detail 相同
+    - options: 传给 crawl 的其他参数，如 max_workers、backend
+
+    Returns:
+    - str: 本进程的分片路径
+    """
+    worker = worker_name() if worker is None else worker
+    os.makedirs(str(output_dir), exist_ok=True)
+    output_file = shard_path(output_dir, worker)
+    # 同一台机器上的各个进程使用各自的浏览器用户目录
+    options.setdefault("profile", f"detail-{worker}")
+
+    with Frontier(frontier_path, owner=worker, lease_ttl=lease_ttl) as frontier:
+        while True:
+            frontier.reclaim_expired()
+            if frontier.pending() > 0:
+                crawl(
+                    frontier, chunk_size=chunk_size, output_file=output_file, **options
+                )
+                continue
+            if frontier.counts().get(LEASED, 0) == 0:
+                break
+            # 剩余的视频都被其他进程租用，等待它们完成或租约到期
+            time.sleep(poll_interval)
+
+    logger.info(f"工作进程 {worker} 已完成，结果位于 {output_file}")
+    return output_file
+
+
+def run_local(
+    workers: int,
+    frontier_path: str = FRONTIER_PATH,
+    output_dir: str = f"{SCRP_PATH}\\shards",
+    **options,
+) -> list[int]:
+    """
+    在本机启动 workers 个工作进程并等待它们结束，用于单机多进程爬取或测试
+
+    Returns:
+    - list[int]: 各进程的退出码
+    """
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            kwargs=dict(
+                frontier_path=str(frontier_path),
+                output_dir=str(output_dir),
+                worker=f"local-{i}",
+                **options,
+            ),
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return [process.exitcode for process in processes]
+
+
+def merge_files(files: list[str], output_file: str) -> int:
+    """
+    将若干个以 bv 为索引的 csv 追加到 output_file，同一个视频在这些文件中保留最后一次的结果；
+    output_file 中已有的视频跳过，已有的内容不再重写。返回 output_file 中的视频数
+    """
+    existing = pd.Index([], dtype=str)
+    columns = None
+    if os.path.exists(output_file):
+        existing = pd.Index(
+            pd.read_csv(output_file, usecols=["bv"], dtype=str)["bv"].unique()
+        )
+        columns = pd.read_csv(output_file, index_col="bv", nrows=0).columns
+    frames = [
+        pd.read_csv(file, index_col="bv", dtype=str, keep_default_na=False)
+        for file in files
+        if os.path.exists(file)
+    ]
+    if not frames:
+        return len(existing)
+    merged = pd.concat(frames)
+    merged = merged[~merged.index.duplicated(keep="last")]
+    merged = merged[~merged.index.isin(existing)]
+    if columns is not None:
+        # 按 output_file 的列顺序追加
+        merged = merged.reindex(columns=columns)
+    merged.to_csv(output_file, mode="a", header=columns is None)
+    return len(existing) + len(merged)
+
+
+def merge_shards(
+    output_dir: str = f"{SCRP_PATH}\\shards",
+    output_file: str = f"{SCRP_PATH}\\detail.csv",
+) -> int:
+    """
+    将各工作进程的分片（及原始文本分片）追加到 output_file，output_file 中已有的视频保持不变；
+    分片的 Parquet 数据集文件直接移动到 output_file 的数据集中，分片的标签追加到 output_file 的标签表。
+    租约到期后被重新爬取的视频可能出现在两个分片中，只保留一条。
+    合并完成后删除分片，下次合并时旧分片不会再次合并，也不会覆盖更新的结果
+
+    Returns:
+    - int: output_file 中的视频数
+    """
+    pattern = os.path.join(str(output_dir), SHARD_PATTERN.format(worker="*"))
+    # 原始文本分片 detail-*_raw.csv 也匹配该模式，单独合并
+    shards = sorted(f for f in glob.glob(pattern) if not f.endswith("_raw.csv"))
+    tags = tags_path(output_file)
+    shard_tags = [tags_path(f) for f in shards if TagIndex.exists(tags_path(f))]
+    if shard_tags and os.path.exists(output_file) and not TagIndex.exists(tags):
+        build_tags(output_file)
+    merged = merge_files(shards, output_file)
+    merge_files([raw_path(f) for f in shards], raw_path(output_file))
+    for shard in shards:
+        move_parts(dataset_path(shard), dataset_path(output_file))
+    for path in shard_tags:
+        # 各分片的标签字典编号不同，按标签重新编码后追加
+        TagIndex.append(TagIndex.load(path).to_detail(), tags)
+    # 全部合并成功后才删除分片，中途出错时分片保留，下次重新合并
+    for shard in shards:
+        for file in [shard, raw_path(shard)]:
+            if os.path.exists(file):
+                os.remove(file)
+        # 数据集的文件已移走，只剩下空的分区目录
+        shutil.rmtree(dataset_path(shard), ignore_errors=True)
+        shutil.rmtree(tags_path(shard), ignore_errors=True)
+    logger.info(f"已合并 {len(shards)} 个分片，{output_file} 中共 {merged} 个视频")
+    return merged
@@ -0,0 +1,174 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from selenium import webdriver
+from scraping.scraping_utils import (
+    SCRP_PATH,
+    CHALLENGE_CHECK,
+    STARTUPS,
+    new_driver,
+    wait,
+)
+from scraping.replay import replay_url
+from pathlib import Path
+from queue import Queue
+from typing import Callable, Optional
+import threading
+import time
+
+# 持久化的用户目录，每个浏览器独占一个，关闭后留给同名工厂的下一个浏览器
+PROFILE_PATH = Path(SCRP_PATH) / "profiles"
+# 新用户目录预热时打开的页面，写入 cookie 并关闭首次访问的提示和验证窗口
+WARM_URL = "https://www.bilibili.com"
+# 预热完成后写入用户目录的标记文件，之后复用该目录时不再预热
+WARM_MARKER = ".warmed"
+
+
+def profile_dir(name: str, root: str = PROFILE_PATH) -> str:
+    path = os.path.join(str(root), name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class DriverFactory:
+    """
+    使用持久化的用户目录创建浏览器，可以在后台预先启动，可直接作为浏览器池的 factory。
+    同一时间每个用户目录只分配给一个浏览器，浏览器关闭后目录中的 cookie、缓存和本地存储保留，
+    下一个浏览器复用时不再需要预热，也不会再次出现首次访问的提示和验证窗口
+
+    Functions:
+    - prewarm: 在后台预先启动浏览器，之后取用时无需等待
+    - release: 关闭浏览器并归还其用户目录
+    - close: 关闭预先启动但未被取用的浏览器
+    """
+
+    def __init__(
+        self,
+        name: str,
+        lean: bool = True,
+        capture: bool = False,
+        persistent: bool = True,
+        warm_url: Optional[str] = WARM_URL,
+        root: str = PROFILE_PATH,
+        start: Callable[..., webdriver.Chrome] = new_driver,
+    ):
+        """
+        - name: str - 用户目录名的前缀，同时运行的工厂（如各个阶段、各个工作进程）应使用不同的名字
+        - lean/capture: bool - 传给 new_driver 的参数
+        - persistent: bool - 是否使用持久化的用户目录，为False时每次都从空白的临时目录启动
+        - warm_url: str - 新用户目录的预热页面，为None时不预热
+        - root: str - 用户目录所在的目录
+        - start: Callable - 启动浏览器的函数，参数与 new_driver 相同
+        """
+        self.name = name
+        self.lean = lean
+        self.capture = capture
+        self.persistent = persistent
+        self.warm_url = warm_url
+        self.root = str(root)
+        self.start = start
+        self.lock = threading.Lock()
+        # 正在使用的用户目录
+        self.in_use: set[str] = set()
+        # 预先启动的浏览器，启动失败时放入 None
+        self.ready: Queue[Optional[webdriver.Chrome]] = Queue()
+        # 已启动或正在启动、尚未被取用的浏览器数
+        self.available = 0
+        self.closed = False
+
+    def _checkout(self) -> Optional[str]:
+        """分配编号最小的空闲用户目录"""
+        if not self.persistent:
+            return None
+        with self.lock:
+            i = 0
+            while f"{self.name}-{i}" in self.in_use:
+                i += 1
+            self.in_use.add(f"{self.name}-{i}")
+        return profile_dir(f"{self.name}-{i}", self.root)
+
+    def _checkin(self, path: Optional[str]):
+        if path is not None:
+            with self.lock:
+                self.in_use.discard(os.path.basename(path))
+
+    def _launch(self) -> webdriver.Chrome:
+        """启动一个浏览器，新的用户目录在启动后预热，耗时计入启动耗时"""
+        path = self._checkout()
+        warm = path is not None and os.path.exists(os.path.join(path, WARM_MARKER))
+        start = time.monotonic()
+        try:
+            driver = self.start(self.lean, self.capture, user_data_dir=path)
+        except Exception:
+            self._checkin(path)
+            raise
+        driver.user_data_dir = path
+        if path is not None and not warm:
+            self._warmup(driver, path)
+        kind = "blank" if path is None else "warm" if warm else "cold"
+        STARTUPS.record(driver, kind, time.monotonic() - start)
+        return driver
+
+    def _warmup(self, driver: webdriver.Chrome, path: str):
+        if self.warm_url is None:
+            return
+        try:
+            driver.get(replay_url(self.warm_url))
+            wait(driver, 10, page="warmup")
+            # 预热页面上的验证窗口不计入统计
+            driver.execute_script(CHALLENGE_CHECK)
+        except Exception as e:
+            logger.debug(f"预热用户目录 {path} 时发生错误：{e}")
+            return
+        with open(os.path.join(path, WARM_MARKER), "w", encoding="utf-8") as f:
+            f.write(str(time.time()))
+
+    def prewarm(self, n: int = 1):
+        """在后台启动 n 个浏览器，取用时优先使用它们"""
+        with self.lock:
+            self.available += n
+        for _ in range(n):
+            threading.Thread(target=self._prewarm_one, daemon=True).start()
+
+    def _prewarm_one(self):
+        try:
+            driver = self._launch()
+        except Exception as e:
+            logger.error(f"预先启动浏览器失败：{e}")
+            driver = None
+        if driver is not None and self.closed:
+            self.release(driver)
+            return
+        self.ready.put(driver)
+
+    def __call__(self) -> webdriver.Chrome:
+        """取用一个浏览器：有预先启动的浏览器时等待它就绪，否则立即启动一个"""
+        start = time.monotonic()
+        with self.lock:
+            claimed = self.available > 0
+            if claimed:
+                self.available -= 1
+        driver = self.ready.get() if claimed else None
+        if driver is None:
+            driver = self._launch()
+        STARTUPS.handout(time.monotonic() - start)
+        return driver
+
+    def release(self, driver: webdriver.Chrome):
+        try:
+            driver.quit()
+        finally:
+            self._checkin(getattr(driver, "user_data_dir", None))
+
+    def close(self):
+        """关闭预先启动但未被取用的浏览器，仍在启动的浏览器启动后自行关闭"""
+        self.closed = True
+        while not self.ready.empty():
+            driver = self.ready.get()
+            if driver is not None:
+                try:
+                    self.release(driver)
+                except Exception as e:
+                    logger.debug(f"关闭浏览器时发生错误：{e}")
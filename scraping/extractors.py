@@ -0,0 +1,213 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from selenium import webdriver
+from parsel import Selector
+from scraping.scraping_utils import convert_to_int
+from scraping.waits import wait_ready
+from typing import Callable, NamedTuple, Optional
+import json
+import re
+
+# 视频页源码中保存页面初始数据的脚本
+INITIAL_STATE = "window.__INITIAL_STATE__="
+
+
+class Field(NamedTuple):
+    """
+    一个待提取字段的声明
+
+    - xpath: str - 定位字段的 XPath，以 /@attr 结尾时提取属性值，否则提取元素文本
+    - many: bool - 是否提取所有匹配项，为 True 时返回非空文本组成的列表
+    - convert: Callable - 对提取结果的转换函数，结果缺失时不调用
+    """
+
+    xpath: str
+    many: bool = False
+    convert: Optional[Callable] = None
+
+
+class Page(NamedTuple):
+    """
+    一类页面的提取规则
+
+    - ready: list[str] - 就绪条件，页面上同时存在这些 CSS 选择器时才读取页面源码
+    - fields: dict[str, Field] - 字段名到提取规则的映射
+    - name: str - 页面类型，等待耗时按页面类型分别统计
+    - gone: list[str] - 终止条件，页面上存在任一 CSS 选择器时不再等待就绪（如视频不存在）
+    """
+
+    ready: list[str]
+    fields: dict[str, Field]
+    name: str = "page"
+    gone: list[str] = []
+
+
+def absolute_url(href: str) -> str:
+    """页面源码中的链接可能省略协议，如 //space.bilibili.com/123"""
+    if href.startswith("//"):
+        return "https:" + href
+    return href
+
+
+def parse_fans(text: str) -> int:
+    """粉丝：175.6万 · 视频：284 -> 粉丝数"""
+    text = text.split(" · ")[0]
+    text = text.split("：")[-1]
+    return convert_to_int(text)
+
+
+def parse_initial_duration(text: str) -> Optional[str]:
+    """视频页源码中 window.__INITIAL_STATE__ 的 videoData.duration（秒） -> HH:MM:SS"""
+    start = text.find(INITIAL_STATE)
+    if start < 0:
+        return None
+    try:
+        # 对象之后还有其他脚本，只解码开头的 JSON 对象
+        state, _ = json.JSONDecoder().raw_decode(text, start + len(INITIAL_STATE))
+        seconds = int(state["videoData"]["duration"])
+    except (ValueError, KeyError, TypeError) as e:
+        logger.debug(f"无法从 __INITIAL_STATE__ 中读取时长：{e}")
+        return None
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_total_pages(text: str) -> int:
+    """共 12 页， -> 12"""
+    digits = re.search(r"\d+", text)
+    return int(digits.group()) if digits else 1
+
+
+# 搜索页，用于判断视频是否存在并读取时长
+SEARCH_PAGE = Page(
+    ready=[".vui_tabs--nav-num"],
+    fields={
+        "count": Field('//*[contains(@class, "vui_tabs--nav-num")]'),
+        "duration": Field(
+            '//span[contains(@class, "bili-video-card__stats__duration")]'
+        ),
+    },
+    name="search",
+)
+
+# 视频页
+VIDEO_PAGE = Page(
+    ready=[".video-like-info", ".total-reply", ".tag-link"],
+    # 计数保留页面上的原始文本（如 1.5万），由 normalize 批量转换为整数
+    fields={
+        "title": Field('//h1[contains(@class, "video-title")]'),
+        "pubtime": Field('//span[contains(@class, "pubdate-text")]'),
+        "click": Field('//span[contains(@class, "view") and contains(@class, "item")]'),
+        "bullet": Field('//span[contains(@class, "dm") and contains(@class, "item")]'),
+        "like": Field('//span[contains(@class, "video-like-info")]'),
+        "coin": Field('//span[contains(@class, "video-coin-info")]'),
+        "favorite": Field('//span[contains(@class, "video-fav-info")]'),
+        "share": Field('//span[contains(@class, "video-share-info-text")]'),
+        "comment": Field('//span[contains(@class, "total-reply")]'),
+        "tags": Field('//a[contains(@class, "tag-link")]', many=True),
+        "duration": Field(
+            '//script[contains(text(), "window.__INITIAL_STATE__")]',
+            convert=parse_initial_duration,
+        ),
+        # 存在评分元素说明是番剧视频
+        "rating": Field('//div[@class="mediainfo_ratingText__N8GtM"]'),
+        # 存在错误提示说明视频不存在或已被删除
+        "error": Field('//*[contains(@class, "error-text")]'),
+    },
+    name="video",
+    gone=[".error-text", "[class*='mediainfo_ratingText']"],
+)
+
+# 用户搜索结果页
+USER_SEARCH_PAGE = Page(
+    ready=["a.user-name"],
+    fields={
+        "space": Field(
+            "//a[contains(@class, 'user-name') and contains(@class, 'cs_pointer') and contains(@class, 'v_align_middle')]/@href",
+            convert=absolute_url,
+        ),
+        "fans": Field('//p[contains(text(), "粉丝")]', convert=parse_fans),
+    },
+    name="user_search",
+)
+
+# 用户空间的投稿列表页
+SPACE_PAGE = Page(
+    ready=["li.fakeDanmu-item"],
+    fields={
+        "bvs": Field(
+            "//li[contains(@class, 'list-item clearfix fakeDanmu-item')]/@data-aid",
+            many=True,
+        ),
+        "pages": Field(
+            '//span[contains(@class, "be-pager-total")]', convert=parse_total_pages
+        ),
+    },
+    name="space",
+)
+
+
+def snapshot(
+    driver: webdriver.Chrome,
+    ready: list[str],
+    timeout: float = 10,
+    page: str = "page",
+    gone: list[str] = (),
+) -> tuple[Selector, bool]:
+    """
+    等待一次就绪条件，然后读取页面源码，后续字段全部在本地解析
+
+    Args:
+    - driver: webdriver.Chrome
+    - ready: list[str], 就绪条件的 CSS 选择器
+    - timeout: float, 等待就绪的最长时间
+    - page: str, 页面类型，用于统计等待耗时
+    - gone: list[str], 终止条件的 CSS 选择器，出现任一时立即停止等待
+
+    Returns:
+    - tuple[Selector, bool]: 页面源码的选择器，以及是否在超时前就绪
+    """
+    is_ready = True
+    if ready:
+        # 每次轮询只发送一条命令，同时检查所有选择器，轮询间隔指数增长
+        is_ready = wait_ready(driver, ready, timeout, page, gone)
+        if not is_ready:
+            logger.debug(f"等待就绪条件超时：{ready}")
+
+    return Selector(text=driver.page_source), is_ready
+
+
+def node_text(node: Selector) -> str:
+    """属性节点返回属性值，元素节点返回其全部文本"""
+    if isinstance(node.root, str):
+        return node.root.strip()
+    return node.xpath("string()").get().strip()
+
+
+def extract(selector: Selector, fields: dict[str, Field]) -> dict:
+    """按照提取规则从页面源码中解析所有字段，缺失的单值字段为 None"""
+    data = {}
+    for name, field in fields.items():
+        texts = [node_text(node) for node in selector.xpath(field.xpath)]
+        texts = [text for text in texts if text != ""]
+
+        if field.many:
+            value = texts
+            if field.convert is not None:
+                value = [field.convert(text) for text in value]
+        elif texts:
+            value = texts[0]
+            if field.convert is not None:
+                value = field.convert(value)
+        else:
+            value = None
+        data[name] = value
+    return data
+
+
+def scrape(driver: webdriver.Chrome, page: Page, timeout: float = 10) -> dict:
+    """等待页面就绪后一次性提取页面的所有字段"""
+    selector, _ = snapshot(driver, page.ready, timeout, page.name, page.gone)
+    return extract(selector, page.fields)
@@ -0,0 +1,259 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from scraping.scraping_utils import SCRP_PATH
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Iterable, Optional
+import pandas as pd
+import sqlite3
+import threading
+import time
+
+
+FRONTIER_PATH = Path(SCRP_PATH) / "frontier.db"
+
+# 视频的爬取状态
+PENDING = "pending"  # 等待爬取
+LEASED = "leased"  # 已被工作线程或工作进程取走，正在爬取
+DONE = "done"  # 已写入 detail.csv
+USELESS = "useless"  # 视频不存在或为番剧，不再爬取
+FAILED = "failed"  # 多次尝试仍然失败
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    uid TEXT NOT NULL,
+    bv TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (uid, bv)
+);
+CREATE INDEX IF NOT EXISTS idx_frontier_status ON frontier (status, created_at);
+-- 导入 useless.csv 时只按BV号更新状态，主键 (uid, bv) 无法只按 bv 查找
+CREATE INDEX IF NOT EXISTS idx_frontier_bv ON frontier (bv);
+"""
+
+# 租约相关的列，旧的数据库打开时自动补上
+LEASE_COLUMNS = {"lease_owner": "TEXT", "lease_expires": "REAL"}
+
+
+class Frontier:
+    """
+    持久化的爬取队列，每个 (uid, bv) 一行，记录爬取状态、尝试次数和时间戳。
+    取代每轮重新读取 space_bv.csv、detail.csv、useless.csv 做差集的做法，
+    恢复爬取只需要一次按索引的查询。
+
+    Functions:
+    - add: 加入待爬取的视频，已存在的视频保持原状态
+    - import_csv: 从现有的 csv 文件导入爬取进度
+    - lease: 取出下一批待爬取的视频，设置了 lease_ttl 时租约到期后可被其他进程收回
+    - renew: 延长本进程持有的租约
+    - reclaim_expired: 将租约已到期的视频放回待爬取
+    - mark_done / mark_useless / mark_failed: 更新视频的爬取状态
+    - reset_leased: 将上次运行中断时未完成的视频放回待爬取
+    - counts: 各状态的视频数量
+    """
+
+    def __init__(
+        self,
+        path: str = FRONTIER_PATH,
+        max_attempts: int = 3,
+        owner: Optional[str] = None,
+        lease_ttl: Optional[float] = None,
+    ):
+        """
+        - path: str - 数据库文件路径
+        - max_attempts: int - 同一个视频最多尝试的次数，超过后标记为 failed
+        - owner: str - 本进程的标识，多个进程共用一个数据库时用于区分租约
+        - lease_ttl: float - 租约的有效期，单位秒；为None时租约不会过期，
+            只能由 reset_leased 放回，适用于只有一个进程的情况
+        """
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.owner = owner
+        self.lease_ttl = lease_ttl
+        # 同一个连接在多个工作线程之间共享，写操作用锁串行化
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(frontier);")}
+        for name, kind in LEASE_COLUMNS.items():
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE frontier ADD COLUMN {name} {kind};")
+
+    @contextmanager
+    def _transaction(self):
+        """加锁并开启写事务，出错时回滚"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE;")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK;")
+                raise
+            else:
+                self.conn.execute("COMMIT;")
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def add(self, pairs: Iterable[tuple[str, str]]) -> int:
+        """加入待爬取的 (uid, bv)，返回新加入的数量"""
+        now = time.time()
+        rows = [(str(uid), str(bv), now, now) for uid, bv in pairs]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO frontier (uid, bv, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?);",
+                rows,
+            )
+            return conn.total_changes - before
+
+    def add_space_bv(self, space_bv: pd.DataFrame) -> int:
+        """加入宽格式（列名为uid，每列为该用户的BV号）的待爬取数据"""
+        melted = space_bv.melt(var_name="uid", value_name="bv").dropna()
+        return self.add(melted.itertuples(index=False, name=None))
+
+    def import_csv(
+        self,
+        space_bv_path: str = f"{SCRP_PATH}\\space_bv.csv",
+        detail_path: str = f"{SCRP_PATH}\\detail.csv",
+        useless_path: str = f"{SCRP_PATH}\\useless.csv",
+    ) -> int:
+        """从现有的 csv 文件导入爬取进度，只需在数据库为空时执行一次"""
+        added = self.add_space_bv(pd.read_csv(space_bv_path, index_col=0))
+
+        if os.path.exists(detail_path):
+            detail = pd.read_csv(detail_path, usecols=["uid", "bv"], dtype=str)
+            pairs = detail[["uid", "bv"]].itertuples(index=False, name=None)
+            self._set_status(pairs, DONE)
+
+        if os.path.exists(useless_path):
+            useless = pd.read_csv(useless_path, usecols=["bv"], dtype=str)["bv"]
+            with self._transaction() as conn:
+                conn.executemany(
+                    "UPDATE frontier SET status = ?, updated_at = ? WHERE bv = ?;",
+                    [(USELESS, time.time(), bv) for bv in useless],
+                )
+
+        logger.info(f"已从csv文件导入 {added} 个视频，当前状态：{self.counts()}")
+        return added
+
+    def lease(self, n: int) -> list[tuple[str, str]]:
+        """取出最早加入的 n 个待爬取视频，并标记为 leased；租约已到期的视频先被收回"""
+        now = time.time()
+        expires = None if self.lease_ttl is None else now + self.lease_ttl
+        with self._transaction() as conn:
+            self._reclaim(conn, now)
+            rows = conn.execute(
+                "SELECT uid, bv FROM frontier WHERE status = ? "
+                "ORDER BY created_at LIMIT ?;",
+                (PENDING, n),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE frontier SET status = ?, attempts = attempts + 1, "
+                "lease_owner = ?, lease_expires = ?, "
+                "updated_at = ? WHERE uid = ? AND bv = ?;",
+                [(LEASED, self.owner, expires, now, uid, bv) for uid, bv in rows],
+            )
+        return rows
+
+    def renew(self) -> int:
+        """延长本进程持有的所有租约，返回延长的视频数；未设置 lease_ttl 时不做任何事"""
+        if self.lease_ttl is None:
+            return 0
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE frontier SET lease_expires = ? "
+                "WHERE status = ? AND lease_owner IS ?;",
+                (now + self.lease_ttl, LEASED, self.owner),
+            )
+            return cursor.rowcount
+
+    def _reclaim(self, conn: sqlite3.Connection, now: float) -> int:
+        cursor = conn.execute(
+            "UPDATE frontier SET status = ?, lease_owner = NULL, lease_expires = NULL, "
+            "updated_at = ? WHERE status = ? AND lease_expires < ?;",
+            (PENDING, now, LEASED, now),
+        )
+        if cursor.rowcount:
+            logger.info(f"收回 {cursor.rowcount} 个租约已到期的视频")
+        return cursor.rowcount
+
+    def reclaim_expired(self) -> int:
+        """将租约已到期的视频放回待爬取，返回收回的数量"""
+        with self._transaction() as conn:
+            return self._reclaim(conn, time.time())
+
+    def _set_status(self, pairs: Iterable[tuple[str, str]], status: str):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE frontier SET status = ?, updated_at = ?, "
+                "lease_owner = NULL, lease_expires = NULL "
+                "WHERE uid = ? AND bv = ?;",
+                [(status, now, str(uid), str(bv)) for uid, bv in pairs],
+            )
+
+    def mark_done(self, pairs: Iterable[tuple[str, str]]):
+        self._set_status(pairs, DONE)
+
+    def mark_useless(self, uid: str, bv: str):
+        self._set_status([(uid, bv)], USELESS)
+
+    def mark_failed(self, uid: str, bv: str):
+        """爬取失败，尝试次数未达上限时放回待爬取，否则标记为 failed"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE frontier SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, "
+                "lease_owner = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE uid = ? AND bv = ?;",
+                (self.max_attempts, PENDING, FAILED, time.time(), str(uid), str(bv)),
+            )
+
+    def reset_leased(self) -> int:
+        """
+        将上次运行中断时仍为 leased 的视频放回待爬取。
+        多个进程共用数据库时，只放回本进程或没有租约期限的视频，其他进程的租约到期后自动收回
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE frontier SET status = ?, updated_at = ?, "
+                "lease_owner = NULL, lease_expires = NULL "
+                "WHERE status = ? AND (lease_expires IS NULL OR lease_owner IS ?);",
+                (PENDING, time.time(), LEASED, self.owner),
+            )
+            return cursor.rowcount
+
+    def pending(self) -> int:
+        return self._query(
+            "SELECT COUNT(*) FROM frontier WHERE status = ?;", (PENDING,)
+        )[0][0]
+
+    def counts(self) -> dict[str, int]:
+        return dict(
+            self._query("SELECT status, COUNT(*) FROM frontier GROUP BY status;")
+        )
+
+    def is_empty(self) -> bool:
+        return not self._query("SELECT 1 FROM frontier LIMIT 1;")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -4,52 +4,147 @@ import os
 sys.path.append(os.getcwd())
 from global_utils import logger
 from nameToSpace import name_to_space
-from spaceToBV import space_to_bv
-from multithreadingDetail import multithreading_to_detail, to_do
+from spaceToBV import space_to_bv, refresh_space_bv
+from multithreadingDetail import multithreading_to_detail
 from pandas import DataFrame
 import pandas as pd
 from scraping.scraping_utils import SCRP_PATH
+from scraping.frontier import Frontier
+from scraping.name_cache import NameCache
+from scraping.rate_control import RateController
+from scraping.distributed import run_local, merge_shards
+from scraping.pipeline import STREAM_MARKER, stream
 
 
-def main(max_workers: int = 2):
-    """串联各个模块的主函数"""
-    if not os.path.exists(f"{SCRP_PATH}\\info.csv"):
-        try:
-            logger.info("正在获取用户名和用户主页地址...")
-            # 读取用户名
-            with open(f"{SCRP_PATH}\\name.csv", "r", encoding="utf-8") as f:
-                names = pd.read_csv(f, header=None)[0]
-        except FileNotFoundError as e:
-            logger.error(
-                "name.csv文件不存在，请先创建name.csv文件。\
-                \n添加您想要了解的B站用户的用户名，每个用户名占一行。\
-                \n每行结尾用英文逗号分隔，最后一个用户名后不要加英文逗号。"
-            )
-            raise
-
-        # 获取用户名对应的用户主页地址
-        name_space: DataFrame = name_to_space(names=names)
+def main(
+    max_workers: int = 6,
+    backend: str = "selenium",
+    refresh: bool = False,
+    processes: int = 1,
+    streaming: bool = True,
+):
+    """
+    串联各个模块的主函数
+
+    - max_workers: int - 各阶段的并发数上限，实际并发数和请求速率由 RateController
+        根据延迟、超时和验证窗口自动调整，不需要手动调节
+    - backend: str - 视频信息的抓取后端，'selenium' 或 'http'
+    - refresh: bool - space_bv.csv 已存在时，是否增量获取各用户的新视频
+    - processes: int - 爬取视频信息的工作进程数，大于 1 时各进程租用视频并写入各自的分片，
+        结束后合并到 detail.csv；其他机器可以对同一个数据库执行 distributed.run_worker 加入爬取
+    - streaming: bool - 首次爬取（space_bv.csv 不存在）时三个阶段同时运行，
+        先发现的视频立即开始爬取，不再等待前一阶段全部完成
+    """
+    # 各阶段共用一个限速器，前一阶段摸索出的并发数和速率直接沿用到下一阶段
+    controller = RateController(max_workers)
+    cache = NameCache()
+    if os.path.exists(f"{SCRP_PATH}\\info.csv") and not cache.get_many(
+        pd.read_csv(f"{SCRP_PATH}\\info.csv", index_col=0)["name"].dropna()
+    ):
+        # 首次使用缓存时从已有的info.csv导入，避免重新解析所有用户名
+        cache.seed_from_info(f"{SCRP_PATH}\\info.csv")
+
+    if (
+        streaming
+        and processes == 1
+        and os.path.exists(f"{SCRP_PATH}\\name.csv")
+        and (
+            not os.path.exists(f"{SCRP_PATH}\\space_bv.csv")
+            # 上次的流水线中途退出，space_bv.csv 只保存了部分用户
+            or os.path.exists(STREAM_MARKER)
+        )
+    ):
+        with open(f"{SCRP_PATH}\\name.csv", "r", encoding="utf-8") as f:
+            names = pd.read_csv(f, header=None)[0]
+        # 用户名、投稿列表和视频信息三个阶段同时运行，总耗时接近最慢的阶段
+        stream(
+            names,
+            detail_workers=max_workers,
+            backend=backend,
+            controller=controller,
+            cache=cache,
+        )
+        cache.close()
+        logger.info("所有视频信息已保存至detail.csv，视频爬取完毕")
+        return
+
+    if os.path.exists(f"{SCRP_PATH}\\name.csv"):
+        logger.info("正在获取用户名和用户主页地址...")
+        # 读取用户名
+        with open(f"{SCRP_PATH}\\name.csv", "r", encoding="utf-8") as f:
+            names = pd.read_csv(f, header=None)[0]
+        # 获取用户名对应的用户主页地址，只有未命中缓存的用户名需要打开浏览器解析
+        name_space: DataFrame = name_to_space(
+            names=names, max_workers=max_workers, cache=cache, controller=controller
+        )
         # 将用户名和用户主页地址保存至csv文件
         name_space.to_csv(f"{SCRP_PATH}\\info.csv")
         logger.info("用户名和用户主页地址已保存至info.csv。")
+    elif not os.path.exists(f"{SCRP_PATH}\\info.csv"):
+        logger.error(
+            "name.csv文件不存在，请先创建name.csv文件。\
+            \n添加您想要了解的B站用户的用户名，每个用户名占一行。\
+            \n每行结尾用英文逗号分隔，最后一个用户名后不要加英文逗号。"
+        )
+        raise FileNotFoundError(f"{SCRP_PATH}\\name.csv")
+    cache.close()
 
+    name_space = pd.read_csv(f"{SCRP_PATH}\\info.csv", index_col=0)
+    new_bv = None
     if not os.path.exists(f"{SCRP_PATH}\\space_bv.csv"):
         # 获取用户主页地址对应的视频BV号
-        space_bv: DataFrame = space_to_bv(spaces=name_space["space"].dropna())
+        space_bv: DataFrame = space_to_bv(
+            spaces=name_space["space"].dropna(),
+            max_workers=max_workers,
+            controller=controller,
+        )
         # 将用户主页地址和视频BV号保存至csv文件
         space_bv.to_csv(f"{SCRP_PATH}\\space_bv.csv")
         logger.info("用户uid和视频BV号已保存至space_bv.csv。")
+    elif refresh:
+        # 只获取每个用户比已知视频更新的投稿
+        new_bv = refresh_space_bv(
+            name_space["space"].dropna(),
+            f"{SCRP_PATH}\\space_bv.csv",
+            max_workers=max_workers,
+            controller=controller,
+        )
+
+    frontier = Frontier()
+    if frontier.is_empty():
+        # 首次运行时从csv文件导入爬取进度
+        frontier.import_csv()
+    elif new_bv is not None:
+        frontier.add_space_bv(new_bv)
+    # 上次运行中断时未完成的视频重新放回待爬取
+    frontier.reset_leased()
+
+    if processes > 1:
+        frontier.close()
+        # 每个进程各自限速，并发数上限平分给各个进程
+        run_local(
+            processes,
+            max_workers=max(1, max_workers // processes),
+            backend=backend,
+        )
+        merge_shards()
+        logger.info("所有视频信息已保存至detail.csv，视频爬取完毕")
+        return
 
-    # 获取待爬取的视频BV号
-    bv_need_detail: DataFrame = to_do()
-    # 多线程爬取视频信息
-    while not bv_need_detail.empty:
+    # 多线程爬取视频信息，失败的视频在尝试次数上限内会被放回待爬取
+    while frontier.pending() > 0:
         multithreading_to_detail(
-            df=bv_need_detail, chunk_size=10, max_workers=max_workers
+            frontier=frontier,
+            chunk_size=10,
+            max_workers=max_workers,
+            backend=backend,
+            controller=controller,
         )
-        bv_need_detail = to_do()
+    frontier.close()
 
     logger.info("所有视频信息已保存至detail.csv，视频爬取完毕")
 
 
-main(3)
+# 多进程爬取时子进程会重新导入本模块（Windows 使用 spawn 方式启动进程），只在主进程中运行
+if __name__ == "__main__":
+    main()
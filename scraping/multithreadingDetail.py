@@ -3,166 +3,302 @@ import os
 
 sys.path.append(os.getcwd())
 from global_utils import logger
-from pandas import DataFrame
-import pandas as pd
-from BVToDetail import bv_to_detail
+from scraping.BVToDetail import USELESS_PATH, fetch_one
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from queue import Queue
-from selenium import webdriver
+from queue import Queue, Empty
+from selenium.common.exceptions import WebDriverException
 import threading
-from scraping.scraping_utils import SCRP_PATH
+import time
+from typing import Optional
+from scraping.scraping_utils import (
+    SCRP_PATH,
+    report_stats,
+)
+from scraping.detail_backends import (
+    BACKENDS,
+    FetchError,
+    HttpBackend,
+    SeleniumBackend,
+)
+from scraping.records import RecordBuffer, VideoRecord
+from scraping.normalize import append_detail
+from scraping.browser_pool import BrowserPool
+from scraping.driver_factory import PROFILE_PATH, DriverFactory
+from scraping.frontier import Frontier
+from scraping.rate_control import RateController
 
 
-def to_do() -> DataFrame:
-    """获取待爬取的视频BV号"""
-    # 读取数据
-    space_bv = pd.read_csv(f"{SCRP_PATH}\\space_bv.csv", index_col=0)
-
-    # 判断是否存在已经爬取的视频，也不存在归类为无用的视频
-    if not os.path.exists(f"{SCRP_PATH}\\detail.csv") and not os.path.exists(
-        f"{SCRP_PATH}\\useless.csv"
-    ):
-        return space_bv
-    # 如果存在已经爬取的视频
-    else:
-        try:
-            detail = pd.read_csv(f"{SCRP_PATH}\\detail.csv")
-            bv = detail["bv"]
-        except FileNotFoundError:
-            bv = []
+# 收集结果并写入文件的函数
+def collect_results_and_write_to_file(
+    output_queue: Queue[VideoRecord],
+    output_file: str,
+    frontier: Optional[Frontier] = None,
+    batch_size: int = 20,
+    flush_interval: float = 5.0,
+):
+    """
+    写入线程：工作线程每获取一个视频就放入队列，本线程攒够 batch_size 条，
+    或距上次写入超过 flush_interval 秒时写入一次文件
 
-        try:
-            useless = pd.read_csv(f"{SCRP_PATH}\\useless.csv")
-            useless_bv = useless["bv"]
-        except FileNotFoundError:
-            useless_bv = []
+    - output_queue: Queue - 每个元素为一条视频详情，None 为结束信号
+    - frontier: Frontier - 若传入，则在写入文件后把视频标记为完成
+    """
+    # 列式缓冲区，写入时才转换为 DataFrame
+    buffer = RecordBuffer()
+    last_flush = time.monotonic()
 
-        # 去除已经爬取的视频和无用的视频
-        for uid in space_bv.columns:
-            space_bv[uid] = space_bv[uid][~space_bv[uid].isin(bv)]
-            space_bv[uid] = space_bv[uid][~space_bv[uid].isin(useless_bv)]
-            space_bv[uid] = space_bv[uid].dropna().reset_index(drop=True)
+    def flush():
+        nonlocal last_flush
+        last_flush = time.monotonic()
+        if not len(buffer):
+            return
+        # 原始文本写入 *_raw.csv，规范化后的结果写入 output_file
+        append_detail(buffer.to_frame(), output_file)
+        if frontier is not None:
+            # 写入文件后才标记为完成，中途崩溃的视频下次会重新爬取
+            frontier.mark_done(buffer.pairs())
+        buffer.clear()
 
-        # 返回仍需要爬取的视频
-        return space_bv
+    while True:
+        timeout = max(0.0, flush_interval - (time.monotonic() - last_flush))
+        try:
+            record = output_queue.get(timeout=timeout)  # 从队列中获取结果
+        except Empty:
+            # 爬取较慢时按时间写入，磁盘上的进度持续更新
+            flush()
+            continue
+        if record is None:  # 接收到结束信号
+            output_queue.task_done()
+            break
+        buffer.append(record)
+        if len(buffer) >= batch_size:
+            flush()
+        output_queue.task_done()
+    flush()
 
 
-def preprocess_data(df: DataFrame, chunk_size: int) -> list:
-    """预处理数据，将数据切割成块，以便多线程爬取"""
-    if df.empty:
-        logger.info("没有需要爬取的视频，可能是所有视频都已经爬取完毕。")
-        return
-    elif chunk_size <= 0:
-        logger.error("块大小必须大于0。")
-        return
+# 初始化浏览器实例池
+def init_browser_pool(
+    size: int,
+    lean: bool = True,
+    capture: bool = True,
+    profile: str = "detail",
+    profile_root: str = PROFILE_PATH,
+) -> BrowserPool:
+    # 开启性能日志，浏览器后端可以直接读取视频页请求到的接口响应；
+    # 每个浏览器复用一个持久化的用户目录，所有浏览器在后台同时启动
+    factory = DriverFactory(profile, lean, capture, root=profile_root)
+    return BrowserPool(size, factory=factory)
 
-    bv_chunks = []  # 存储切割后的BV号块
 
-    # 先将数据转换成长格式
-    melted_df = df.melt(var_name="uid", value_name="bv")
-    melted_df.dropna(inplace=True)
-    melted_df.reset_index(drop=True, inplace=True)
+def fetch_detail(
+    uid: str,
+    bv: str,
+    frontier: Frontier,
+    http: Optional[HttpBackend] = None,
+    pool: Optional[BrowserPool] = None,
+    navigation: str = "direct",
+    extraction: str = "network",
+    useless_path: str = USELESS_PATH,
+) -> VideoRecord | None:
+    """
+    使用 HTTP 后端，或从浏览器池借用一个浏览器获取单个视频。
+    获取失败时抛出 FetchError（已在爬取队列中记为失败），浏览器层面的错误也会继续抛出
+    """
+    if http is not None:
+        return fetch_one(http, uid, bv, frontier, True, useless_path)
 
-    # 获取转换后的DataFrame的总行数
-    num_rows = melted_df.shape[0]
-    logger.info(f"剩余 {num_rows} 个视频需要爬取")
+    pooled = pool.acquire()
+    failed = False
+    try:
+        if pooled.backend is None:
+            pooled.backend = SeleniumBackend(
+                pooled.driver,
+                navigation=navigation,
+                extraction=extraction,
+            )
+        return fetch_one(pooled.backend, uid, bv, frontier, True, useless_path)
+    except WebDriverException as e:
+        # 浏览器层面的错误，归还时检查浏览器状态，必要时重启
+        failed = True
+        logger.error(f"浏览器 {pooled.slot} 发生错误：{e.msg}，相关视频：{bv}")
+        raise
+    finally:
+        pool.release(pooled, failed)
 
-    for i in range(0, num_rows, chunk_size):
-        logger.debug(f"{i}==============================")
-        chunk = melted_df.iloc[i : i + chunk_size].copy()  # 切割chunk大小的块
-        chunk.reset_index(drop=True, inplace=True)  # 重置索引
-        # 将切割后的块再次转换成宽格式
-        chunk_pivot = chunk.pivot(columns="uid", values="bv")
-        logger.debug(chunk_pivot)
-        bv_chunks.append(chunk_pivot)
 
-    return bv_chunks
+def detail_worker(
+    frontier: Frontier,
+    output_queue: Queue,
+    pool: Optional[BrowserPool] = None,
+    lease_size: int = 10,
+    navigation: str = "direct",
+    extraction: str = "network",
+    controller: Optional[RateController] = None,
+    upstream: Optional[threading.Event] = None,
+    poll_interval: float = 1.0,
+    useless_path: str = USELESS_PATH,
+):
+    """
+    工作线程：不断从爬取队列中取出视频逐个爬取，直到没有待爬取的视频
 
+    - frontier: Frontier - 爬取队列，所有工作线程共享
+    - output_queue: Queue - 写入线程的队列，每获取一个视频立即放入
+    - pool: BrowserPool - 浏览器池，为None时使用 HTTP 后端
+    - lease_size: int - 每次从爬取队列取出的视频数量
+    - navigation: str - 浏览器后端的导航方式，'direct' 直接打开视频页，'search' 经由搜索页
+    - extraction: str - 浏览器后端的提取方式，'network' 读取页面的接口响应，'dom' 解析页面元素
+    - controller: RateController - 限速器，每个视频占用一个并发名额和一个令牌
+    - upstream: threading.Event - 上游阶段结束的信号；未结束时爬取队列暂时为空也继续等待新视频
+    - useless_path: str - 不存在的视频写入的文件
+    """
+    http = HttpBackend() if pool is None else None
+    controller = RateController(1) if controller is None else controller
 
-# 收集结果并写入文件的函数
-def collect_results_and_write_to_file(output_queue: Queue[DataFrame], output_file: str):
     while True:
-        result_df = output_queue.get()  # 从队列中获取结果
-        if result_df is None:  # 接收到结束信号
+        leased = frontier.lease(lease_size)
+        if not leased:
+            if upstream is not None and not upstream.is_set():
+                # 上游仍在发现新视频，等待其加入爬取队列
+                upstream.wait(poll_interval)
+                continue
             break
-        header = not os.path.exists(output_file)
-        result_df.to_csv(output_file, mode="a", header=header)
-        output_queue.task_done()
-
-
-# 初始化浏览器实例池
-def init_browser_pool(size: int) -> list[webdriver.Chrome]:
-    pool = []
-
-    for _ in range(size):
-        # 创建一个ChromeDriver实例
-        cService = webdriver.ChromeService(
-            executable_path="F:\chromedriver\chromedriver-win64\chromedriver.exe"
-        )
-        driver = webdriver.Chrome(service=cService)
-        pool.append(driver)
-    return pool
 
+        for uid, bv in leased:
+            try:
+                with controller.slot():
+                    data = fetch_detail(
+                        uid,
+                        bv,
+                        frontier,
+                        http,
+                        pool,
+                        navigation,
+                        extraction,
+                        useless_path,
+                    )
+            except FetchError:
+                # 已在爬取队列中记为失败；在 slot 内抛出，限速器将其计为错误并据此降速
+                data = None
+            except WebDriverException:
+                frontier.mark_failed(uid, bv)
+                data = None
+            except Exception as e:
+                logger.error(f"发生错误：{e}，相关视频：{bv}")
+                frontier.mark_failed(uid, bv)
+                data = None
 
-# 浏览器实例分配函数
-def get_browser(pool: list, lock: threading.Lock) -> webdriver.Chrome:
-    with lock:
-        if pool:
-            return pool.pop(0)  # 从池中取出一个浏览器实例
-        else:
-            return None  # 池为空时返回 None
+            if data is not None:
+                # 逐条交给写入线程，工作线程中不再积攒结果
+                output_queue.put(data)
+            # 多进程爬取时，每完成一个视频就延长本进程的租约，避免慢速的批次被其他进程收回
+            frontier.renew()
 
+    if http is not None:
+        http.close()
 
-# 浏览器实例归还函数
-def return_browser(pool: list, lock: threading.Lock, browser: webdriver.Chrome):
-    with lock:
-        pool.append(browser)  # 将浏览器实例归还到池中
 
+def multithreading_to_detail(
+    frontier: Frontier,
+    chunk_size: int,
+    max_workers: int = 4,
+    backend: str = "selenium",
+    navigation: str = "direct",
+    extraction: str = "network",
+    flush_interval: float = 5.0,
+    controller: Optional[RateController] = None,
+    output_file: str = f"{SCRP_PATH}\\detail.csv",
+    upstream: Optional[threading.Event] = None,
+    profile: str = "detail",
+    profile_root: str = PROFILE_PATH,
+    useless_path: str = USELESS_PATH,
+):
+    """
+    多线程爬取视频信息。工作线程共享同一个爬取队列，
+    每个工作线程借用长期存活的浏览器，逐个取出视频爬取，直到没有待爬取的视频。
 
-def multithreading_to_detail(df: DataFrame, chunk_size: int, max_workers: int = 4):
-    """多线程爬取视频信息"""
+    - frontier: Frontier - 爬取队列
+    - chunk_size: int - 写入线程每凑够多少条数据写入一次文件
+    - flush_interval: float - 数据不足 chunk_size 条时，最多间隔多少秒写入一次
+    - backend: str - 抓取后端，'selenium' 使用浏览器实例池，'http' 直接请求接口，不启动浏览器
+    - navigation: str - 浏览器后端的导航方式，'direct' 直接打开视频页，'search' 经由搜索页
+    - extraction: str - 浏览器后端的提取方式，'network' 读取页面的接口响应，'dom' 解析页面元素
+    - controller: RateController - 各阶段共用的限速器，为None时新建一个，
+        实际并发数在 1 到 max_workers 之间自动调整
+    - output_file: str - 视频信息的保存路径
+    - upstream: threading.Event - 上游阶段结束的信号，与上游同时运行时传入，
+        信号发出前工作线程不会因为爬取队列暂时为空而退出
+    - profile: str - 浏览器用户目录名的前缀，多个进程同时爬取时应各不相同
+    - profile_root: str - 浏览器用户目录所在的目录
+    - useless_path: str - 不存在的视频写入的文件
+    """
     # 参数验证
-    if df.empty:
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的抓取后端：{backend}，可选：{list(BACKENDS)}")
+    pending = frontier.pending()
+    if pending == 0 and upstream is None:
         logger.info("没有需要爬取的视频，可能是所有视频都已经爬取完毕。")
         return
     elif chunk_size <= 0:
         logger.error("块大小必须大于0。")
         return
+    logger.info(f"剩余 {pending} 个视频需要爬取")
+    if controller is None:
+        controller = RateController(max_workers)
 
-    bv_chunks = preprocess_data(df, chunk_size)
-    output_queue = Queue()  # 创建队列
+    # 有界队列，写入落后时工作线程阻塞等待，内存占用保持平稳
+    output_queue = Queue(maxsize=chunk_size * 10)
+    # 启动写入线程
+    writer_thread = threading.Thread(
+        target=collect_results_and_write_to_file,
+        args=(
+            output_queue,
+            output_file,
+            frontier,
+            chunk_size,
+            flush_interval,
+        ),
+    )
+    writer_thread.start()
 
-    lock = threading.Lock()
-    browser_pool = init_browser_pool(max_workers)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 启动写入线程
-        writer_thread = threading.Thread(
-            target=collect_results_and_write_to_file,
-            args=(output_queue, f"{SCRP_PATH}\\detail.csv"),
+    pool = (
+        init_browser_pool(
+            max_workers,
+            capture=extraction == "network",
+            profile=profile,
+            profile_root=profile_root,
         )
-        writer_thread.start()
-
-        futures = {}
-        for chunk in bv_chunks:
-            browser = get_browser(browser_pool, lock)
-            if browser is not None:
-                future = executor.submit(
-                    bv_to_detail, df=chunk, driver=browser, output_size=20, multi=True
+        if backend == "selenium"
+        else None
+    )
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    detail_worker,
+                    frontier,
+                    output_queue,
+                    pool,
+                    navigation=navigation,
+                    extraction=extraction,
+                    controller=controller,
+                    upstream=upstream,
+                    useless_path=useless_path,
                 )
-                futures[future] = browser  # 存储 future 与对应的浏览器实例
-
-        # 处理任务结果
-        for future in as_completed(futures):
-            browser = futures[future]
-            try:
-                result = future.result()  # 获取任务结果
-                output_queue.put(result)  # 将结果放入队列
-            except Exception as e:
-                logger.error(f"任务执行过程中发生错误: {e}")
-            finally:
-                return_browser(browser_pool, lock, browser)  # 任务完成后归还浏览器实例
-
-    # 发送结束信号到队列
-    output_queue.put(None)
-    writer_thread.join()  # 等待写入线程完成
+                for _ in range(max_workers)
+            ]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"任务执行过程中发生错误: {e}")
+    finally:
+        if pool is not None:
+            logger.info(f"浏览器池共重启 {pool.restarts} 次")
+            pool.close()
+            report_stats()
+        controller.report()
+        # 发送结束信号到队列
+        output_queue.put(None)
+        writer_thread.join()  # 等待写入线程完成
+        logger.info(f"爬取状态：{frontier.counts()}")
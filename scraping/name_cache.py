@@ -0,0 +1,112 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from scraping.scraping_utils import uid_of
+from scraping.frontier import FRONTIER_PATH
+from typing import Iterable, Optional
+import pandas as pd
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS name_cache (
+    name TEXT PRIMARY KEY,
+    uid TEXT,
+    space TEXT,
+    fans INTEGER,
+    resolved_at REAL NOT NULL
+);
+"""
+
+
+class NameCache:
+    """
+    用户名到 (uid, 主页地址, 粉丝数, 解析时间) 的持久化缓存，超过有效期的记录视为未命中。
+    没有找到主页地址的记录可能只是页面加载超时，有效期较短
+
+    Functions:
+    - get_many: 查询未过期的缓存
+    - misses: 需要重新解析的用户名
+    - put: 写入一条解析结果
+    - seed_from_info: 从已有的 info.csv 导入缓存
+    """
+
+    def __init__(
+        self,
+        path: str = FRONTIER_PATH,
+        ttl_days: float = 30,
+        negative_ttl_hours: float = 6,
+    ):
+        """
+        - path: str - 数据库文件路径，与爬取队列共用
+        - ttl_days: float - 缓存有效期，粉丝数会变化，过期后重新解析
+        - negative_ttl_hours: float - 没有找到主页地址的记录的有效期
+        """
+        self.ttl = ttl_days * 24 * 3600
+        self.negative_ttl = negative_ttl_hours * 3600
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            str(path), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.executescript(SCHEMA)
+
+    def get_many(
+        self, names: Iterable[str], now: Optional[float] = None
+    ) -> dict[str, dict]:
+        """返回未过期的缓存，键为用户名"""
+        now = time.time() if now is None else now
+        names = list(dict.fromkeys(names))
+        hits = {}
+        with self.lock:
+            # SQLite 单条语句的参数个数有限，分批查询
+            for i in range(0, len(names), 500):
+                batch = names[i : i + 500]
+                rows = self.conn.execute(
+                    "SELECT name, uid, space, fans, resolved_at FROM name_cache "
+                    "WHERE resolved_at > CASE WHEN space = '' THEN ? ELSE ? END "
+                    f"AND name IN ({', '.join('?' * len(batch))});",
+                    (now - self.negative_ttl, now - self.ttl, *batch),
+                ).fetchall()
+                for name, uid, space, fans, resolved_at in rows:
+                    hits[name] = {
+                        "uid": uid,
+                        "space": space,
+                        "fans": fans,
+                        "resolved_at": resolved_at,
+                    }
+        return hits
+
+    def misses(self, names: Iterable[str], now: Optional[float] = None) -> list[str]:
+        names = list(dict.fromkeys(names))
+        hits = self.get_many(names, now)
+        return [name for name in names if name not in hits]
+
+    def put(
+        self, name: str, space: str, fans: int, resolved_at: Optional[float] = None
+    ):
+        resolved_at = time.time() if resolved_at is None else resolved_at
+        uid = uid_of(space) if space else None
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO name_cache (name, uid, space, fans, resolved_at) "
+                "VALUES (?, ?, ?, ?, ?);",
+                (name, uid, space, int(fans), resolved_at),
+            )
+
+    def seed_from_info(self, info_path: str) -> int:
+        """从已有的 info.csv 导入缓存，解析时间取文件的修改时间"""
+        info = pd.read_csv(info_path, index_col=0).dropna(subset=["name"])
+        resolved_at = os.path.getmtime(info_path)
+        for row in info.itertuples(index=False):
+            space = row.space if isinstance(row.space, str) else ""
+            fans = 0 if pd.isna(row.fans) else row.fans
+            self.put(row.name, space, fans, resolved_at)
+        logger.info(f"已从 {info_path} 导入 {len(info)} 条用户缓存")
+        return len(info)
+
+    def close(self):
+        self.conn.close()
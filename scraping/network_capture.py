@@ -0,0 +1,83 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from selenium import webdriver
+from scraping.replay import REPLAY
+import base64
+import json
+
+# 视频页在后台请求的接口，键为响应的类别，值为地址中的特征片段
+VIDEO_RESPONSES = {
+    "view": (
+        "/x/web-interface/view?",
+        "/x/web-interface/wbi/view?",
+        "/x/web-interface/view/detail?",
+        "/x/web-interface/wbi/view/detail?",
+    ),
+    "tags": (
+        "/x/tag/archive/tags?",
+        "/x/web-interface/view/detail/tag?",
+    ),
+}
+
+
+def enable_performance_log(options: webdriver.ChromeOptions) -> webdriver.ChromeOptions:
+    """开启 Chrome 的性能日志，日志中包含页面的所有网络事件"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+def json_responses(
+    driver: webdriver.Chrome, patterns: dict[str, tuple[str, ...]]
+) -> dict[str, list[tuple[str, dict]]] | None:
+    """
+    读取自上次调用以来页面收到的 JSON 响应，性能日志读取后即被清空
+
+    Args:
+    - driver: webdriver.Chrome, 需要开启性能日志
+    - patterns: dict[str, tuple], 响应的类别到地址特征片段的映射
+
+    Returns:
+    - dict[str, list[tuple[str, dict]]]: 类别到 (地址, 响应体) 列表的映射，未开启性能日志时为 None
+    """
+    try:
+        entries = driver.get_log("performance")
+    except Exception as e:
+        logger.debug(f"无法读取性能日志：{e}")
+        return None
+
+    found = {}
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        if message["method"] != "Network.responseReceived":
+            continue
+        response = message["params"]["response"]
+        url = response["url"]
+        name = next(
+            (name for name, parts in patterns.items() if any(p in url for p in parts)),
+            None,
+        )
+        if name is None or "json" not in response.get("mimeType", ""):
+            continue
+        body = response_body(driver, message["params"]["requestId"])
+        if body is not None:
+            REPLAY.record_response(url, body)
+            found.setdefault(name, []).append((url, body))
+    return found
+
+
+def response_body(driver: webdriver.Chrome, request_id: str) -> dict | None:
+    """通过 CDP 读取某个请求的响应体，请求已被浏览器释放或不是 JSON 时返回 None"""
+    try:
+        result = driver.execute_cdp_cmd(
+            "Network.getResponseBody", {"requestId": request_id}
+        )
+        body = result["body"]
+        if result.get("base64Encoded"):
+            body = base64.b64decode(body).decode("utf-8")
+        return json.loads(body)
+    except Exception as e:
+        logger.debug(f"无法读取响应体 {request_id}：{e}")
+        return None
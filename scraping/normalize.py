@@ -0,0 +1,244 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from scraping.scraping_utils import COUNT_UNITS
+from scraping.records import NUMERIC_COLUMNS, RecordBuffer, VideoRecord
+from scraping.dataset import append_dataset, dataset_path
+from scraping.tag_index import TagIndex, tags_path
+from pandas import DataFrame, Series
+from typing import Iterable, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# 相对发布时间的单位，如 3小时前
+RELATIVE_UNITS = {"秒": 1, "分钟": 60, "小时": 3600, "天": 86400}
+RELATIVE_PATTERN = r"^(?P<number>\d+)\s*(?P<unit>秒|分钟|小时|天)前$"
+# 昨天 18:10、前天
+DAY_PATTERN = r"^(?P<day>昨天|前天)\s*(?P<time>\d{1,2}:\d{2})?$"
+DAYS_AGO = {"昨天": 1, "前天": 2}
+PUBTIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def as_text(values: Series) -> Series:
+    """转换为 Arrow 支持的字符串列，向量化字符串运算比 object 列快得多"""
+    return values.astype("string[pyarrow]").str.strip()
+
+
+def format_seconds(seconds: Series) -> Series:
+    """秒数 -> HH:MM:SS"""
+    seconds = seconds.astype("int64")
+    return (
+        (seconds // 3600).map("{:02d}".format)
+        + ":"
+        + (seconds % 3600 // 60).map("{:02d}".format)
+        + ":"
+        + (seconds % 60).map("{:02d}".format)
+    )
+
+
+def extract(text: Series, pattern: str) -> DataFrame:
+    """
+    与 Series.str.extract 相同，但只对不重复的值匹配正则。
+    同一批视频的相对发布时间大量重复（如 3小时前），逐行匹配是主要开销
+    """
+    codes, uniques = pd.factorize(text)
+    groups = Series(uniques, dtype=object).str.extract(pattern)
+    # 缺失值的编码为 -1，对应追加在末尾的一行缺失值
+    groups.loc[len(groups)] = pd.NA
+    return groups.iloc[codes].set_axis(text.index)
+
+
+def parse_counts(values: Series) -> Series:
+    """
+    批量将页面上的计数转换为整数，已经是整数的值保持不变
+
+    - 1.5万 -> 15000，2.3亿 -> 230000000，1,234 -> 1234
+    - 没有数字的文本（如数量为 0 时显示的“点赞”）-> 0
+    - 缺失值保持缺失
+    """
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values.astype("Int64")
+    # 直接使用 Arrow 的计算函数，整列只转换一次，不经过 Python 对象
+    text = pa.array(values.astype(object), pa.string(), from_pandas=True)
+    text = pc.utf8_trim_whitespace(pc.replace_substring(text, ",", ""))
+    unit = pa.scalar(float(COUNT_UNITS[""]))
+    for suffix, multiplier in COUNT_UNITS.items():
+        if suffix:
+            unit = pc.if_else(pc.ends_with(text, suffix), float(multiplier), unit)
+    number = pc.utf8_rtrim(text, "".join(COUNT_UNITS))
+    number = pc.if_else(
+        pc.match_substring_regex(number, r"^\d+(\.\d+)?$"),
+        number,
+        pa.scalar(None, pa.string()),
+    )
+    counts = pc.round(pc.multiply(pc.cast(number, pa.float64()), unit))
+    # 有文本但无法解析的值与 convert_to_int 一致，记为 0
+    counts = pc.if_else(pc.and_(pc.is_null(counts), pc.is_valid(text)), 0.0, counts)
+    counts = pc.cast(counts, pa.int64()).to_numpy(zero_copy_only=False)
+    return Series(counts, index=values.index, name=values.name).astype("Int64")
+
+
+def parse_durations(values: Series) -> Series:
+    """批量将时长统一为 HH:MM:SS，支持 MM:SS、HH:MM:SS 以及秒数，无法解析的值保持原样"""
+    text = as_text(values)
+    result = text.copy()
+    # 已经是 HH:MM:SS 的值保持不变
+    rest = ~text.str.fullmatch(r"\d{2}:[0-5]\d:[0-5]\d").fillna(True)
+    if not rest.any():
+        return result
+    # 其余格式（MM:SS、秒数等）大量重复，只换算不重复的值
+    codes, uniques = pd.factorize(text[rest])
+    uniques = Series(uniques, dtype=object)
+    parts = uniques.str.split(":", expand=True).reindex(columns=range(3))
+    parts = parts.apply(pd.to_numeric, errors="coerce")
+    colons = uniques.str.count(":")
+    seconds = parts[0].where(colons == 0)
+    seconds = seconds.fillna((parts[0] * 60 + parts[1]).where(colons == 1))
+    seconds = seconds.fillna(parts[0] * 3600 + parts[1] * 60 + parts[2])
+    valid = seconds.notna()
+    uniques[valid] = format_seconds(seconds[valid])
+    result[rest] = uniques.to_numpy()[codes]
+    return result
+
+
+def parse_pubtimes(values: Series, now) -> Series:
+    """
+    批量将发布时间统一为 YYYY-MM-DD HH:MM:SS，无法解析的值保持原样
+
+    支持：2024-01-12 18:10:00、2024-01-12、01-12（当年）、3小时前、刚刚、昨天 18:10、前天
+
+    - now: 爬取时间，相对时间以它为基准；可以是单个时间，也可以是与 values 对齐的 Series
+    """
+    text = as_text(values)
+    result = text.copy()
+    # 已经是标准格式的值保持不变，只解析其余的值
+    rest = ~text.str.fullmatch(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}").fillna(True)
+    if not rest.any():
+        return result
+    text = text[rest]
+    now = pd.Series(pd.to_datetime(now), index=values.index)[rest]
+
+    parsed = pd.to_datetime(text, format="%Y-%m-%d", errors="coerce")
+    short = text.str.fullmatch(r"\d{2}-\d{2}").fillna(False)
+    if short.any():
+        parsed[short] = pd.to_datetime(
+            now[short].dt.year.astype(str) + "-" + text[short],
+            format="%Y-%m-%d",
+            errors="coerce",
+        )
+
+    relative = extract(text, RELATIVE_PATTERN)
+    seconds = pd.to_numeric(relative["number"]) * relative["unit"].map(RELATIVE_UNITS)
+    parsed = parsed.fillna(now - pd.to_timedelta(seconds, unit="s"))
+    parsed = parsed.mask(parsed.isna() & text.eq("刚刚").fillna(False), now)
+
+    day = extract(text, DAY_PATTERN).dropna(subset=["day"])
+    if len(day):
+        date = now[day.index].dt.normalize()
+        date -= pd.to_timedelta(day["day"].map(DAYS_AGO), unit="D")
+        clock = pd.to_timedelta(day["time"].fillna("00:00") + ":00")
+        parsed[day.index] = parsed[day.index].fillna(date + clock)
+    parsed = parsed.dropna()
+
+    # 相对时间以同一个爬取时间为基准，结果大量重复，只格式化不重复的时间
+    codes, uniques = pd.factorize(parsed)
+    result[parsed.index] = uniques.strftime(PUBTIME_FORMAT)[codes]
+    return result
+
+
+def normalize_detail(df: DataFrame, now=None) -> DataFrame:
+    """
+    对整张表按列批量规范化计数、时长和发布时间，原始文本可保留在别处以便修改规则后重新规范化
+
+    - df: DataFrame - 列与 detail.csv 一致，计数列可以是整数或页面上的原始文本
+    - now: 爬取时间，用于解析相对发布时间；为None时优先使用 fetched_at 列，否则使用当前时间
+    """
+    if now is None:
+        now = df["fetched_at"] if "fetched_at" in df else pd.Timestamp.now()
+    df = df.drop(columns=["fetched_at"], errors="ignore")
+    for key in NUMERIC_COLUMNS:
+        df[key] = parse_counts(df[key])
+    df["duration"] = parse_durations(df["duration"])
+    df["pubtime"] = parse_pubtimes(df["pubtime"], now)
+    return df
+
+
+def normalize_records(records: Iterable[VideoRecord], now=None) -> DataFrame:
+    """将若干条记录规范化为以 bv 为索引的 DataFrame"""
+    buffer = RecordBuffer()
+    buffer.extend(records)
+    return normalize_detail(buffer.to_frame(), now)
+
+
+def raw_path(output_file: str) -> str:
+    """原始文本的保存路径：detail.csv -> detail_raw.csv"""
+    root, ext = os.path.splitext(str(output_file))
+    return f"{root}_raw{ext}"
+
+
+def append_detail(raw: DataFrame, output_file: str, now=None):
+    """
+    将一批原始记录追加到 *_raw.csv，规范化后追加到 output_file，
+    并以新文件的形式追加到与 output_file 同名的 Parquet 数据集（如 detail.csv -> detail/），
+    标签追加到字典编码的标签表（如 detail.csv -> detail_tags/）
+
+    - raw: DataFrame - RecordBuffer.to_frame() 的结果，以 bv 为索引
+
+    Returns:
+    - DataFrame: 规范化后写入的视频信息
+    """
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    raw_file = raw_path(output_file)
+    header = not os.path.exists(raw_file)
+    raw.assign(fetched_at=now.strftime(PUBTIME_FORMAT)).to_csv(
+        raw_file, mode="a", header=header
+    )
+    detail = normalize_detail(raw, now)
+    tags = tags_path(output_file)
+    if os.path.exists(output_file) and not TagIndex.exists(tags):
+        # 本功能之前写入的视频信息还没有标签表，先由已有的内容构建一次
+        build_tags(output_file)
+    header = not os.path.exists(output_file)
+    detail.to_csv(output_file, mode="a", header=header)
+    append_dataset(detail, dataset_path(output_file))
+    TagIndex.append(detail, tags)
+    return detail
+
+
+def build_tags(output_file: str) -> TagIndex:
+    """由 output_file 中已有的视频信息构建标签表，同一个视频保留最后一条"""
+    detail = pd.read_csv(output_file, dtype=str, usecols=["bv", "uid", "tags"])
+    detail = detail.drop_duplicates("bv", keep="last")
+    tags = TagIndex.from_detail(detail)
+    tags.save(tags_path(output_file))
+    return tags
+
+
+def renormalize(output_file: str, raw_file: Optional[str] = None) -> int:
+    """
+    修改规范化规则后，由原始文本重新生成 output_file，不需要重新爬取。
+    output_file 中没有原始文本的视频（如本功能之前爬取的）保持不变
+
+    Returns:
+    - int: 重新规范化的视频数
+    """
+    raw_file = raw_path(output_file) if raw_file is None else raw_file
+    raw = pd.read_csv(raw_file, index_col="bv", dtype=str, keep_default_na=False)
+    raw = raw.replace("", pd.NA)
+    # 同一个视频保留最近一次爬取的结果
+    raw = raw[~raw.index.duplicated(keep="last")]
+    normalized = normalize_detail(raw, pd.to_datetime(raw["fetched_at"]))
+    # 数据集读取时同一个视频保留最后写入的一条，追加即可覆盖旧的结果
+    append_dataset(normalized, dataset_path(output_file))
+
+    if os.path.exists(output_file):
+        detail = pd.read_csv(output_file, index_col="bv", dtype=str)
+        detail = detail[~detail.index.isin(normalized.index)]
+        if len(detail):
+            normalized = pd.concat([detail, normalized])
+    normalized.to_csv(output_file)
+    logger.info(f"已根据 {raw_file} 重新规范化 {len(raw)} 个视频")
+    return len(raw)
@@ -0,0 +1,318 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from scraping.scraping_utils import (
+    SCRP_PATH,
+    report_stats,
+    uid_of,
+)
+from scraping.nameToSpace import resolve_name
+from scraping.spaceToBV import list_page
+from scraping.multithreadingDetail import multithreading_to_detail
+from scraping.browser_pool import BrowserPool
+from scraping.driver_factory import DriverFactory
+from scraping.frontier import Frontier
+from scraping.name_cache import NameCache
+from scraping.rate_control import RateController
+from pandas import DataFrame
+from queue import Queue
+from functools import partial
+from typing import Iterable, Optional
+import pandas as pd
+import threading
+import time
+
+# 流水线运行期间存在的标记文件，中途退出后仍然存在，下次运行时从已保存的进度继续
+STREAM_MARKER = f"{SCRP_PATH}\\.streaming"
+
+
+class StreamingPipeline:
+    """
+    用户名 -> 主页地址 -> BV号 -> 视频信息 三个阶段同时运行，阶段之间用有界队列连接：
+    解析出的主页地址立即交给列表阶段，列表阶段每读到一页BV号就加入爬取队列，
+    视频信息阶段随即开始爬取，不再等待上一阶段全部完成。
+
+    - 用户名 -> 主页地址：names 队列 -> spaces 队列（有界）
+    - 主页地址 -> BV号：spaces 队列 -> 爬取队列 Frontier，待爬取的视频超过 max_pending 时暂停列表
+    - BV号 -> 视频信息：multithreading_to_detail，列表阶段结束前不因爬取队列暂时为空而退出
+
+    传入 info_path/space_bv_path 时边运行边保存进度：每解析一个用户名追加一行到 info_path，
+    每列完一个用户的投稿就重写 space_bv_path；再次运行时已列完的用户不再重新列出
+
+    Functions:
+    - run: 运行所有阶段，返回 info 和 space_bv 两张表
+    """
+
+    def __init__(
+        self,
+        frontier: Frontier,
+        cache: NameCache,
+        name_workers: int = 1,
+        space_workers: int = 2,
+        detail_workers: int = 4,
+        backend: str = "selenium",
+        controller: Optional[RateController] = None,
+        queue_size: int = 10,
+        max_pending: int = 200,
+        lean: bool = True,
+        info_path: Optional[str] = None,
+        space_bv_path: Optional[str] = None,
+    ):
+        """
+        - name_workers/space_workers/detail_workers: int - 各阶段的工作线程数，也是各自浏览器池的大小
+        - controller: RateController - 各阶段共用的限速器，为None时新建一个，上限为所有阶段线程数之和
+        - queue_size: int - 主页地址队列的容量
+        - max_pending: int - 爬取队列中待爬取视频数的上限，超过时列表阶段等待
+        - info_path/space_bv_path: str - 保存进度的 info.csv 和 space_bv.csv，为None时不保存
+        """
+        self.frontier = frontier
+        self.cache = cache
+        self.name_workers = name_workers
+        self.space_workers = space_workers
+        self.detail_workers = detail_workers
+        self.backend = backend
+        if controller is None:
+            controller = RateController(name_workers + space_workers + detail_workers)
+        self.controller = controller
+        self.max_pending = max_pending
+        # 按阶段名创建浏览器工厂，各阶段使用各自的用户目录
+        self.factory = partial(DriverFactory, lean=lean)
+
+        self.names: Queue = Queue()
+        self.spaces: Queue = Queue(maxsize=queue_size)
+        # 列表阶段结束的信号，视频信息阶段收到后处理完剩余视频即退出
+        self.listed = threading.Event()
+        # 视频信息阶段结束（包括出错退出）的信号，之后列表阶段不再等待爬取队列
+        self.crawl_stopped = threading.Event()
+        # 用户名阶段的浏览器池，第一次未命中缓存时才创建
+        self.name_pool: Optional[BrowserPool] = None
+        self.name_pool_size = name_workers
+        self.lock = threading.Lock()
+        self.info: list[dict] = []
+        self.space_bv: dict[str, list] = {}
+        # 已列完全部投稿的用户
+        self.completed: set[str] = set()
+        self.info_path = info_path
+        self.space_bv_path = space_bv_path
+        self._load_progress()
+        # 各阶段的结束时间，相对于 run 开始的秒数
+        self.finished: dict[str, float] = {}
+
+    def _load_progress(self):
+        """读取上次中途退出时保存的用户表和已列完的用户"""
+        if self.info_path is not None and os.path.exists(self.info_path):
+            info = pd.read_csv(self.info_path, index_col=0, dtype={"space": str})
+            info["space"] = info["space"].fillna("")
+            self.info = info[["name", "space", "fans"]].to_dict("records")
+        if self.space_bv_path is not None and os.path.exists(self.space_bv_path):
+            space_bv = pd.read_csv(self.space_bv_path, index_col=0, dtype=str)
+            self.space_bv = {uid: space_bv[uid].dropna().tolist() for uid in space_bv}
+            self.completed = set(self.space_bv)
+        if self.info or self.completed:
+            logger.info(
+                f"从上次的进度继续：已解析 {len(self.info)} 个用户名，"
+                f"已列完 {len(self.completed)} 个用户的投稿"
+            )
+
+    def _record_info(self, row: dict):
+        """记录一个用户名的解析结果，并追加到 info_path"""
+        with self.lock:
+            if any(known["name"] == row["name"] for known in self.info):
+                return
+            self.info.append(row)
+            if self.info_path is not None:
+                header = not os.path.exists(self.info_path)
+                DataFrame([row], index=[len(self.info) - 1]).to_csv(
+                    self.info_path, mode="a", header=header
+                )
+
+    def _complete(self, uid: str):
+        """一个用户的投稿已全部列出，重写 space_bv_path（先写临时文件再替换）"""
+        with self.lock:
+            self.completed.add(uid)
+            if self.space_bv_path is None:
+                return
+            space_bv = DataFrame(
+                {
+                    u: pd.Series(self.space_bv.get(u, []), dtype=object)
+                    for u in self.completed
+                }
+            )
+            temp = f"{self.space_bv_path}.tmp"
+            space_bv.to_csv(temp)
+            os.replace(temp, self.space_bv_path)
+
+    def _get_name_pool(self) -> BrowserPool:
+        """启动时全部命中缓存的用户名也可能在运行中过期，因此浏览器池在第一次未命中时创建"""
+        with self.lock:
+            if self.name_pool is None:
+                self.name_pool = BrowserPool(
+                    self.name_pool_size, factory=self.factory("name")
+                )
+            return self.name_pool
+
+    def _resolve(self):
+        """用户名阶段的工作线程：命中缓存的直接放行，未命中的打开用户搜索页解析"""
+        while (name := self.names.get()) is not None:
+            hit = self.cache.get_many([name]).get(name)
+            if hit is None:
+                try:
+                    pool = self._get_name_pool()
+                    space, fans = self.controller.call(pool.call, resolve_name, name)
+                except Exception as e:
+                    # 解析失败的用户名不写入缓存，下次重新解析
+                    logger.error(f"{name} 获取用户主页地址时发生错误：{e}")
+                    continue
+                self.cache.put(name, space, fans)
+                hit = {"space": space, "fans": fans}
+            logger.info(f"用户 {name} 的主页地址为：{hit['space']}")
+            self._record_info({"name": name, **hit})
+            if hit["space"] and uid_of(hit["space"]) not in self.completed:
+                self.spaces.put(hit["space"])
+
+    def _list(self, pool: BrowserPool):
+        """列表阶段的工作线程：逐页读取一个用户的投稿，每读到一页就加入爬取队列"""
+        while (space := self.spaces.get()) is not None:
+            uid = uid_of(space)
+            pn, total = 1, 1
+            with self.lock:
+                self.space_bv[uid] = []
+            while pn <= total:
+                # 视频信息阶段落后时暂停，爬取队列中待爬取的视频保持在上限以内
+                # 视频信息阶段已经退出时不再等待，否则列表阶段永远不会结束
+                while (
+                    self.frontier.pending() >= self.max_pending
+                    and not self.crawl_stopped.is_set()
+                ):
+                    self.crawl_stopped.wait(1)
+                try:
+                    bvs, total = self.controller.call(pool.call, list_page, space, pn)
+                except Exception as e:
+                    logger.error(f"获取用户 {uid} 的第 {pn} 页时发生错误：{e}")
+                    break
+                self.frontier.add((uid, bv) for bv in bvs)
+                with self.lock:
+                    self.space_bv[uid].extend(bvs)
+                pn += 1
+            else:
+                self._complete(uid)
+                logger.info(f"用户 {uid} 的投稿已全部加入爬取队列")
+
+    def _crawl(self):
+        try:
+            while True:
+                multithreading_to_detail(
+                    frontier=self.frontier,
+                    chunk_size=10,
+                    max_workers=self.detail_workers,
+                    backend=self.backend,
+                    controller=self.controller,
+                    upstream=self.listed,
+                )
+                # 失败的视频在尝试次数上限内会被放回待爬取
+                if self.listed.is_set() and self.frontier.pending() == 0:
+                    break
+        except Exception as e:
+            logger.error(f"视频信息阶段发生错误，已停止爬取：{e}")
+        finally:
+            self.crawl_stopped.set()
+
+    def _start(self, target, count: int, *args) -> list[threading.Thread]:
+        threads = [threading.Thread(target=target, args=args) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def run(self, names: Iterable[str]) -> tuple[DataFrame, DataFrame]:
+        """
+        Returns:
+        - tuple[DataFrame, DataFrame]: 与 info.csv 格式相同的用户表，与 space_bv.csv 格式相同的BV号表
+        """
+        start = time.monotonic()
+        names = list(dict.fromkeys(pd.Series(list(names)).dropna()))
+        for name in names:
+            self.names.put(name)
+        for _ in range(self.name_workers):
+            self.names.put(None)
+
+        misses = self.cache.misses(names)
+        self.name_pool_size = max(1, min(self.name_workers, len(misses)))
+        space_pool = BrowserPool(self.space_workers, factory=self.factory("space"))
+
+        crawler = threading.Thread(target=self._crawl)
+        crawler.start()
+        resolvers = self._start(self._resolve, self.name_workers)
+        listers = self._start(self._list, self.space_workers, space_pool)
+        try:
+            for thread in resolvers:
+                thread.join()
+            self.finished["name"] = time.monotonic() - start
+            for _ in range(self.space_workers):
+                self.spaces.put(None)
+            for thread in listers:
+                thread.join()
+            self.finished["space"] = time.monotonic() - start
+        finally:
+            self.listed.set()
+            if self.name_pool is not None:
+                self.name_pool.close()
+            space_pool.close()
+            crawler.join()
+        self.finished["detail"] = time.monotonic() - start
+
+        logger.info(
+            "各阶段结束于："
+            + "，".join(f"{stage} {t:.1f}s" for stage, t in self.finished.items())
+        )
+        report_stats()
+        self.controller.report()
+
+        info = DataFrame(self.info, columns=["name", "space", "fans"])
+        space_bv = pd.DataFrame(
+            {uid: pd.Series(bvs, dtype=object) for uid, bvs in self.space_bv.items()}
+        )
+        return info, space_bv
+
+
+def stream(
+    names: Iterable[str],
+    name_workers: int = 1,
+    space_workers: int = 2,
+    detail_workers: int = 4,
+    backend: str = "selenium",
+    controller: Optional[RateController] = None,
+    cache: Optional[NameCache] = None,
+) -> tuple[DataFrame, DataFrame]:
+    """
+    以流水线方式从用户名开始完成全部爬取，运行期间边爬取边保存 info.csv 和 space_bv.csv，
+    中途退出后再次运行会从已保存的进度继续
+    """
+    own_cache = cache is None
+    cache = NameCache() if own_cache else cache
+    open(STREAM_MARKER, "w").close()
+    with Frontier() as frontier:
+        # 上次中途退出时租出未归还的视频重新放回待爬取
+        frontier.reset_leased()
+        pipeline = StreamingPipeline(
+            frontier,
+            cache,
+            name_workers,
+            space_workers,
+            detail_workers,
+            backend,
+            controller,
+            info_path=f"{SCRP_PATH}\\info.csv",
+            space_bv_path=f"{SCRP_PATH}\\space_bv.csv",
+        )
+        info, space_bv = pipeline.run(names)
+    if own_cache:
+        cache.close()
+    info.to_csv(f"{SCRP_PATH}\\info.csv")
+    space_bv.to_csv(f"{SCRP_PATH}\\space_bv.csv")
+    os.remove(STREAM_MARKER)
+    logger.info(
+        "用户信息和BV号已保存至info.csv和space_bv.csv，视频信息已保存至detail.csv"
+    )
+    return info, space_bv
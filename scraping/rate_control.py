@@ -0,0 +1,216 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from scraping.scraping_utils import CHALLENGES
+from scraping.waits import WAITS, nearest_rank
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+import statistics
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    令牌桶：每秒补充 rate 个令牌，最多积攒 capacity 个，每个请求消耗一个。
+    允许短时间的突发，长期的请求速率不超过 rate，多个工作线程共用
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.capacity = max(1.0, rate) if capacity is None else capacity
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        refilled = self.tokens + (now - self.updated) * self.rate
+        self.tokens = min(self.capacity, refilled)
+        self.updated = now
+
+    def set_rate(self, rate: float):
+        with self.lock:
+            # 先按旧速率结算已经补充的令牌
+            self._refill()
+            self.rate = rate
+
+    def acquire(self):
+        """取出一个令牌，令牌不足时阻塞到补充足够为止"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class RateController:
+    """
+    各个爬取阶段共用的限速器：令牌桶限制每秒请求数，
+    并按加性增、乘性减（AIMD）根据延迟、超时率和验证窗口出现率调整并发数和速率。
+
+    每完成 window 个请求评估一次：
+    - 拥塞（超时、验证窗口或错误过多，或延迟中位数超过 target_latency）：并发数和速率乘以 backoff
+    - 否则：并发数加 1，速率加 rate_step，分别不超过 max_workers 和 max_rate
+
+    Functions:
+    - slot: 占用一个并发名额和一个令牌，退出时记录本次请求的耗时
+    - call: 在 slot 中执行函数
+    - record: 记录一次请求的结果
+    - percentile: 请求耗时的分位数
+    - report: 输出调整情况
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        min_workers: int = 1,
+        initial_workers: Optional[int] = None,
+        rate: float = 2.0,
+        min_rate: float = 0.2,
+        max_rate: float = 10.0,
+        rate_step: float = 0.5,
+        backoff: float = 0.5,
+        window: int = 20,
+        target_latency: float = 10.0,
+        max_timeout_rate: float = 0.1,
+        max_challenge_rate: float = 0.05,
+        max_error_rate: float = 0.2,
+    ):
+        """
+        - max_workers: int - 并发数上限，工作线程数应与之相同，多余的线程会等待名额
+        - initial_workers: int - 初始并发数，默认为 min(2, max_workers)，之后由 AIMD 调整
+        - rate: float - 初始的每秒请求数
+        - window: int - 每完成多少个请求评估一次
+        - target_latency: float - 单个请求耗时中位数的上限，单位秒
+        """
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        if initial_workers is None:
+            initial_workers = min(2, self.max_workers)
+        self.limit = min(max(initial_workers, self.min_workers), self.max_workers)
+        self.bucket = TokenBucket(rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.backoff = backoff
+        self.window = window
+        self.target_latency = target_latency
+        self.max_timeout_rate = max_timeout_rate
+        self.max_challenge_rate = max_challenge_rate
+        self.max_error_rate = max_error_rate
+
+        self.condition = threading.Condition()
+        self.active = 0
+        self.latencies: list[float] = []
+        self.errors = 0
+        # 等待超时和验证窗口取自全局统计，评估时只看本窗口内的增量
+        self.waits, self.timeouts = WAITS.totals()
+        self.pages, self.challenges = CHALLENGES.totals()
+        self.completed = 0
+        # 所有请求的耗时，用于计算分位数，不随评估窗口清空
+        self.samples: deque = deque(maxlen=10000)
+        self.peak = self.limit
+        self.decreases = 0
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    @contextmanager
+    def slot(self):
+        """占用一个并发名额和一个令牌，退出时记录本次请求的耗时和是否出错"""
+        with self.condition:
+            while self.active >= self.limit:
+                self.condition.wait()
+            self.active += 1
+        ok = False
+        start = time.monotonic()
+        try:
+            self.bucket.acquire()
+            # 耗时不包括等待令牌的时间
+            start = time.monotonic()
+            yield
+            ok = True
+        finally:
+            with self.condition:
+                self.active -= 1
+                self.condition.notify_all()
+            self.record(time.monotonic() - start, ok)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """在 slot 中执行 func(*args, **kwargs)"""
+        with self.slot():
+            return func(*args, **kwargs)
+
+    def record(self, latency: float, ok: bool = True):
+        with self.condition:
+            self.latencies.append(latency)
+            self.samples.append(latency)
+            self.errors += not ok
+            self.completed += 1
+            if len(self.latencies) >= self.window:
+                self._adjust()
+
+    def _adjust(self):
+        """根据本窗口的统计调整并发数和速率，调用方需持有 condition"""
+        n = len(self.latencies)
+        median = statistics.median(self.latencies)
+        waits, timeouts = WAITS.totals()
+        pages, challenges = CHALLENGES.totals()
+        timeout_rate = (timeouts - self.timeouts) / max(1, waits - self.waits)
+        challenge_rate = (challenges - self.challenges) / max(1, pages - self.pages)
+        error_rate = self.errors / n
+
+        reasons = []
+        if timeout_rate > self.max_timeout_rate:
+            reasons.append(f"超时率 {timeout_rate:.0%}")
+        if challenge_rate > self.max_challenge_rate:
+            reasons.append(f"验证窗口出现率 {challenge_rate:.0%}")
+        if error_rate > self.max_error_rate:
+            reasons.append(f"错误率 {error_rate:.0%}")
+        if median > self.target_latency:
+            reasons.append(f"延迟中位数 {median:.1f}s")
+
+        old_limit, old_rate = self.limit, self.rate
+        if reasons:
+            self.limit = max(self.min_workers, int(self.limit * self.backoff))
+            self.bucket.set_rate(max(self.min_rate, old_rate * self.backoff))
+            self.decreases += 1
+            logger.warning(
+                f"{'，'.join(reasons)}，并发数 {old_limit} -> {self.limit}，"
+                f"速率 {old_rate:.2f} -> {self.rate:.2f} 次/秒"
+            )
+        else:
+            self.limit = min(self.max_workers, self.limit + 1)
+            self.bucket.set_rate(min(self.max_rate, old_rate + self.rate_step))
+            if (self.limit, self.rate) != (old_limit, old_rate):
+                logger.info(
+                    f"延迟中位数 {median:.1f}s，并发数 {old_limit} -> {self.limit}，"
+                    f"速率 {old_rate:.2f} -> {self.rate:.2f} 次/秒"
+                )
+        self.peak = max(self.peak, self.limit)
+        self.condition.notify_all()
+
+        self.latencies = []
+        self.errors = 0
+        self.waits, self.timeouts = waits, timeouts
+        self.pages, self.challenges = pages, challenges
+
+    def percentile(self, q: float) -> Optional[float]:
+        """所有请求耗时的分位数，还没有请求时返回 None"""
+        with self.condition:
+            samples = sorted(self.samples)
+        return nearest_rank(samples, q)
+
+    def report(self):
+        logger.info(
+            f"共完成 {self.completed} 个请求，当前并发数 {self.limit}（最高 {self.peak}），"
+            f"速率 {self.rate:.2f} 次/秒，降速 {self.decreases} 次"
+        )
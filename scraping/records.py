@@ -0,0 +1,183 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from array import array
+from typing import Iterable, Iterator
+from pandas import DataFrame
+import numpy as np
+import pyarrow as pa
+
+# detail.csv 的列顺序
+DETAIL_COLUMNS = [
+    "uid",
+    "bv",
+    "title",
+    "duration",
+    "pubtime",
+    "click",
+    "bullet",
+    "like",
+    "coin",
+    "favorite",
+    "share",
+    "comment",
+    "tags",
+]
+# 计数列，在缓冲区中以 64 位整数数组保存，出现页面上的原始文本时改为列表
+NUMERIC_COLUMNS = ["click", "bullet", "like", "coin", "favorite", "share", "comment"]
+# 文本列
+STRING_COLUMNS = ["uid", "bv", "title", "duration", "pubtime"]
+
+
+class VideoRecord:
+    """
+    一个视频的详情，字段与 detail.csv 的列一致。
+    使用 __slots__，不为每条记录创建 __dict__；支持按字段名取值，兼容原先的字典用法。
+    从页面元素中解析的记录，计数、时长和发布时间为页面上的原始文本，写入前由 normalize 统一转换
+    """
+
+    __slots__ = tuple(DETAIL_COLUMNS)
+
+    def __init__(
+        self,
+        uid: str,
+        bv: str,
+        title: str,
+        duration: str,
+        pubtime: str,
+        click: int,
+        bullet: int,
+        like: int,
+        coin: int,
+        favorite: int,
+        share: int,
+        comment: int,
+        tags: list[str],
+    ):
+        self.uid = uid
+        self.bv = bv
+        self.title = title
+        self.duration = duration
+        self.pubtime = pubtime
+        self.click = click
+        self.bullet = bullet
+        self.like = like
+        self.coin = coin
+        self.favorite = favorite
+        self.share = share
+        self.comment = comment
+        self.tags = tags
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VideoRecord":
+        return cls(**{key: data[key] for key in DETAIL_COLUMNS})
+
+    def keys(self) -> list[str]:
+        return list(DETAIL_COLUMNS)
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def as_dict(self) -> dict:
+        return {key: getattr(self, key) for key in DETAIL_COLUMNS}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, VideoRecord):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def __repr__(self) -> str:
+        return f"VideoRecord({self.as_dict()})"
+
+
+class RecordBuffer:
+    """
+    列式的记录缓冲区：计数列追加到 array('q')，uid 和标签字符串驻留复用，
+    计数列中出现原始文本（如 1.5万）时，该列改为普通列表，原样保留给规范化阶段；
+    标签按 Arrow 列表的布局保存为一个扁平列表加偏移量。
+    只有在写入文件时才转换为 DataFrame / Arrow 表
+
+    Functions:
+    - append: 追加一条记录
+    - pairs: 缓冲区中的 (uid, bv)
+    - to_frame: 转换为以 bv 为索引的 DataFrame，列顺序与 detail.csv 一致
+    - to_arrow: 转换为 Arrow 表
+    - clear: 清空缓冲区
+    """
+
+    def __init__(self):
+        self.strings: dict[str, list] = {key: [] for key in STRING_COLUMNS}
+        self.numbers: dict[str, array | list] = {
+            key: array("q") for key in NUMERIC_COLUMNS
+        }
+        self.tag_values: list[str] = []
+        self.tag_offsets = array("q", [0])
+
+    def append(self, record: VideoRecord | dict):
+        if isinstance(record, dict):
+            record = VideoRecord.from_dict(record)
+        strings = self.strings
+        # 同一个up主的所有视频共用一个 uid 字符串对象
+        strings["uid"].append(sys.intern(str(record.uid)))
+        strings["bv"].append(record.bv)
+        strings["title"].append(record.title)
+        strings["duration"].append(record.duration)
+        strings["pubtime"].append(record.pubtime)
+        for key in NUMERIC_COLUMNS:
+            value = record[key]
+            column = self.numbers[key]
+            if isinstance(column, array) and not isinstance(value, int):
+                column = self.numbers[key] = column.tolist()
+            column.append(value)
+        self.tag_values.extend(sys.intern(tag) for tag in record.tags)
+        self.tag_offsets.append(len(self.tag_values))
+
+    def extend(self, records: Iterable[VideoRecord | dict]):
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(self.strings["bv"])
+
+    def pairs(self) -> Iterator[tuple[str, str]]:
+        return zip(self.strings["uid"], self.strings["bv"])
+
+    def tags(self) -> list[list[str]]:
+        offsets, values = self.tag_offsets, self.tag_values
+        return [values[offsets[i] : offsets[i + 1]] for i in range(len(self))]
+
+    def to_frame(self) -> DataFrame:
+        """
+        转换为以 bv 为索引的 DataFrame，整数计数列直接由数组的内存构造，不逐个转换元素；
+        含原始文本的计数列为 object 列
+        """
+        columns = {key: self.strings[key] for key in STRING_COLUMNS}
+        for key in NUMERIC_COLUMNS:
+            column = self.numbers[key]
+            if isinstance(column, array):
+                column = np.frombuffer(column, dtype=np.int64)
+            columns[key] = column
+        columns["tags"] = self.tags()
+        return DataFrame(columns, columns=DETAIL_COLUMNS).set_index("bv")
+
+    def to_arrow(self) -> pa.Table:
+        columns = {
+            key: pa.array(self.strings[key], pa.string()) for key in STRING_COLUMNS
+        }
+        for key in NUMERIC_COLUMNS:
+            column = self.numbers[key]
+            if isinstance(column, array):
+                columns[key] = pa.array(column, pa.int64())
+            else:
+                columns[key] = pa.array(
+                    [None if v is None else str(v) for v in column], pa.string()
+                )
+        columns["tags"] = pa.ListArray.from_arrays(
+            pa.array(self.tag_offsets, pa.int32()),
+            pa.array(self.tag_values, pa.string()),
+        )
+        return pa.table({key: columns[key] for key in DETAIL_COLUMNS})
+
+    def clear(self):
+        self.__init__()
@@ -0,0 +1,303 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from scraping.scraping_utils import SCRP_PATH
+from scraping.frontier import FRONTIER_PATH, SCHEMA as FRONTIER_SCHEMA, USELESS
+from scraping.detail_backends import (
+    DetailBackend,
+    UselessVideoError,
+    FetchError,
+    BEIJING_TZ,
+    make_backend,
+)
+from scraping.normalize import append_detail
+from scraping.records import RecordBuffer
+from datetime import datetime
+from typing import Iterable, Optional
+import pandas as pd
+import sqlite3
+import threading
+import time
+
+
+# 需要记录快照的指标
+METRICS = ["click", "bullet", "like", "coin", "favorite", "share", "comment"]
+
+SNAPSHOT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    uid TEXT NOT NULL,
+    bv TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    pubtime REAL,
+    click INTEGER,
+    bullet INTEGER,
+    like INTEGER,
+    coin INTEGER,
+    favorite INTEGER,
+    share INTEGER,
+    comment INTEGER,
+    source TEXT NOT NULL DEFAULT 'crawl'
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_bv ON snapshots (bv, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_source ON snapshots (source, fetched_at);
+"""
+
+
+def to_timestamp(pubtime: str) -> Optional[float]:
+    """将北京时间的 YYYY-MM-DD HH:MM:SS 转换为 Unix 时间戳"""
+    try:
+        naive = datetime.strptime(str(pubtime), "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+    return naive.replace(tzinfo=BEIJING_TZ).timestamp()
+
+
+class RecrawlScheduler:
+    """
+    视频数据的增量重爬调度器。每次爬取都记录一条带时间戳的指标快照，
+    再按优先级挑选需要刷新的视频：发布时间越近、距上次爬取越久、
+    所属up主的数据增长越快，优先级越高。重爬受每小时页面预算限制。
+
+    Functions:
+    - record: 记录一条视频详情的快照
+    - seed_from_detail: 将 detail.csv 中还没有快照的视频作为首次快照导入
+    - priorities: 计算所有候选视频的优先级
+    - next_batch: 在预算内取出优先级最高的一批视频
+    - run: 持续重爬，直到没有需要刷新的视频
+    - latest: 每个视频最新一次快照
+    """
+
+    def __init__(
+        self,
+        path: str = FRONTIER_PATH,
+        budget_per_hour: int = 600,
+        min_interval_hours: float = 6,
+        age_half_life_days: float = 7,
+        velocity_weight: float = 1.0,
+    ):
+        """
+        - path: str - 数据库文件路径，与爬取队列共用
+        - budget_per_hour: int - 每小时最多重爬的页面数
+        - min_interval_hours: float - 同一个视频两次爬取的最小间隔
+        - age_half_life_days: float - 发布时间权重减半所需的天数
+        - velocity_weight: float - up主数据增长速度在优先级中的权重
+        """
+        self.budget_per_hour = budget_per_hour
+        self.min_interval_hours = min_interval_hours
+        self.age_half_life_days = age_half_life_days
+        self.velocity_weight = velocity_weight
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            str(path), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        # 排除无用视频时需要查询爬取队列
+        self.conn.executescript(FRONTIER_SCHEMA)
+        self.conn.executescript(SNAPSHOT_SCHEMA)
+
+    def record_many(
+        self,
+        records: Iterable[dict],
+        source: str = "crawl",
+        fetched_at: Optional[float] = None,
+    ):
+        """记录多条视频详情的快照，source 为 'crawl'（首次爬取）或 'recrawl'"""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        rows = [
+            (
+                str(data["uid"]),
+                str(data["bv"]),
+                fetched_at,
+                to_timestamp(data["pubtime"]),
+                *(None if pd.isna(data[key]) else int(data[key]) for key in METRICS),
+                source,
+            )
+            for data in records
+        ]
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE;")
+            self.conn.executemany(
+                "INSERT INTO snapshots (uid, bv, fetched_at, pubtime, "
+                + ", ".join(METRICS)
+                + ", source) VALUES ("
+                + ", ".join("?" * (len(METRICS) + 5))
+                + ");",
+                rows,
+            )
+            self.conn.execute("COMMIT;")
+
+    def record(self, data: dict, source: str = "crawl"):
+        self.record_many([data], source)
+
+    def seed_from_detail(self, detail_path: str = f"{SCRP_PATH}\\detail.csv") -> int:
+        """将 detail.csv 中还没有快照的视频导入为首次快照，爬取时间取文件的修改时间"""
+        detail = pd.read_csv(detail_path, dtype={"uid": str, "bv": str})
+        with self.lock:
+            known = {
+                row[0]
+                for row in self.conn.execute("SELECT DISTINCT bv FROM snapshots;")
+            }
+        detail = detail[~detail["bv"].isin(known)].dropna(subset=METRICS)
+        self.record_many(
+            detail.to_dict("records"), fetched_at=os.path.getmtime(detail_path)
+        )
+        logger.info(f"已从 {detail_path} 导入 {len(detail)} 条快照")
+        return len(detail)
+
+    def _history(self) -> pd.DataFrame:
+        """每个视频最近两次快照，排除已被标记为无用的视频"""
+        sql = """
+        SELECT uid, bv, fetched_at, pubtime, click, rn FROM (
+            SELECT s.*, ROW_NUMBER() OVER (
+                PARTITION BY s.bv ORDER BY s.fetched_at DESC
+            ) AS rn
+            FROM snapshots s
+            WHERE s.bv NOT IN (SELECT bv FROM frontier WHERE status = ?)
+        ) WHERE rn <= 2;
+        """
+        with self.lock:
+            return pd.read_sql_query(sql, self.conn, params=(USELESS,))
+
+    def uid_velocity(self, history: Optional[pd.DataFrame] = None) -> pd.Series:
+        """
+        up主的数据增长速度：其视频最近两次快照之间播放量每小时的相对增长的中位数，
+        归一化到 0~1，没有历史数据的up主取所有up主的平均值
+        """
+        history = self._history() if history is None else history
+        latest = history[history["rn"] == 1].set_index("bv")
+        previous = history[history["rn"] == 2].set_index("bv")
+        both = latest.join(
+            previous[["fetched_at", "click"]], rsuffix="_prev", how="inner"
+        )
+
+        hours = (both["fetched_at"] - both["fetched_at_prev"]) / 3600
+        growth = (both["click"] - both["click_prev"]) / both["click_prev"].clip(lower=1)
+        rate = (growth / hours.where(hours > 0)).clip(lower=0)
+
+        velocity = rate.groupby(both["uid"]).median()
+        uids = history["uid"].unique()
+        if velocity.empty or velocity.max() <= 0:
+            return pd.Series(0.0, index=uids)
+        velocity = velocity / velocity.max()
+        return velocity.reindex(uids).fillna(velocity.mean())
+
+    def priorities(self, now: Optional[float] = None) -> pd.DataFrame:
+        """
+        计算候选视频的优先级，按优先级从高到低排序：
+        score = 距上次爬取的小时数 × 发布时间权重 × (1 + velocity_weight × up主增长速度)
+        距上次爬取不足 min_interval_hours 的视频不参与排序
+        """
+        now = time.time() if now is None else now
+        history = self._history()
+        latest = history[history["rn"] == 1].copy()
+
+        staleness = (now - latest["fetched_at"]) / 3600
+        age_days = ((now - latest["pubtime"]) / 86400).clip(lower=0)
+        # 发布时间未知时按最旧处理
+        age_weight = (1 / (1 + age_days / self.age_half_life_days)).fillna(0.0)
+        velocity = latest["uid"].map(self.uid_velocity(history)).fillna(0.0)
+
+        latest["score"] = staleness * age_weight * (1 + self.velocity_weight * velocity)
+        latest = latest[staleness >= self.min_interval_hours]
+        return latest.sort_values("score", ascending=False)[["uid", "bv", "score"]]
+
+    def used_budget(self, now: Optional[float] = None) -> int:
+        """最近一小时内重爬的页面数"""
+        now = time.time() if now is None else now
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM snapshots WHERE source = 'recrawl' "
+                "AND fetched_at > ?;",
+                (now - 3600,),
+            ).fetchone()[0]
+
+    def next_batch(
+        self, n: int, now: Optional[float] = None, exclude: Iterable[str] = ()
+    ) -> list[tuple[str, str]]:
+        """在剩余预算内取出优先级最高的至多 n 个视频，exclude 中的BV号不参与"""
+        remaining = self.budget_per_hour - self.used_budget(now)
+        if remaining <= 0:
+            return []
+        candidates = self.priorities(now)
+        candidates = candidates[~candidates["bv"].isin(set(exclude))]
+        top = candidates.head(min(n, remaining))
+        return list(top[["uid", "bv"]].itertuples(index=False, name=None))
+
+    def run(
+        self,
+        backend: DetailBackend,
+        batch_size: int = 20,
+        output_file: str = f"{SCRP_PATH}\\detail.csv",
+    ):
+        """
+        持续重爬优先级最高的视频，预算用尽时等待，没有需要刷新的视频时返回。
+        每批刷新的结果经 append_detail 追加到 output_file 及其数据集，读取时同一个视频保留最后一条
+        """
+        # 本次运行中获取失败的视频不再重试，避免反复占据队首
+        failed = set()
+        while True:
+            batch = self.next_batch(batch_size, exclude=failed)
+            if not batch:
+                if self.used_budget() < self.budget_per_hour:
+                    logger.info("没有需要刷新的视频，重爬结束")
+                    return
+                logger.info("本小时的重爬预算已用尽，等待 60 秒")
+                time.sleep(60)
+                continue
+
+            buffer = RecordBuffer()
+            for uid, bv in batch:
+                try:
+                    buffer.append(backend.fetch(uid, bv))
+                except UselessVideoError as e:
+                    logger.info(e)
+                    with self.lock:
+                        self.conn.execute(
+                            "UPDATE frontier SET status = ? WHERE bv = ?;",
+                            (USELESS, bv),
+                        )
+                except FetchError as e:
+                    logger.error(e)
+                    failed.add(bv)
+                except Exception as e:
+                    # 单个视频出错（如浏览器异常）不影响本批其他视频
+                    logger.error(f"发生错误：{e}，相关视频：{bv}")
+                    failed.add(bv)
+
+            if len(buffer):
+                # 从页面元素中解析的计数和发布时间为原始文本，规范化后写入并记录快照
+                detail = append_detail(buffer.to_frame(), output_file)
+                self.record_many(detail.reset_index().to_dict("records"), "recrawl")
+            logger.info(
+                f"已刷新 {len(buffer)} 个视频，本小时已用预算 {self.used_budget()}"
+            )
+
+    def latest(self) -> pd.DataFrame:
+        """每个视频最新一次快照的指标"""
+        sql = (
+            "SELECT uid, bv, fetched_at, "
+            + ", ".join(METRICS)
+            + " FROM snapshots s WHERE fetched_at = "
+            "(SELECT MAX(fetched_at) FROM snapshots WHERE bv = s.bv);"
+        )
+        with self.lock:
+            latest = pd.read_sql_query(sql, self.conn)
+        latest["fetched_at"] = pd.to_datetime(latest["fetched_at"], unit="s")
+        return latest
+
+    def close(self):
+        self.conn.close()
+
+
+def main(budget_per_hour: int = 600, backend: str = "http"):
+    scheduler = RecrawlScheduler(budget_per_hour=budget_per_hour)
+    scheduler.seed_from_detail()
+    with make_backend(backend) as fetcher:
+        scheduler.run(fetcher)
+    scheduler.close()
+
+
+if __name__ == "__main__":
+    main()
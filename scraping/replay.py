@@ -0,0 +1,238 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlsplit
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+# 录制页面时去掉外部脚本和样式表，回放时页面不会再去请求线上的资源；
+# 内联脚本（如 window.__INITIAL_STATE__）保留在源码中，解析时仍可读取
+EXTERNAL_RESOURCES = [
+    r"<script\b[^>]*\bsrc=[^>]*>\s*</script>",
+    r"<link\b[^>]*\brel=[\"']?(?:stylesheet|preload|prefetch|modulepreload)[^>]*>",
+]
+
+
+def archive_key(url: str) -> str:
+    """存档中的键：去掉协议的地址，如 www.bilibili.com/video/BV1xx?p=1"""
+    parts = urlsplit(url)
+    key = parts.netloc + parts.path
+    return f"{key}?{parts.query}" if parts.query else key
+
+
+def strip_external(html: str) -> str:
+    for pattern in EXTERNAL_RESOURCES:
+        html = re.sub(pattern, "", html, flags=re.IGNORECASE)
+    return html
+
+
+class Archive:
+    """
+    录制的页面和接口响应。目录下的 index.jsonl 每行记录一个地址，响应体按内容的哈希值保存在 bodies 中，
+    同一地址多次录制时以最后一次为准
+
+    Functions:
+    - save: 保存一个地址的响应
+    - get: 读取一个地址的响应
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.entries: dict[str, dict] = {}
+        os.makedirs(os.path.join(self.path, "bodies"), exist_ok=True)
+        index = os.path.join(self.path, "index.jsonl")
+        if os.path.exists(index):
+            with open(index, "r", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[entry["key"]] = entry
+
+    def save(self, url: str, body: str | bytes, content_type: str, status: int = 200):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        name = hashlib.sha1(body).hexdigest()
+        entry = {
+            "key": archive_key(url),
+            "file": name,
+            "status": status,
+            "content_type": content_type,
+        }
+        with self.lock:
+            with open(os.path.join(self.path, "bodies", name), "wb") as f:
+                f.write(body)
+            with open(
+                os.path.join(self.path, "index.jsonl"), "a", encoding="utf-8"
+            ) as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.entries[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[tuple[int, str, bytes]]:
+        """按键读取 (状态码, 内容类型, 响应体)，未录制时返回 None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        with open(os.path.join(self.path, "bodies", entry["file"]), "rb") as f:
+            body = f.read()
+        return entry["status"], entry["content_type"], body
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class Replay:
+    """
+    录制与回放的全局开关，由各模块在打开页面和请求接口时查询
+
+    - base: 回放服务器的地址，设置后所有页面和接口地址都改写为该服务器上的地址
+    - archive: 录制的存档，设置后打开的页面和读取到的接口响应都保存到其中
+    """
+
+    def __init__(self):
+        self.base: Optional[str] = None
+        self.archive: Optional[Archive] = None
+
+    def url(self, url: str) -> str:
+        if self.base is None:
+            return url
+        return f"{self.base}/{archive_key(url)}"
+
+    def record_page(self, driver, url: str):
+        if self.archive is not None:
+            html = strip_external(driver.page_source)
+            self.archive.save(url, html, "text/html; charset=utf-8")
+
+    def record_response(self, url: str, body: dict | list):
+        if self.archive is not None:
+            data = json.dumps(body, ensure_ascii=False)
+            self.archive.save(url, data, "application/json; charset=utf-8")
+
+
+REPLAY = Replay()
+
+
+def replay_url(url: str) -> str:
+    """回放时返回回放服务器上对应的地址，否则原样返回"""
+    return REPLAY.url(url)
+
+
+def start_recording(path: str) -> Archive:
+    """之后打开的页面和读取到的接口响应都保存到 path 下的存档中"""
+    REPLAY.archive = Archive(path)
+    logger.info(f"开始录制，存档位于 {path}")
+    return REPLAY.archive
+
+
+def stop_recording():
+    if REPLAY.archive is not None:
+        logger.info(f"录制结束，共 {len(REPLAY.archive)} 个地址")
+    REPLAY.archive = None
+
+
+class ReplayServer:
+    """
+    本地回放服务器：地址 /<域名>/<路径>?<参数> 返回存档中对应的响应。
+    可以注入固定延迟、随机抖动和错误，模拟线上的不稳定
+
+    - latency: float - 每个响应的固定延迟，单位秒
+    - jitter: float - 在固定延迟之外再随机增加 0 到 jitter 秒
+    - error_rate: float - 以该概率返回 503
+    """
+
+    def __init__(
+        self,
+        archive: Archive,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        port: int = 0,
+        seed: Optional[int] = None,
+    ):
+        self.archive = archive
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # 请求数、页面数（HTML）、注入的错误数和存档中没有的地址数
+        self.stats = {"requests": 0, "pages": 0, "errors": 0, "misses": 0}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ReplayServer":
+        self.thread.start()
+        logger.info(
+            f"回放服务器已启动：{self.url}，存档中共 {len(self.archive)} 个地址"
+        )
+        return self
+
+    def handle(self, request: BaseHTTPRequestHandler):
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            failed = self.random.random() < self.error_rate
+        time.sleep(delay)
+
+        found = None if failed else self.archive.get(request.path.lstrip("/"))
+        with self.lock:
+            self.stats["requests"] += 1
+            if failed:
+                self.stats["errors"] += 1
+            elif found is None:
+                self.stats["misses"] += 1
+            elif found[1].startswith("text/html"):
+                self.stats["pages"] += 1
+
+        if failed:
+            status, content_type, body = 503, "text/plain", b"injected error"
+        elif found is None:
+            status, content_type, body = 404, "text/plain", b"not recorded"
+        else:
+            status, content_type, body = found
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def snapshot(self) -> dict[str, int]:
+        with self.lock:
+            return dict(self.stats)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def use_replay(server: Optional[ReplayServer]):
+    """之后打开的页面和请求的接口都改写到 server，传入 None 时恢复访问线上地址"""
+    REPLAY.base = None if server is None else server.url
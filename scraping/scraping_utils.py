@@ -5,17 +5,14 @@ sys.path.append(os.getcwd())
 from global_utils import ROOT_PATH, logger, GlobalUtils
 
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
+from scraping.waits import wait_ready, WAITS
+from scraping.network_capture import enable_performance_log
+from scraping.replay import REPLAY, replay_url
+from typing import Optional
 import inspect
-from selenium.common.exceptions import (
-    NoSuchElementException,
-    TimeoutException,
-    StaleElementReferenceException,
-)
+import re
 import threading
+from datetime import datetime
 from pathlib import Path
 
 
@@ -24,102 +21,428 @@ SCRP_RES_PATH = Path(ROOT_PATH) / "scraping" / "res"
 DRIVER_PATH = "F:\chromedriver\chromedriver-win64\chromedriver.exe"
 
 
-def wait(driver: webdriver.Chrome, timeout=30):
-    caller_frame = inspect.currentframe().f_back
-    caller_filename = inspect.getframeinfo(caller_frame).filename
-    caller_lineno = inspect.getframeinfo(caller_frame).lineno
+# 精简模式下通过 CDP 屏蔽的请求：图片、字体、视频流、弹幕和统计/广告脚本，页面解析用不到它们
+BLOCKED_URLS = [
+    "*.jpg",
+    "*.jpeg",
+    "*.png",
+    "*.gif",
+    "*.webp",
+    "*.avif",
+    "*.svg",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.m4s",
+    "*.mp4",
+    "*.flv",
+    "*bilivideo.com*",
+    "*bilivideo.cn*",
+    "*/x/v2/dm/*",
+    "*/x/v1/dm/*",
+    "*data.bilibili.com*",
+    "*cm.bilibili.com*",
+]
 
-    try:
-        # 首先等待页面基本加载完成（document.readyState为complete）
-        WebDriverWait(driver, timeout).until(
-            lambda d: d.execute_script("return document.readyState;") == "complete"
-        )
-    except TimeoutException:
-        logger.warning("加载超时")
+# 资源计时缓冲区默认只有 250 条，视频页的资源数会超过该值，导致流量统计偏小
+RESOURCE_BUFFER_HOOK = "performance.setResourceTimingBufferSize(2000);"
 
-    # 最后，添加一个短暂的延时，以确保所有元素都完全加载
-    time.sleep(2)
 
-    logger.debug(
-        f"调用者位置 - 文件名: {caller_filename} - 行号: {caller_lineno}\n页面加载完成"
+def lean_options() -> webdriver.ChromeOptions:
+    """精简模式的浏览器选项：无头、不加载图片、静音且不自动播放"""
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--mute-audio")
+    options.add_argument("--autoplay-policy=user-gesture-required")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_experimental_option(
+        "prefs", {"profile.managed_default_content_settings.images": 2}
     )
+    return options
 
 
-def help_wait(driver: webdriver.Chrome):
-    """等待页面加载完成并关闭验证窗口"""
-    # 等待页面加载完成
-    wait(driver)
-    # 关闭验证窗口
-    close = handle_verification_window(driver)
-    if close:
-        # driver.refresh()
-        wait(driver)
+def new_driver(
+    lean: bool = False, capture: bool = False, user_data_dir: Optional[str] = None
+) -> webdriver.Chrome:
+    """
+    创建一个ChromeDriver实例
 
+    - lean: bool - 是否使用精简模式：无头运行，并屏蔽图片、媒体和 BLOCKED_URLS 中的请求
+    - capture: bool - 是否开启性能日志，以便读取页面自身请求到的 JSON 响应
+    - user_data_dir: str - 用户目录，保存 cookie、缓存和本地存储；为None时使用空白的临时目录。
+        同一个目录同时只能被一个浏览器使用
+    """
+    cService = webdriver.ChromeService(executable_path=DRIVER_PATH)
+    options = lean_options() if lean else webdriver.ChromeOptions()
+    if capture:
+        enable_performance_log(options)
+    if user_data_dir is not None:
+        options.add_argument(f"--user-data-dir={user_data_dir}")
+    driver = webdriver.Chrome(service=cService, options=options)
+    # 记录浏览器的配置，页面统计按配置分别汇总
+    driver.profile = "lean" if lean else "default"
+    # 验证窗口由页面内的钩子关闭，不再需要后台监控线程
+    install_challenge_hook(driver)
+    add_init_script(driver, RESOURCE_BUFFER_HOOK)
+    if lean:
+        block_urls(driver, BLOCKED_URLS)
+    return driver
+
+
+def new_lean_driver() -> webdriver.Chrome:
+    """创建一个精简模式的ChromeDriver实例，可直接作为浏览器池的 factory"""
+    return new_driver(lean=True)
 
-def handle_verification_window(driver, timeout=3):
-    # 获取调用位置的文件名和行号
-    caller_frame = inspect.currentframe().f_back
-    caller_filename = inspect.getframeinfo(caller_frame).filename
-    caller_lineno = inspect.getframeinfo(caller_frame).lineno
 
+def add_init_script(driver: webdriver.Chrome, source: str) -> bool:
+    """通过 CDP 在每个新文档加载前执行脚本，非 Chrome 浏览器返回 False"""
     try:
-        # 检查是否存在验证窗口的关闭按钮
-        close_button = WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "bili-mini-close-icon"))
-        )
-        # 如果存在，则点击关闭
-        close_button.click()
-        logger.debug(
-            f"调用者位置 - 文件名: {caller_filename} - 行号: {caller_lineno}\n验证窗口已关闭"
+        driver.execute_cdp_cmd(
+            "Page.addScriptToEvaluateOnNewDocument", {"source": source}
         )
         return True
-    except StaleElementReferenceException:
-        # 如果发生元素过时，则重新获取元素并尝试再次点击
-        logger.debug(f"尝试点击验证窗口的关闭按钮，但发生元素过时")
-        return False
-    except NoSuchElementException:
-        # 没有找到验证窗口
-        logger.debug(
-            f"调用者位置 - 文件名: {caller_filename} - 行号: {caller_lineno}\n未找到验证窗口"
-        )
-        return False
-    except TimeoutException:
-        # 查找验证窗口超时
-        logger.debug(
-            f"调用者位置 - 文件名: {caller_filename} - 行号: {caller_lineno}\n查找验证窗口超时"
-        )
+    except Exception as e:
+        logger.debug(f"无法注入脚本：{e}")
         return False
+
+
+def block_urls(driver: webdriver.Chrome, patterns: list[str]) -> bool:
+    """通过 CDP 屏蔽匹配 patterns 的请求，非 Chrome 浏览器返回 False"""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        return True
     except Exception as e:
-        # 发生其他错误
-        logger.error(
-            f"调用者位置 - 文件名: {caller_filename} - 行号: {caller_lineno}\n发生错误：{e}"
-        )
+        logger.debug(f"无法屏蔽请求：{e}")
         return False
 
 
-def monitor_verification_window(driver: webdriver.Chrome, stop_event: threading.Event):
-    while not stop_event.is_set():
-        try:
-            help_wait(driver)
-        except TimeoutException:
-            # 没有找到验证窗口，继续监控
-            continue
+def wait(
+    driver: webdriver.Chrome,
+    timeout: float = 30,
+    ready: Optional[list[str]] = None,
+    page: str = "document",
+    gone: Optional[list[str]] = None,
+) -> bool:
+    """
+    等待页面就绪，不再在就绪后固定休眠
+
+    Args:
+    - driver: webdriver.Chrome
+    - timeout: float, 最长等待时间，不超过 waits.MAX_WAIT
+    - ready: list[str], 就绪条件的 CSS 选择器，为空时等待 document.readyState 为 complete
+    - page: str, 页面类型，等待耗时按页面类型分别统计
+    - gone: list[str], 终止条件的 CSS 选择器，出现任一时立即停止等待
+
+    Returns:
+    - bool: 是否在超时前就绪
+    """
+    caller_frame = inspect.currentframe().f_back
+    caller_filename = inspect.getframeinfo(caller_frame).filename
+    caller_lineno = inspect.getframeinfo(caller_frame).lineno
+
+    is_ready = wait_ready(driver, ready or [], timeout, page, gone or [])
+    if not is_ready:
+        logger.warning(f"加载超时：{page}")
+
+    logger.debug(
+        f"调用者位置 - 文件名: {caller_filename} - 行号: {caller_lineno}\n页面加载完成"
+    )
+    return is_ready
+
+
+# 验证窗口关闭按钮的类名
+CHALLENGE_CLOSE_CLASS = "bili-mini-close-icon"
+
+# 注入到每个新文档的脚本：验证窗口插入 DOM 时立即点击关闭，并记录出现次数。
+# 由浏览器自身的 MutationObserver 驱动，不需要 Python 端轮询
+CHALLENGE_HOOK = f"""
+window.__challengeCount = 0;
+new MutationObserver(() => {{
+    const close = document.querySelector(".{CHALLENGE_CLOSE_CLASS}");
+    if (close) {{
+        window.__challengeCount += 1;
+        close.click();
+    }}
+}}).observe(document, {{childList: true, subtree: true}});
+"""
+
+# 页面加载后只检查一次：读取钩子记录的次数，若验证窗口仍在则关闭
+CHALLENGE_CHECK = f"""
+const close = document.querySelector(".{CHALLENGE_CLOSE_CLASS}");
+if (close) {{ close.click(); }}
+return (window.__challengeCount || 0) + (close ? 1 : 0);
+"""
+
+
+def session_key(driver: webdriver.Chrome) -> str:
+    """浏览器会话的标识，用于按浏览器汇总统计"""
+    return getattr(driver, "session_id", None) or str(id(driver))
+
+
+class ChallengeStats:
+    """按浏览器会话统计页面访问次数和验证窗口出现次数，多个工作线程共用"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages: dict[str, int] = {}
+        self.challenges: dict[str, int] = {}
+
+    def record(self, driver: webdriver.Chrome, challenges: int):
+        key = session_key(driver)
+        with self.lock:
+            self.pages[key] = self.pages.get(key, 0) + 1
+            self.challenges[key] = self.challenges.get(key, 0) + challenges
+
+    def rate(self) -> float:
+        """所有浏览器的验证窗口出现率"""
+        with self.lock:
+            pages = sum(self.pages.values())
+            return sum(self.challenges.values()) / pages if pages else 0.0
+
+    def totals(self, keys: Optional[set[str]] = None) -> tuple[int, int]:
+        """累计访问的页面数和验证窗口出现次数，keys 为None时汇总所有浏览器"""
+        with self.lock:
+            if keys is None:
+                return sum(self.pages.values()), sum(self.challenges.values())
+            pages = sum(self.pages.get(key, 0) for key in keys)
+            return pages, sum(self.challenges.get(key, 0) for key in keys)
+
+    def report(self):
+        with self.lock:
+            for key, pages in self.pages.items():
+                logger.info(
+                    f"浏览器 {key[:8]}：访问 {pages} 个页面，"
+                    f"出现验证窗口 {self.challenges.get(key, 0)} 次"
+                )
+
+
+CHALLENGES = ChallengeStats()
+
+
+class StartupStats:
+    """
+    统计浏览器的启动耗时和取用时的等待耗时，并按启动方式汇总之后的验证窗口出现率，多个工作线程共用
+
+    启动方式：
+    - cold: 新建的用户目录，启动后打开一次首页预热
+    - warm: 复用已预热的用户目录，cookie 和缓存仍在
+    - blank: 不使用持久化的用户目录
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.startups: dict[str, list[float]] = {}
+        # 浏览器会话 -> 启动方式
+        self.sessions: dict[str, str] = {}
+        self.waits: list[float] = []
+
+    def record(self, driver: webdriver.Chrome, kind: str, seconds: float):
+        with self.lock:
+            self.startups.setdefault(kind, []).append(seconds)
+            self.sessions[session_key(driver)] = kind
+
+    def handout(self, seconds: float):
+        """记录一次取用浏览器的等待耗时，预先启动的浏览器接近 0"""
+        with self.lock:
+            self.waits.append(seconds)
+
+    def report(self):
+        with self.lock:
+            startups = {kind: list(times) for kind, times in self.startups.items()}
+            sessions = dict(self.sessions)
+            waits = list(self.waits)
+        for kind, times in startups.items():
+            keys = {key for key, k in sessions.items() if k == kind}
+            pages, challenges = CHALLENGES.totals(keys)
+            rate = f"{challenges / pages:.1%}" if pages else "-"
+            logger.info(
+                f"浏览器启动（{kind}）：{len(times)} 次，"
+                f"平均 {sum(times) / len(times):.1f}s，最长 {max(times):.1f}s，"
+                f"之后访问 {pages} 个页面，验证窗口出现率 {rate}"
+            )
+        if waits:
+            logger.info(
+                f"取用浏览器 {len(waits)} 次，平均等待 {sum(waits) / len(waits):.2f}s"
+            )
+
+
+STARTUPS = StartupStats()
+
+
+def install_challenge_hook(driver: webdriver.Chrome) -> bool:
+    """在每个新文档加载前注入验证窗口钩子"""
+    return add_init_script(driver, CHALLENGE_HOOK)
+
+
+# 页面就绪时已传输的字节数（文档及所有资源）、从导航开始到加载完成的耗时和资源数。
+# 跨域资源未返回 Timing-Allow-Origin 时 transferSize 为 0，因此字节数是下限
+PAGE_METRICS = """
+const nav = performance.getEntriesByType("navigation")[0];
+const resources = performance.getEntriesByType("resource");
+let bytes = nav ? nav.transferSize : 0;
+for (const r of resources) { bytes += r.transferSize || 0; }
+const load = nav ? (nav.loadEventEnd || performance.now()) - nav.startTime : 0;
+return [bytes, load / 1000, resources.length];
+"""
+
+
+class PageStats:
+    """按浏览器配置和页面类型统计每个页面的传输字节数和加载耗时，多个工作线程共用"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (配置, 页面类型) -> [页面数, 字节数, 加载耗时, 资源数]
+        self.totals: dict[tuple[str, str], list] = {}
+
+    def record(self, profile: str, page: str, bytes_: int, load: float, resources: int):
+        with self.lock:
+            totals = self.totals.setdefault((profile, page), [0, 0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += bytes_
+            totals[2] += load
+            totals[3] += resources
+
+    def mean(self, profile: str, page: str) -> Optional[dict]:
+        """每个页面平均的字节数、加载耗时和资源数"""
+        with self.lock:
+            totals = self.totals.get((profile, page))
+        if not totals:
+            return None
+        count, bytes_, load, resources = totals
+        return {
+            "pages": count,
+            "bytes": bytes_ / count,
+            "load": load / count,
+            "resources": resources / count,
+        }
+
+    def report(self):
+        for profile, page in list(self.totals):
+            mean = self.mean(profile, page)
+            logger.info(
+                f"[{profile}] 页面 {page}：{mean['pages']} 个，"
+                f"平均传输 {mean['bytes'] / 1024:.0f}KB，"
+                f"平均加载 {mean['load']:.2f}s，平均资源数 {mean['resources']:.0f}"
+            )
+
+
+PAGES = PageStats()
+
+
+def record_page_metrics(driver: webdriver.Chrome, page: str):
+    """读取当前页面的传输字节数和加载耗时"""
+    try:
+        bytes_, load, resources = driver.execute_script(PAGE_METRICS)
+    except Exception as e:
+        logger.debug(f"读取页面统计时发生错误：{e}")
+        return
+    PAGES.record(
+        getattr(driver, "profile", "default"), page, int(bytes_), load, int(resources)
+    )
+
+
+def report_stats():
+    """输出浏览器启动、验证窗口、等待耗时和页面流量的统计"""
+    STARTUPS.report()
+    CHALLENGES.report()
+    WAITS.report()
+    PAGES.report()
+
+
+def handle_verification_window(driver: webdriver.Chrome) -> bool:
+    """
+    检查一次验证窗口，若存在则关闭，不等待、不阻塞
+
+    Returns:
+    - bool: 本页面是否出现过验证窗口
+    """
+    try:
+        challenges = int(driver.execute_script(CHALLENGE_CHECK) or 0)
+    except Exception as e:
+        logger.debug(f"检查验证窗口时发生错误：{e}")
+        challenges = 0
+    CHALLENGES.record(driver, challenges)
+    if challenges:
+        logger.debug(f"验证窗口已关闭，当前页面：{driver.current_url}")
+    return challenges > 0
+
+
+def help_wait(
+    driver: webdriver.Chrome,
+    ready: Optional[list[str]] = None,
+    page: str = "document",
+    timeout: float = 30,
+    gone: Optional[list[str]] = None,
+) -> bool:
+    """等待页面就绪并关闭验证窗口，返回是否出现过验证窗口"""
+    wait(driver, timeout, ready, page, gone)
+    record_page_metrics(driver, page)
+    return handle_verification_window(driver)
+
+
+def navigate(
+    driver: webdriver.Chrome,
+    url: str,
+    ready: Optional[list[str]] = None,
+    page: str = "document",
+    timeout: float = 30,
+    gone: Optional[list[str]] = None,
+) -> bool:
+    """
+    打开页面，等待就绪后检查一次验证窗口，返回是否出现过验证窗口。
+    回放时打开回放服务器上的对应地址，录制时把就绪后的页面保存到存档
+    """
+    driver.get(replay_url(url))
+    challenged = help_wait(driver, ready, page, timeout, gone)
+    REPLAY.record_page(driver, url)
+    return challenged
+
+
+# 页面上的计数：可带小数和“万”“亿”单位，如 1.5万、2.3亿、5593
+COUNT_PATTERN = r"^(?P<number>\d+(?:\.\d+)?)\s*(?P<unit>[万亿]?)$"
+COUNT_UNITS = {"": 1, "万": 10_000, "亿": 100_000_000}
 
 
 def convert_to_int(text: str) -> int:
-    """将字符串转换为整数"""
-    if "万" in text:
-        # 移除非数字字符
-        num = text.replace("万", "").replace(".", "")
-        # 转换为整数并乘以一万
-        return int(num) * 10000
+    """将字符串转换为整数，1.5万 -> 15000，批量转换请使用 normalize.parse_counts"""
+    match = re.match(COUNT_PATTERN, str(text).strip().replace(",", ""))
+    if match is None:
+        logger.warning(f"无法将 {text} 转换为整数")
+        return 0
+    return round(float(match["number"]) * COUNT_UNITS[match["unit"]])
+
+
+def format_duration(duration: str, logger=logger):
+    """将时长格式化为 HH:MM:SS"""
+    parts = duration.split(":")
+    if len(parts) == 2:
+        # 如果是MM:SS格式，添加小时部分
+        return "00:" + duration
+    elif len(parts) == 3:
+        # 如果已经是HH:MM:SS格式，直接返回
+        return duration
     else:
-        # 直接转换为整数
-        try:
-            return int(text)
-        except ValueError:
-            logger.warning(f"无法将 {text} 转换为整数")
-            return 0
+        logger.warning(f"未知的时长格式：{duration}")
+        # 如果格式未知，返回原始数据或者一个默认值
+        return duration  # 或者 '00:00:00'
+
+
+def format_pubtime(pubtime: str, logger=logger) -> str:
+    """将发布时间格式化为 YYYY-MM-DD HH:MM:SS"""
+    # 检查格式是否一致，若一致则直接返回
+    try:
+        datetime.strptime(pubtime, "%Y-%m-%d %H:%M:%S")
+        return pubtime
+    except ValueError:
+        logger.warning(f"未知的发布时间格式：{pubtime}")
+        return pubtime
+
+
+def uid_of(space: str) -> str:
+    """用户主页地址中的uid"""
+    return space.rstrip("/").split("/")[-1]
 
 
 def make_result_directory(
@@ -4,117 +4,201 @@ import os
 sys.path.append(os.getcwd())
 from global_utils import logger
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
 from pandas import Series, DataFrame
 from scraping.scraping_utils import (
-    monitor_verification_window,
-    wait,
+    navigate,
+    uid_of,
+    report_stats,
     SCRP_PATH,
     SCRP_RES_PATH,
-    DRIVER_PATH,
     make_result_directory,
 )
+from scraping.extractors import scrape, SPACE_PAGE
+from scraping.browser_pool import BrowserPool
+from scraping.driver_factory import PROFILE_PATH, DriverFactory
+from scraping.rate_control import RateController
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Optional
 import pandas as pd
-import threading
-
-
-def wait_for_videos_load(driver: webdriver.Chrome, locator, minimum_count, timeout=10):
-    """等待直到页面上至少有 minimum_count 个指定的元素出现，或超时"""
-    wait = WebDriverWait(driver, timeout)
-    try:
-        wait.until(lambda driver: len(driver.find_elements(*locator)) >= minimum_count)
-        return driver.find_elements(*locator)
-    except TimeoutException:
-        logger.debug(f"超时：未能在指定时间内找到{minimum_count}个元素")
-        return driver.find_elements(*locator)
 
 
 def get_bv(driver: webdriver.Chrome) -> list:
     """获取当前页面的所有视频的BV号"""
-    # 获取当前页面的所有视频的BV号
-    # 使用 XPath 查找所有具有指定类的 <li> 元素
-    # 使用 WebDriverWait 等待所有相关列表元素加载完毕
-    locator = (By.XPATH, "//li[contains(@class, 'list-item clearfix fakeDanmu-item')]")
-    list_items = wait_for_videos_load(driver, locator, 30)  # 每页至多 30 个视频
-    # 遍历找到的元素并提取 data-aid 属性值
-    data_aids = [item.get_attribute("data-aid") for item in list_items]
-    return data_aids
-
-
-def space_to_bv(spaces: Series) -> DataFrame:
-    """通过用户名获取该用户的主页地址"""
-    # 创建一个ChromeDriver实例
-    cService = webdriver.ChromeService(executable_path=DRIVER_PATH)
-    driver = webdriver.Chrome(service=cService)
-
-    # 创建 Event 对象
-    stop_event = threading.Event()
-    # 创建并启动监控线程
-    monitor_thread = threading.Thread(
-        target=monitor_verification_window, args=(driver, stop_event)
-    )
-    monitor_thread.start()
+    # 等待列表出现后，从页面源码中一次性提取所有 <li> 的 data-aid 属性值
+    return scrape(driver, SPACE_PAGE)["bvs"]
+
+
+def space_url(space: str, pn: int) -> str:
+    """用户空间投稿列表第 pn 页的地址，列表按发布时间从新到旧排列"""
+    return f"{space}/video?tid=0&pn={pn}&keyword=&order=pubdate"
+
+
+def list_page(driver: webdriver.Chrome, space: str, pn: int) -> tuple[list, int]:
+    """
+    直接打开投稿列表的第 pn 页，不再点击“下一页”并刷新
+
+    Returns:
+    - tuple[list, int]: 该页的BV号，以及列表的总页数
+    """
+    url = space_url(space, pn)
+    logger.info(f"正在访问：{url}")
+    # 等待页面加载完成，并检查一次验证窗口
+    navigate(driver, url, SPACE_PAGE.ready, SPACE_PAGE.name)
+    page = scrape(driver, SPACE_PAGE)
+    return page["bvs"], page["pages"] or 1
+
+
+def list_space_incremental(
+    driver: webdriver.Chrome, space: str, known: set[str]
+) -> list:
+    """
+    从第一页开始逐页获取，遇到已知的BV号即停止，返回比它更新的BV号
+    列表按发布时间排序，已知BV号之后的视频都已经获取过
+    """
+    new_bvs = []
+    pn, total = 1, 1
+    while pn <= total:
+        bvs, total = list_page(driver, space, pn)
+        for bv in bvs:
+            if bv in known:
+                return new_bvs
+            new_bvs.append(bv)
+        if not bvs:
+            break
+        pn += 1
+    return new_bvs
+
+
+def space_to_bv(
+    spaces: Series,
+    known: Optional[dict[str, set]] = None,
+    max_workers: int = 1,
+    lean: bool = True,
+    controller: Optional[RateController] = None,
+    profile_root: str = PROFILE_PATH,
+) -> DataFrame:
+    """
+    通过用户主页地址获取该用户的所有视频的BV号
+
+    - spaces: Series - 用户主页地址
+    - known: dict[str, set] - 增量模式，键为uid，值为已获取的BV号；
+        为None时获取全部投稿，先读取每个用户的第一页得到总页数，再把其余页分发给所有工作线程
+    - max_workers: int - 同时工作的浏览器数量
+    - lean: bool - 是否使用无头且屏蔽图片、媒体的精简浏览器
+    - controller: RateController - 各阶段共用的限速器，为None时新建一个
+    - profile_root: str - 浏览器用户目录所在的目录
+    """
+    # 验证窗口在每次打开页面后检查，不再为每个浏览器启动监控线程
+    factory = DriverFactory("space", lean, root=profile_root)
+    pool = BrowserPool(max_workers, factory=factory)
+    if controller is None:
+        controller = RateController(max_workers)
+    # 每次借用浏览器都占用一个并发名额和一个令牌
+    call = partial(controller.call, pool.call)
 
     # 返回数据
     data = {}
-
-    # 访问用户主页
-    for space in spaces:
-        url = f"{space}" + "/video?tid=0&pn=1&keyword=&order=pubdate"
-        uid = space.split("/")[-1]
-        driver.get(url)
-        # 最大化窗口
-        driver.maximize_window()
-        logger.info(f"正在访问：{url}")
-        # 等待页面加载完成并关闭验证窗口
-        wait(driver)
-
-        data[uid] = []
-        while True:
-            # 本循环用于遍历空间的的所有分页
-            try:
-                # 获取当前页面的所有视频的BV号
-                data[uid].extend(get_bv(driver))
-                next_page_button = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable(
-                        (
-                            By.XPATH,
-                            "//a[contains(text(), '下一页')]",
-                        )  # 注意这里是一个元组
-                    )
-                )
-                next_page_button.click()
-                # 等待页面加载完成并关闭验证窗口
-                wait(driver)
-                driver.refresh()
-            except TimeoutException:
-                logger.debug("未找到下一页按钮")
-                break
-
-        logger.info(f"用户 {uid} 的所有视频的BV号：{data[uid]}")
-
-    # 停止监控线程
-    stop_event.set()
-    # 等待监控线程结束
-    monitor_thread.join()
-    driver.quit()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if known is not None:
+            futures = {
+                executor.submit(
+                    call,
+                    list_space_incremental,
+                    space,
+                    known.get(uid_of(space), set()),
+                ): uid_of(space)
+                for space in spaces
+            }
+            for future in as_completed(futures):
+                uid = futures[future]
+                try:
+                    data[uid] = future.result()
+                except Exception as e:
+                    logger.error(f"获取用户 {uid} 的新视频时发生错误：{e}")
+                    data[uid] = []
+                logger.info(f"用户 {uid} 的新视频的BV号：{data[uid]}")
+        else:
+            pages: dict[str, dict[int, list]] = {}
+            first = {
+                executor.submit(call, list_page, space, 1): space for space in spaces
+            }
+            rest = {}
+            for future in as_completed(first):
+                space = first[future]
+                uid = uid_of(space)
+                try:
+                    bvs, total = future.result()
+                except Exception as e:
+                    logger.error(f"获取用户 {uid} 的第 1 页时发生错误：{e}")
+                    bvs, total = [], 1
+                pages[uid] = {1: bvs}
+                # 其余页直接按页码分发
+                for pn in range(2, total + 1):
+                    rest[executor.submit(call, list_page, space, pn)] = (uid, pn)
+
+            for future in as_completed(rest):
+                uid, pn = rest[future]
+                try:
+                    pages[uid][pn] = future.result()[0]
+                except Exception as e:
+                    logger.error(f"获取用户 {uid} 的第 {pn} 页时发生错误：{e}")
+
+            for uid, uid_pages in pages.items():
+                data[uid] = [bv for pn in sorted(uid_pages) for bv in uid_pages[pn]]
+                logger.info(f"用户 {uid} 的所有视频的BV号：{data[uid]}")
+
+    pool.close()
+    report_stats()
+    controller.report()
 
     # 创建DataFrame
     df = pd.DataFrame.from_dict(data, orient="index").transpose()
     return df
 
 
-def main():
-    if os.path.exists(f"{SCRP_RES_PATH}\\space_bv.csv"):
-        logger.warning(f"{SCRP_RES_PATH}\\space_bv.csv 已存在，请删除后重试")
-        return
+def refresh_space_bv(
+    spaces: Series,
+    space_bv_path: str,
+    max_workers: int = 1,
+    controller: Optional[RateController] = None,
+) -> DataFrame:
+    """
+    增量刷新 space_bv.csv：每个用户只获取比已知BV号更新的视频，插入到该用户列的最前面
+
+    Returns:
+    - DataFrame: 新发现的视频，格式与 space_to_bv 的返回值相同
+    """
+    space_bv = pd.read_csv(space_bv_path, index_col=0)
+    known = {uid: set(space_bv[uid].dropna()) for uid in space_bv.columns}
+    new = space_to_bv(
+        spaces, known=known, max_workers=max_workers, controller=controller
+    )
+
+    columns = {}
+    for uid in dict.fromkeys(list(new.columns) + list(space_bv.columns)):
+        new_bvs = list(new[uid].dropna()) if uid in new.columns else []
+        old_bvs = list(space_bv[uid].dropna()) if uid in space_bv.columns else []
+        columns[uid] = pd.Series(new_bvs + old_bvs, dtype=object)
+    pd.DataFrame(columns).to_csv(space_bv_path)
+
+    logger.info(f"共发现 {new.count().sum()} 个新视频")
+    return new
+
+
+def main(max_workers: int = 3):
     # 读取csv文件
     df = pd.read_csv(f"{SCRP_RES_PATH}\\info.csv", header=0)
+    if os.path.exists(f"{SCRP_RES_PATH}\\space_bv.csv"):
+        # 已存在时只增量获取新视频
+        refresh_space_bv(
+            df["space"].dropna(),
+            f"{SCRP_RES_PATH}\\space_bv.csv",
+            max_workers=max_workers,
+        )
+        return
     # 通过用户名获取该用户的主页地址
-    bvs = space_to_bv(df["space"].dropna())
+    bvs = space_to_bv(df["space"].dropna(), max_workers=max_workers)
     # 用户主页地址写入csv文件
     make_result_directory(start_path=SCRP_PATH)
     bvs.to_csv(f"{SCRP_RES_PATH}\\space_bv.csv")
@@ -0,0 +1,254 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from scraping.dataset import write_part
+from pandas import DataFrame, Series
+from typing import Optional
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import ast
+import glob
+import itertools
+import time
+import uuid
+
+# 标签字典的文件名和 (bv, tag_id) 表的目录名，表的每个文件为一批写入的视频
+DICTIONARY_FILE = "dictionary"
+BV_TAGS_FILE = "bv_tags"
+BV_TAGS_COLUMNS = ["bv", "uid", "tag_id", "position"]
+
+
+def tags_path(output_file: str) -> str:
+    """标签表的保存目录：detail.csv -> detail_tags"""
+    return f"{os.path.splitext(str(output_file))[0]}_tags"
+
+
+def parse_tag_lists(values: Series) -> list[list]:
+    """
+    将 csv 中的标签字符串（如 "['生活', '日常']"）转换为列表，缺失值为空列表。
+    只对不重复的字符串按 "', '" 切分；含双引号或反斜杠的字符串（标签本身带引号）才使用 ast.literal_eval
+    """
+    codes, uniques = pd.factorize(values)
+    lookup = [
+        (
+            list(ast.literal_eval(text))
+            if '"' in text or "\\" in text
+            else text[2:-2].split("', '") if len(text) > 4 else []
+        )
+        for text in uniques
+    ]
+    # 缺失值的编码为 -1，对应追加在末尾的空列表
+    lookup.append([])
+    return [list(lookup[code]) for code in codes]
+
+
+def as_tag_lists(values: Series) -> list[list]:
+    """标签列可以是字符串形式（csv）或列表（Parquet 数据集）"""
+    if len(values) and values.map(lambda x: isinstance(x, str)).any():
+        return parse_tag_lists(values)
+    return [list(x) if pd.api.types.is_list_like(x) else [] for x in values]
+
+
+class TagIndex:
+    """
+    字典编码的标签：标签字典（tag_id -> 标签）和 (bv, uid, tag_id, position) 表，
+    表按 tag_id 排序，同一标签的视频相邻，即标签到视频的倒排索引；
+    position 为标签在原列表中的位置，还原时顺序和重复的标签与原列表相同
+
+    Functions:
+    - from_detail: 由视频信息的标签列构建
+    - videos: 带有某个标签的视频，可以只查某个用户
+    - tags_of: 某个视频的标签
+    - counts: 每个标签的视频数
+    - to_lists: 还原为每个视频一个列表的标签列
+    - to_detail: 还原为每个视频一行的 bv、uid、tags 表
+    - save / load: 保存到目录或从目录读取
+    - append: 将一批视频的标签追加到已保存的目录
+    - exists: 目录中是否已有标签表
+    """
+
+    def __init__(self, dictionary: pd.Index, bv_tags: DataFrame):
+        """
+        - dictionary: Index - 位置即 tag_id
+        - bv_tags: DataFrame - 列为 bv、uid、tag_id、position
+        """
+        self.dictionary = pd.Index(dictionary, name="tag")
+        order = np.argsort(bv_tags["tag_id"].to_numpy(), kind="stable")
+        self.bv_tags = bv_tags.iloc[order].reset_index(drop=True)
+        # 标签 i 的视频位于 bv_tags 的 offsets[i] 到 offsets[i + 1] 行
+        self.offsets = np.searchsorted(
+            self.bv_tags["tag_id"].to_numpy(), np.arange(len(self.dictionary) + 1)
+        )
+
+    @classmethod
+    def from_detail(cls, detail: DataFrame) -> "TagIndex":
+        """
+        - detail: DataFrame - 包含 bv、uid、tags 列，tags 为列表或 csv 中的字符串形式
+        """
+        dictionary, bv_tags = encode(detail, pd.Index([], dtype=object))
+        return cls(dictionary, bv_tags)
+
+    def tag_id(self, tag: str) -> Optional[int]:
+        position = self.dictionary.get_indexer([tag])[0]
+        return None if position < 0 else int(position)
+
+    def videos(self, tag: str, uid: Optional[str] = None) -> list[str]:
+        """带有 tag 的视频的BV号，uid 不为None时只返回该用户的视频"""
+        tag_id = self.tag_id(tag)
+        if tag_id is None:
+            return []
+        rows = self.bv_tags.iloc[self.offsets[tag_id] : self.offsets[tag_id + 1]]
+        if uid is not None:
+            rows = rows[rows["uid"] == str(uid)]
+        # 同一个视频可能重复带有同一个标签
+        return rows["bv"].drop_duplicates().tolist()
+
+    def tags_of(self, bv: str) -> list[str]:
+        rows = self.bv_tags[self.bv_tags["bv"] == bv].sort_values("position")
+        return self.dictionary[rows["tag_id"].to_numpy()].tolist()
+
+    def counts(self) -> Series:
+        """每个标签的视频数，从多到少排列"""
+        unique = self.bv_tags.drop_duplicates(["tag_id", "bv"])["tag_id"].to_numpy()
+        counts = Series(
+            np.bincount(unique, minlength=len(self.dictionary)),
+            index=self.dictionary,
+            name="videos",
+        )
+        return counts.sort_values(ascending=False, kind="stable")
+
+    def to_lists(self, bvs: Series) -> list[list]:
+        """按 bvs 的顺序还原每个视频的标签列表，与构建时的列表相同"""
+        grouped = (
+            self.bv_tags.sort_values(["bv", "position"], kind="stable")
+            .assign(tag=lambda df: self.dictionary[df["tag_id"].to_numpy()])
+            .groupby("bv", sort=False)["tag"]
+            .agg(list)
+        )
+        return [
+            tags if isinstance(tags, list) else []
+            for tags in grouped.reindex(bvs.astype(str))
+        ]
+
+    def to_detail(self) -> DataFrame:
+        """每个视频一行的 bv、uid、tags 表，没有标签的视频不包括在内"""
+        videos = self.bv_tags.drop_duplicates("bv")[["bv", "uid"]]
+        return videos.assign(tags=self.to_lists(videos["bv"])).reset_index(drop=True)
+
+    def save(self, path: str):
+        """
+        标签字典写入 path 下的一个 Parquet 文件，(bv, uid, tag_id, position) 表写入 bv_tags 目录，
+        覆盖已保存的内容
+        """
+        for file in bv_tags_files(path):
+            os.remove(file)
+        write_dictionary(self.dictionary, path)
+        write_bv_tags(self.bv_tags, path)
+        logger.info(
+            f"已保存 {len(self.dictionary)} 个标签、{len(self.bv_tags)} 条视频标签至 {path}"
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "TagIndex":
+        """读取保存的标签表，同一个视频出现在多个文件中时保留最后写入的一批"""
+        frames = [
+            pq.read_table(file).to_pandas().assign(part=i)
+            for i, file in enumerate(bv_tags_files(path))
+        ]
+        if not frames:
+            return cls(read_dictionary(path), DataFrame(columns=BV_TAGS_COLUMNS))
+        bv_tags = pd.concat(frames, ignore_index=True)
+        latest = bv_tags.groupby("bv")["part"].transform("max")
+        bv_tags = bv_tags[bv_tags["part"] == latest].drop(columns="part")
+        return cls(read_dictionary(path), bv_tags.reset_index(drop=True))
+
+    @staticmethod
+    def append(detail: DataFrame, path: str) -> int:
+        """
+        将一批视频的标签追加到 path：新标签编号接在字典末尾，(bv, uid, tag_id, position) 写入一个新文件，
+        已有的文件不做修改；同一线程写入，不支持多个进程同时追加到同一个目录
+
+        - detail: DataFrame - 包含 bv、uid、tags 列，bv 可以是索引
+
+        Returns:
+        - int: 写入的视频标签条数
+        """
+        if "bv" not in detail.columns:
+            detail = detail.reset_index()
+        known = read_dictionary(path)
+        dictionary, bv_tags = encode(detail, known)
+        if len(dictionary) > len(known):
+            write_dictionary(dictionary, path)
+        if len(bv_tags):
+            write_bv_tags(bv_tags, path)
+        return len(bv_tags)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return bool(bv_tags_files(path)) and os.path.exists(dictionary_file(path))
+
+
+def encode(detail: DataFrame, known: pd.Index) -> tuple[pd.Index, DataFrame]:
+    """
+    将标签列编码为 (bv, uid, tag_id, position) 表，已在 known 中的标签沿用原编号，
+    新标签排序后编号接在末尾
+
+    Returns:
+    - tuple[Index, DataFrame]: 扩充后的字典和视频标签表
+    """
+    lists = as_tag_lists(detail["tags"])
+    lengths = np.array([len(tags) for tags in lists], dtype=int)
+    rows = np.repeat(np.arange(len(lists)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    flat = np.fromiter(itertools.chain.from_iterable(lists), dtype=object, count=-1)
+    new = pd.Index(pd.unique(flat), dtype=object).difference(known, sort=False)
+    dictionary = known.append(pd.Index(np.sort(new.to_numpy()), dtype=object))
+    bv_tags = DataFrame(
+        {
+            "bv": detail["bv"].astype(str).to_numpy()[rows],
+            "uid": detail["uid"].astype(str).to_numpy()[rows],
+            "tag_id": dictionary.get_indexer(flat).astype("int32"),
+            "position": (np.arange(len(rows)) - starts[rows]).astype("int32"),
+        }
+    )
+    return dictionary, bv_tags
+
+
+def dictionary_file(path: str) -> str:
+    return os.path.join(str(path), f"{DICTIONARY_FILE}.parquet")
+
+
+def bv_tags_files(path: str) -> list[str]:
+    """bv_tags 目录中的文件，按写入顺序排列；以 . 开头的临时文件不包括在内"""
+    return sorted(glob.glob(os.path.join(str(path), BV_TAGS_FILE, "*.parquet")))
+
+
+def read_dictionary(path: str) -> pd.Index:
+    """读取标签字典，尚未保存时为空"""
+    if not os.path.exists(dictionary_file(path)):
+        return pd.Index([], dtype=object, name="tag")
+    dictionary = pq.read_table(dictionary_file(path))
+    return pd.Index(
+        dictionary["tag"].to_numpy(zero_copy_only=False), dtype=object, name="tag"
+    )
+
+
+def write_dictionary(dictionary: pd.Index, path: str):
+    table = pa.table(
+        {
+            "tag_id": pa.array(np.arange(len(dictionary)), pa.int32()),
+            "tag": pa.array(dictionary.to_numpy(), pa.string()),
+        }
+    )
+    write_part(table, str(path), DICTIONARY_FILE)
+
+
+def write_bv_tags(bv_tags: DataFrame, path: str) -> str:
+    # 文件名以时间戳开头，按文件名排序即为写入顺序
+    name = f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    table = pa.Table.from_pandas(bv_tags, preserve_index=False)
+    return write_part(table, os.path.join(str(path), BV_TAGS_FILE), name)
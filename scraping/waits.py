@@ -0,0 +1,158 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+from global_utils import logger
+from selenium.common.exceptions import JavascriptException
+from collections import deque
+from typing import Callable, Optional
+import threading
+import time
+
+# 单次等待的硬性上限，调用方传入更长的超时也不会超过该值
+MAX_WAIT = 30
+# 轮询间隔从 INITIAL_INTERVAL 开始按 BACKOFF 倍增长，最长 MAX_INTERVAL
+INITIAL_INTERVAL = 0.05
+BACKOFF = 1.5
+MAX_INTERVAL = 0.5
+# 直方图的桶上界，单位秒
+BUCKETS = [0.1, 0.25, 0.5, 1, 2, 4, 8, 16, MAX_WAIT]
+
+# 有就绪条件时只检查选择器，页面中的广告和统计脚本不影响就绪判断；
+# 没有就绪条件时等待 document.readyState 为 complete。
+# 出现任一终止条件（如视频不存在的提示）时页面不会再就绪，立即停止等待
+READY_SCRIPT = """
+const selectors = arguments[0];
+if (arguments[1].some(s => document.querySelector(s) !== null)) {
+    return true;
+}
+if (selectors.length) {
+    return selectors.every(s => document.querySelector(s) !== null);
+}
+return document.readyState === "complete";
+"""
+
+
+def nearest_rank(samples: list[float], q: float) -> Optional[float]:
+    """已排序的样本的分位数，没有样本时为None"""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+
+class WaitStats:
+    """
+    按页面类型记录每次等待的耗时，多个工作线程共用
+
+    Functions:
+    - record: 记录一次等待
+    - percentile: 某类页面等待耗时的分位数
+    - histogram: 某类页面等待耗时落在各个桶中的次数
+    - totals: 所有页面累计的等待次数和超时次数
+    - report: 输出每类页面的 p50/p95
+    """
+
+    def __init__(self, max_samples: int = 10000):
+        self.lock = threading.Lock()
+        self.max_samples = max_samples
+        self.samples: dict[str, deque] = {}
+        self.timeouts: dict[str, int] = {}
+        # 累计的等待次数，不受 max_samples 限制
+        self.waits = 0
+
+    def record(self, page: str, elapsed: float, ready: bool):
+        with self.lock:
+            if page not in self.samples:
+                self.samples[page] = deque(maxlen=self.max_samples)
+                self.timeouts[page] = 0
+            self.samples[page].append(elapsed)
+            self.waits += 1
+            if not ready:
+                self.timeouts[page] += 1
+
+    def percentile(self, page: str, q: float) -> Optional[float]:
+        with self.lock:
+            samples = sorted(self.samples.get(page, ()))
+        return nearest_rank(samples, q)
+
+    def histogram(self, page: str) -> dict[float, int]:
+        with self.lock:
+            samples = list(self.samples.get(page, ()))
+        counts = dict.fromkeys(BUCKETS, 0)
+        for elapsed in samples:
+            bucket = next((b for b in BUCKETS if elapsed <= b), BUCKETS[-1])
+            counts[bucket] += 1
+        return counts
+
+    def totals(self) -> tuple[int, int]:
+        with self.lock:
+            return self.waits, sum(self.timeouts.values())
+
+    def report(self):
+        # 在锁内复制样本和超时次数，工作线程同时记录时不会在遍历中改变字典
+        with self.lock:
+            snapshot = {
+                page: (sorted(samples), self.timeouts[page])
+                for page, samples in self.samples.items()
+            }
+        for page, (samples, timeouts) in snapshot.items():
+            logger.info(
+                f"页面 {page}：等待 {len(samples)} 次，"
+                f"p50 {nearest_rank(samples, 50):.2f}s，"
+                f"p95 {nearest_rank(samples, 95):.2f}s，"
+                f"超时 {timeouts} 次"
+            )
+
+
+WAITS = WaitStats()
+
+
+def poll_until(
+    predicate: Callable[[], bool],
+    timeout: float,
+    page: str,
+    stats: WaitStats = None,
+) -> bool:
+    """
+    以指数增长的间隔轮询 predicate，直到其为真或超时，并记录本次等待的耗时
+
+    Args:
+    - predicate: Callable, 就绪条件
+    - timeout: float, 最长等待时间，不超过 MAX_WAIT
+    - page: str, 页面类型，用于分类统计
+
+    Returns:
+    - bool: 是否在超时前就绪
+    """
+    stats = WAITS if stats is None else stats
+    timeout = min(timeout, MAX_WAIT)
+    start = time.monotonic()
+    interval = INITIAL_INTERVAL
+    while True:
+        try:
+            ready = bool(predicate())
+        except JavascriptException:
+            # 页面正在跳转时脚本可能执行失败，视为尚未就绪
+            ready = False
+        elapsed = time.monotonic() - start
+        if ready or elapsed >= timeout:
+            break
+        time.sleep(min(interval, timeout - elapsed))
+        interval = min(interval * BACKOFF, MAX_INTERVAL)
+
+    stats.record(page, elapsed, ready)
+    return ready
+
+
+def wait_ready(
+    driver, ready: list[str], timeout: float, page: str, gone: list[str] = ()
+) -> bool:
+    """
+    等待页面上同时存在 ready 中的所有选择器，为空时等待文档加载完成；
+    页面上存在 gone 中的任一选择器时立即返回
+    """
+    return poll_until(
+        lambda: driver.execute_script(READY_SCRIPT, list(ready), list(gone)),
+        timeout,
+        page,
+    )
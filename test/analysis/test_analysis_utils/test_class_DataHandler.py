@@ -5,8 +5,18 @@
 
 from test_config import TEST_CSV_PATH
 import pytest
+import numpy as np
 import pandas as pd
-from analysis.analysis_utils import DataHandler
+from analysis import analysis_utils
+from analysis.analysis_utils import (
+    CACHE_VERSION,
+    DEFAULT_WEIGHTS,
+    DataHandler,
+    ParseCache,
+)
+from scraping.tag_index import TagIndex
+import os
+
 
 class TestDataHandlerFuncs:
     ########################################################################################
@@ -55,13 +65,151 @@ class TestDataHandlerFuncs:
     ########################################################################################
 
     def test_parse(self, expected_dataframe_shape, expected_dtypes):
-        result_df = DataHandler.parse(TEST_CSV_PATH)
+        result_df = DataHandler.parse(TEST_CSV_PATH, cache=False)
         self.verify_dataframe(result_df, expected_dataframe_shape, expected_dtypes)
 
     def test_get_detail(self, expected_dataframe_shape, expected_dtypes):
-        result_df = DataHandler.get_detail()
+        result_df = DataHandler.get_detail(cache=False)
         self.verify_dataframe(result_df, expected_dataframe_shape, expected_dtypes)
 
+    def test_parse_cache(
+        self, tmp_path, monkeypatch, expected_dataframe_shape, expected_dtypes
+    ):
+        detail_path = tmp_path / "detail.csv"
+        detail_path.write_bytes(open(TEST_CSV_PATH, "rb").read())
+        parsed = DataHandler.parse(detail_path)
+        assert os.path.exists(ParseCache.cache_path(detail_path))
+
+        # 源文件未变化时读取缓存，结果与解析csv文件完全一致
+        cached = ParseCache.load(detail_path)
+        self.verify_dataframe(cached, expected_dataframe_shape, expected_dtypes)
+        pd.testing.assert_frame_equal(cached, parsed)
+        assert cached["tags"].iloc[0] == parsed["tags"].iloc[0]
+
+        # 只有修改时间变化时，内容哈希相同，仍然使用缓存
+        os.utime(detail_path, ns=(0, 0))
+        assert ParseCache.load(detail_path) is not None
+
+        # 解析规则变化（缓存格式的版本增加）后，旧的缓存失效
+        monkeypatch.setattr(analysis_utils, "CACHE_VERSION", CACHE_VERSION + 1)
+        assert ParseCache.load(detail_path) is None
+        DataHandler.parse(detail_path)
+        assert ParseCache.load(detail_path) is not None
+
+        # 内容变化后重新解析
+        with open(detail_path, "a", encoding="utf-8") as f:
+            f.write("BVnew,1,标题,00:00:10,2024-01-01 00:00:00,1,1,1,1,1,1,1,[]\n")
+        assert ParseCache.load(detail_path) is None
+        assert len(DataHandler.parse(detail_path)) == len(parsed) + 1
+        assert len(ParseCache.load(detail_path)) == len(parsed) + 1
+
+    def test_get_tags(self, tmp_path):
+        detail_path = tmp_path / "detail.csv"
+        detail_path.write_bytes(open(TEST_CSV_PATH, "rb").read())
+        tags = DataHandler.get_tags(detail_path)
+        assert TagIndex.exists(tmp_path / "detail_tags")
+        # 已有标签表时直接读取
+        loaded = DataHandler.get_tags(detail_path)
+        assert loaded.videos("日常", "304578055") == tags.videos("日常", "304578055")
+
+    def test_parse_tag_table(self, tmp_path, monkeypatch):
+        expected = DataHandler.parse(TEST_CSV_PATH, cache=False)
+        detail_path = tmp_path / "detail.csv"
+        detail_path.write_bytes(open(TEST_CSV_PATH, "rb").read())
+        DataHandler.get_tags(detail_path)
+
+        # 有标签表时按BV号从标签表取标签，不再切分标签字符串
+        def split(values):
+            raise AssertionError("不应切分标签字符串")
+
+        monkeypatch.setattr(analysis_utils, "parse_tag_lists", split)
+        parsed = DataHandler.parse(detail_path, cache=False)
+        assert parsed["tags"].tolist() == expected["tags"].tolist()
+        assert list(parsed.columns) == list(expected.columns)
+
+    @pytest.mark.parametrize("top", [0, 1, 5, 1000])
+    def test_top_videos(self, top):
+        detail = DataHandler.parse(TEST_CSV_PATH, cache=False)
+        weights = {**DEFAULT_WEIGHTS, "like": 3, "coin": 10}
+        result = DataHandler.top_videos(detail, top, weights)
+        assert list(result) == detail["uid"].unique().tolist()
+        for uid, tops in result.items():
+            expected = DataHandler.top_video(uid, detail, weights).head(top)
+            assert len(tops) == len(expected)
+            # 得分相同的视频顺序可能不同，按得分和BV号排序后比较
+            by = ["score", "bv"]
+            pd.testing.assert_frame_equal(
+                tops.sort_values(by, ascending=[False, True], ignore_index=True),
+                expected.sort_values(by, ascending=[False, True], ignore_index=True),
+            )
+
+    def test_top_videos_ties_and_missing(self):
+        detail = pd.DataFrame(
+            {
+                "uid": ["a", "b", "a", "a", "b", "a"],
+                "bv": ["BV1", "BV2", "BV3", "BV4", "BV5", "BV6"],
+                **{
+                    key: pd.array([1, 2, None, 1, 2, 5], dtype="Int64")
+                    for key in DEFAULT_WEIGHTS
+                },
+            }
+        )
+        result = DataHandler.top_videos(detail, 2)
+        # 得分相同时保留先出现的视频，缺失的得分排在最后
+        assert result["a"]["bv"].tolist() == ["BV6", "BV1"]
+        assert result["b"]["bv"].tolist() == ["BV2", "BV5"]
+        assert DataHandler.top_videos(detail, 5)["a"]["bv"].tolist()[-1] == "BV3"
+        with pytest.raises(ValueError):
+            DataHandler.top_videos(detail, 2, {"click": 11})
+
+    def test_top_profiles(self):
+        detail = DataHandler.parse(TEST_CSV_PATH, cache=False)
+        profiles = {
+            "default": DEFAULT_WEIGHTS,
+            "coin": {**DEFAULT_WEIGHTS, "coin": 10},
+            "like": {**DEFAULT_WEIGHTS, "like": 5, "share": 3},
+        }
+        scores = DataHandler.score_profiles(detail, profiles)
+        assert scores.columns.tolist() == list(profiles)
+        pd.testing.assert_series_equal(
+            scores["coin"].astype("Float64"),
+            DataHandler.score(detail, profiles["coin"]),
+            check_names=False,
+        )
+
+        result = DataHandler.top_profiles(detail, profiles, 3)
+        assert result.columns.tolist()[:2] == ["profile", "rank"]
+        for name, weights in profiles.items():
+            tops = result[result["profile"] == name]
+            expected = DataHandler.top_videos(detail, 3, weights)
+            for uid, rows in tops.groupby("uid", sort=False):
+                assert rows["rank"].tolist() == list(range(1, len(rows) + 1))
+                assert set(rows["bv"]) == set(expected[uid]["bv"])
+                assert rows["score"].is_monotonic_decreasing
+
+    @pytest.mark.parametrize(
+        "normalize", ["zscore", "log1p", "rank", {"click": "log1p", "like": "rank"}]
+    )
+    def test_normalize_metrics(self, normalize):
+        detail = DataHandler.parse(TEST_CSV_PATH, cache=False)
+        metrics = DataHandler.normalize_metrics(detail, normalize)
+        assert metrics.shape == (len(detail), len(DEFAULT_WEIGHTS))
+        click = metrics[:, 0]
+        if normalize == "zscore":
+            assert abs(pd.Series(click).mean()) < 1e-9
+        elif normalize == "rank":
+            # 同一UP主的视频中的百分位排名
+            assert ((click > 0) & (click <= 1)).all()
+            uid = detail["uid"] == detail["uid"].iloc[0]
+            assert click[uid.to_numpy()].max() == 1
+        else:
+            assert click.tolist() == pytest.approx(
+                list(pd.Series(detail["click"], dtype=float).map(np.log1p)),
+                nan_ok=True,
+            )
+        with pytest.raises(ValueError):
+            DataHandler.normalize_metrics(detail, "minmax")
+
     # 参数化测试函数
     @pytest.mark.parametrize(
         "input_series, numeric_output",
@@ -82,5 +230,6 @@ class TestDataHandlerFuncs:
         result = DataHandler.convert_to_numeric(input_series)
         pd.testing.assert_series_equal(result, numeric_output)
 
+
 if __name__ == "__main__":
-    pytest.main(["-v", __file__])
\ No newline at end of file
+    pytest.main(["-v", __file__])
@@ -0,0 +1,44 @@
+"""
+测试 run_pipeline 函数只在 work_dir 中读写
+位于 /scraping/benchmark.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+import pandas as pd
+from scraping import benchmark
+
+
+def test_state_in_work_dir(tmp_path, monkeypatch):
+    calls = {}
+
+    def fake_name_to_space(names, **kwargs):
+        calls["name"] = kwargs
+        return pd.DataFrame({"name": names, "space": "https://space.bilibili.com/1"})
+
+    def fake_space_to_bv(spaces, **kwargs):
+        calls["space"] = kwargs
+        return pd.DataFrame({"1": ["BV1", "BV2"]})
+
+    def fake_crawl(frontier, chunk_size, **kwargs):
+        calls["detail"] = kwargs
+        frontier.mark_done(frontier.lease(10))
+
+    monkeypatch.setattr(benchmark, "name_to_space", fake_name_to_space)
+    monkeypatch.setattr(benchmark, "space_to_bv", fake_space_to_bv)
+    monkeypatch.setattr(benchmark, "multithreading_to_detail", fake_crawl)
+
+    report = benchmark.run_pipeline(["up1"], str(tmp_path))
+    assert report.loc["detail", "items"] == 2
+    # 浏览器用户目录、useless.csv 和 detail.csv 都不指向正式的目录
+    for stage in ["name", "space", "detail"]:
+        assert calls[stage]["profile_root"].startswith(str(tmp_path))
+    for key in ["useless_path", "output_file"]:
+        assert calls["detail"][key].startswith(str(tmp_path))
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,96 @@
+"""
+测试 BrowserPool 类
+位于 /scraping/browser_pool.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+from scraping.browser_pool import BrowserPool
+
+
+class FakeDriver:
+    """只实现浏览器池用到的方法"""
+
+    def __init__(self):
+        self.alive = True
+        self.quitted = False
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("session deleted")
+        return 1
+
+    @property
+    def window_handles(self):
+        return ["main"]
+
+    def quit(self):
+        self.quitted = True
+
+
+class TestBrowserPool:
+    @pytest.fixture
+    def pool(self):
+        pool = BrowserPool(2, factory=FakeDriver, max_pages=3)
+        yield pool
+        pool.close()
+
+    def test_acquire_release(self, pool):
+        first = pool.acquire()
+        second = pool.acquire()
+        assert first.slot != second.slot
+        pool.release(first)
+        pool.release(second)
+        # 归还后可以继续借出，浏览器不会被关闭
+        assert pool.acquire().driver.quitted is False
+
+    def test_recycle_after_max_pages(self):
+        pool = BrowserPool(1, factory=FakeDriver, max_pages=3)
+        pooled = pool.acquire()
+        driver = pooled.driver
+        for _ in range(3):
+            pool.release(pooled)
+            pooled = pool.acquire()
+        assert driver.quitted
+        assert pooled.driver is not driver
+        assert pooled.pages == 0
+        assert pool.restarts == 1
+        pool.close()
+
+    def test_restart_crashed_driver(self, pool):
+        pooled = pool.acquire()
+        pooled.driver.alive = False
+        pool.release(pooled, failed=True)
+        assert pool.restarts == 1
+
+    def test_keep_healthy_driver_after_failure(self, pool):
+        pooled = pool.acquire()
+        pool.release(pooled, failed=True)
+        assert pool.restarts == 0
+
+    def test_restart_gives_up(self):
+        started = []
+
+        def factory():
+            if started:
+                raise RuntimeError("chromedriver 启动失败")
+            started.append(1)
+            return FakeDriver()
+
+        pool = BrowserPool(1, factory=factory, restart_attempts=3, restart_backoff=0)
+        pooled = pool.acquire()
+        pooled.driver.alive = False
+        # 连续启动失败后不再重试，抛出异常
+        with pytest.raises(RuntimeError):
+            pool.release(pooled, failed=True)
+        assert pool.alive == 0
+        # 池中已没有可用的浏览器，借出时不会永远阻塞
+        with pytest.raises(RuntimeError):
+            pool.acquire()
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,104 @@
+"""
+测试 append_dataset、load_dataset 与 compact_dataset 函数
+位于 /scraping/dataset.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+import pandas as pd
+from analysis.analysis_utils import DataHandler
+from scraping.dataset import (
+    append_dataset,
+    compact_dataset,
+    dataset_path,
+    import_csv,
+    load_dataset,
+    move_parts,
+    partition_files,
+)
+from scraping.normalize import append_detail
+from scraping.records import NUMERIC_COLUMNS
+
+NOW = pd.Timestamp("2024-03-01 12:00:00")
+
+
+def make_raw(uid="1", bvs=("BV1", "BV2"), click="1.5万"):
+    return (
+        pd.DataFrame(
+            {
+                "uid": uid,
+                "bv": list(bvs),
+                "title": "标题",
+                "duration": "5:12",
+                "pubtime": "3小时前",
+                **{key: "290" for key in NUMERIC_COLUMNS},
+                "tags": [["生活", "日常"]] * len(bvs),
+            }
+        )
+        .assign(click=click)
+        .set_index("bv")
+    )
+
+
+@pytest.fixture
+def output_file(tmp_path):
+    output_file = str(tmp_path / "detail.csv")
+    append_detail(make_raw("1"), output_file, NOW)
+    append_detail(make_raw("2", ["BV3"]), output_file, NOW)
+    return output_file
+
+
+class TestDataset:
+    def test_same_as_csv(self, output_file):
+        detail = load_dataset(dataset_path(output_file))
+        expected = DataHandler.parse(output_file)
+        assert detail.columns.tolist() == expected.columns.tolist()
+        assert detail.dtypes.tolist() == expected.dtypes.tolist()
+        pd.testing.assert_frame_equal(detail, expected)
+
+    def test_partitioned_by_uid(self, output_file):
+        path = dataset_path(output_file)
+        assert len(partition_files(path, ["1"])) == 1
+        assert load_dataset(path, uids=["2"])["bv"].tolist() == ["BV3"]
+        # 没有遗留的临时文件
+        assert not [f for _, _, files in os.walk(path) for f in files if ".tmp" in f]
+
+    def test_later_append_wins(self, output_file):
+        path = dataset_path(output_file)
+        append_detail(make_raw("1", ["BV2"], click="2万"), output_file, NOW)
+        detail = load_dataset(path).set_index("bv")
+        assert len(detail) == 3
+        assert detail.loc["BV2", "click"] == 20000
+        assert detail.loc["BV1", "click"] == 15000
+
+    def test_compact(self, output_file):
+        path = dataset_path(output_file)
+        append_detail(make_raw("1", ["BV2"], click="2万"), output_file, NOW)
+        before = load_dataset(path)
+        assert compact_dataset(path) == 1
+        assert len(partition_files(path, ["1"])) == 1
+        pd.testing.assert_frame_equal(load_dataset(path), before)
+
+        # 合并后追加的文件仍排在合并后的文件之后
+        append_detail(make_raw("1", ["BV2"], click="3万"), output_file, NOW)
+        detail = load_dataset(path).set_index("bv")
+        assert detail.loc["BV2", "click"] == 30000
+
+    def test_import_and_move(self, output_file, tmp_path):
+        target = str(tmp_path / "imported")
+        assert import_csv(output_file, target) == 3
+        pd.testing.assert_frame_equal(
+            load_dataset(target), load_dataset(dataset_path(output_file))
+        )
+
+        shard = str(tmp_path / "shard")
+        append_dataset(make_raw("3", ["BV4"]).assign(pubtime=str(NOW)), shard)
+        assert move_parts(shard, target) == 1
+        assert load_dataset(target)["bv"].tolist() == ["BV1", "BV2", "BV3", "BV4"]
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
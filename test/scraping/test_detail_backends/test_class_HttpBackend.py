@@ -0,0 +1,106 @@
+"""
+测试 HttpBackend 类
+位于 /scraping/detail_backends.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from scraping.detail_backends import (
+    HttpBackend,
+    UselessVideoError,
+    FetchError,
+)
+from scraping.records import DETAIL_COLUMNS
+
+# 桩服务器返回的数据，键为BV号
+VIEWS = {
+    "BV1mk4y1Q73n": {
+        "title": "百大回馈，30万福利大放送！",
+        "duration": 560,
+        "pubdate": 1705054200,  # 2024-01-12 18:10:00 北京时间
+        "stat": {
+            "view": 3270000,
+            "danmaku": 83,
+            "like": 5593,
+            "coin": 491,
+            "favorite": 470,
+            "share": 243,
+            "reply": 290,
+        },
+    },
+    "BV1bangumi": {"redirect_url": "https://www.bilibili.com/bangumi/play/ep1"},
+}
+TAGS = {"BV1mk4y1Q73n": [{"tag_name": "生活"}, {"tag_name": "日常"}]}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        bv = parse_qs(url.query)["bvid"][0]
+        if bv == "BV1broken":
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        if url.path == "/x/web-interface/view":
+            body = (
+                {"code": 0, "data": VIEWS[bv]}
+                if bv in VIEWS
+                else {"code": -404, "message": "啥都木有"}
+            )
+        else:
+            body = {"code": 0, "data": TAGS.get(bv, [])}
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpBackend:
+    @pytest.fixture(scope="class")
+    def base_url(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+
+    def test_fetch(self, base_url):
+        with HttpBackend(base_url=base_url) as backend:
+            data = backend.fetch("304578055", "BV1mk4y1Q73n")
+
+        assert list(data.keys()) == DETAIL_COLUMNS
+        assert data["title"] == "百大回馈，30万福利大放送！"
+        assert data["duration"] == "00:09:20"
+        assert data["pubtime"] == "2024-01-12 18:10:00"
+        assert data["click"] == 3270000
+        assert data["comment"] == 290
+        assert data["tags"] == ["生活", "日常"]
+
+    @pytest.mark.parametrize("bv", ["BV1missing", "BV1bangumi"])
+    def test_fetch_useless(self, base_url, bv):
+        with HttpBackend(base_url=base_url) as backend:
+            with pytest.raises(UselessVideoError):
+                backend.fetch("304578055", bv)
+
+    def test_fetch_error(self, base_url):
+        with HttpBackend(base_url=base_url, retries=0) as backend:
+            with pytest.raises(FetchError):
+                backend.fetch("304578055", "BV1broken")
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
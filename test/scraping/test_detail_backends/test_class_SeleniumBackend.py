@@ -0,0 +1,198 @@
+"""
+测试 SeleniumBackend 类的直接导航方式和接口响应提取
+位于 /scraping/detail_backends.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import json
+import pytest
+from scraping.detail_backends import SeleniumBackend, UselessVideoError
+from scraping.scraping_utils import CHALLENGE_CHECK, PAGE_METRICS
+from scraping.waits import READY_SCRIPT
+
+VIDEO_HTML = """
+<html><body>
+<h1 class="video-title">百大回馈，30万福利大放送！</h1>
+<span class="pubdate-text">2024-01-12 18:10:00</span>
+<span class="view item">327万</span>
+<span class="dm item">83</span>
+<span class="video-like-info">5593</span>
+<span class="video-coin-info">491</span>
+<span class="video-fav-info">470</span>
+<span class="video-share-info-text">243</span>
+<span class="total-reply">290</span>
+<a class="tag-link">生活</a>
+<script>window.__INITIAL_STATE__={"videoData":{"duration":560}};</script>
+</body></html>
+"""
+
+MISSING_HTML = '<html><body><p class="error-text">啊叻？视频不见了？</p></body></html>'
+
+
+class FakeDriver:
+    """按地址返回预设的页面源码，页面立即就绪"""
+
+    session_id = "fake"
+
+    def __init__(self, pages: dict[str, str]):
+        self.pages = pages
+        self.visited = []
+        self.current_url = ""
+        # 每次等待就绪时传入的选择器
+        self.waited = []
+
+    def get(self, url):
+        self.visited.append(url)
+        self.current_url = url
+
+    @property
+    def page_source(self):
+        return self.pages[self.current_url]
+
+    def execute_script(self, script, *args):
+        if script == CHALLENGE_CHECK:
+            return 0
+        if script == PAGE_METRICS:
+            return [1024, 0.5, 10]
+        if script == READY_SCRIPT:
+            self.waited.append(args[0])
+        return True
+
+    @property
+    def window_handles(self):
+        raise AssertionError("直接导航不应切换标签页")
+
+
+class TestDirectNavigation:
+    def test_one_page_load_per_video(self):
+        driver = FakeDriver({"https://www.bilibili.com/video/BV1mk4y1Q73n": VIDEO_HTML})
+        backend = SeleniumBackend(driver)
+        data = backend.fetch("304578055", "BV1mk4y1Q73n")
+        assert data["duration"] == "00:09:20"
+        assert data["click"] == "327万"
+        assert data["tags"] == ["生活"]
+        assert driver.visited == ["https://www.bilibili.com/video/BV1mk4y1Q73n"]
+        assert backend.page_loads == backend.fetched == 1
+
+    def test_missing_video(self):
+        driver = FakeDriver({"https://www.bilibili.com/video/BV1gone": MISSING_HTML})
+        with pytest.raises(UselessVideoError):
+            SeleniumBackend(driver).fetch("1", "BV1gone")
+
+    def test_unknown_navigation(self):
+        with pytest.raises(ValueError):
+            SeleniumBackend(FakeDriver({}), navigation="teleport")
+
+
+VIEW = {
+    "bvid": "BV1mk4y1Q73n",
+    "aid": 42,
+    "title": "百大回馈，30万福利大放送！",
+    "duration": 560,
+    "pubdate": 1705054200,
+    "stat": {
+        "view": 3271234,
+        "danmaku": 83,
+        "like": 5593,
+        "coin": 491,
+        "favorite": 470,
+        "share": 243,
+        "reply": 290,
+    },
+}
+
+
+def response_log(request_id, url):
+    message = {
+        "message": {
+            "method": "Network.responseReceived",
+            "params": {
+                "requestId": request_id,
+                "response": {"url": url, "mimeType": "application/json"},
+            },
+        }
+    }
+    return {"message": json.dumps(message)}
+
+
+class CapturingDriver(FakeDriver):
+    """性能日志中包含视频页请求到的接口响应"""
+
+    def __init__(self, pages, bodies):
+        super().__init__(pages)
+        self.bodies = bodies
+
+    def get_log(self, kind):
+        assert kind == "performance"
+        return [
+            response_log(request_id, url)
+            for request_id, (url, _) in self.bodies.items()
+        ]
+
+    def execute_cdp_cmd(self, cmd, params):
+        assert cmd == "Network.getResponseBody"
+        return {"body": json.dumps(self.bodies[params["requestId"]][1])}
+
+
+class TestNetworkExtraction:
+    URL = "https://www.bilibili.com/video/BV1mk4y1Q73n"
+
+    def test_exact_counts_from_responses(self):
+        driver = CapturingDriver(
+            {self.URL: VIDEO_HTML},
+            {
+                "1": (
+                    "https://api.bilibili.com/x/web-interface/wbi/view?bvid=BV1mk4y1Q73n",
+                    {"code": 0, "data": VIEW},
+                ),
+                "2": (
+                    "https://api.bilibili.com/x/tag/archive/tags?aid=42",
+                    {"code": 0, "data": [{"tag_name": "生活"}, {"tag_name": "日常"}]},
+                ),
+            },
+        )
+        backend = SeleniumBackend(driver)
+        data = backend.fetch("304578055", "BV1mk4y1Q73n")
+        # 页面上显示为 327万，接口响应中为精确值
+        assert data["click"] == 3271234
+        assert data["tags"] == ["生活", "日常"]
+        assert data["pubtime"] == "2024-01-12 18:10:00"
+        assert backend.captured == 1
+        # 只等待文档加载完成和接口响应，不等待页面元素
+        assert driver.waited == [[]]
+
+    def test_useless_code(self):
+        driver = CapturingDriver(
+            {self.URL: VIDEO_HTML},
+            {
+                "1": (
+                    "https://api.bilibili.com/x/web-interface/view?bvid=BV1mk4y1Q73n",
+                    {"code": -404, "message": "啥都木有", "data": None},
+                )
+            },
+        )
+        with pytest.raises(UselessVideoError):
+            SeleniumBackend(driver).fetch("1", "BV1mk4y1Q73n")
+
+    def test_fallback_to_dom(self):
+        # 只捕获到其他视频的响应，回退到页面解析
+        driver = CapturingDriver(
+            {self.URL: VIDEO_HTML},
+            {
+                "1": (
+                    "https://api.bilibili.com/x/web-interface/view?bvid=BVother",
+                    {"code": 0, "data": {**VIEW, "bvid": "BVother"}},
+                )
+            },
+        )
+        backend = SeleniumBackend(driver)
+        backend.network_timeout = 0.1
+        assert backend.fetch("1", "BV1mk4y1Q73n")["click"] == "327万"
+        assert backend.captured == 0
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
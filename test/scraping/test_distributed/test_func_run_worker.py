@@ -0,0 +1,95 @@
+"""
+测试 run_worker、run_local 与 merge_shards 函数
+位于 /scraping/distributed.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import time
+import pytest
+import pandas as pd
+from scraping.distributed import merge_shards, run_local, run_worker, shard_path
+from scraping.frontier import Frontier, DONE, LEASED, PENDING
+
+
+def fake_crawl(frontier, chunk_size, output_file, **options):
+    """代替 multithreading_to_detail：租用视频并把它们写入分片"""
+    while True:
+        leased = frontier.lease(chunk_size)
+        if not leased:
+            return
+        time.sleep(0.01)
+        rows = pd.DataFrame(leased, columns=["uid", "bv"]).assign(click=1)
+        header = not os.path.exists(output_file)
+        rows.set_index("bv").to_csv(output_file, mode="a", header=header)
+        frontier.mark_done(leased)
+
+
+@pytest.fixture
+def frontier_path(tmp_path):
+    path = tmp_path / "frontier.db"
+    with Frontier(path) as frontier:
+        frontier.add(("1", f"BV{i}") for i in range(40))
+    return path
+
+
+class TestLease:
+    def test_expired_lease_is_reclaimed(self, frontier_path):
+        with Frontier(frontier_path, owner="a", lease_ttl=-1) as a:
+            assert len(a.lease(5)) == 5
+        # a 的租约已过期，b 租用时先收回
+        with Frontier(frontier_path, owner="b", lease_ttl=60) as b:
+            assert b.lease(40)[:5] == [("1", f"BV{i}") for i in range(5)]
+            assert b.counts() == {LEASED: 40}
+            assert b.reclaim_expired() == 0
+
+    def test_reset_leased_keeps_other_owners(self, frontier_path):
+        with Frontier(frontier_path, owner="a", lease_ttl=60) as a:
+            a.lease(5)
+        with Frontier(frontier_path, owner="b", lease_ttl=60) as b:
+            b.lease(5)
+            assert b.reset_leased() == 5
+            assert b.counts() == {LEASED: 5, PENDING: 35}
+
+
+class TestRunWorker:
+    def test_waits_for_expired_leases(self, frontier_path, tmp_path):
+        # 另一个进程租用后崩溃，本进程在租约到期后收回并完成
+        with Frontier(frontier_path, owner="crashed", lease_ttl=0.2) as crashed:
+            crashed.lease(5)
+        output_dir = tmp_path / "shards"
+        run_worker(frontier_path, output_dir, "w", poll_interval=0.05, crawl=fake_crawl)
+        assert len(pd.read_csv(shard_path(output_dir, "w"))) == 40
+
+    def test_run_local_and_merge(self, frontier_path, tmp_path):
+        output_dir = tmp_path / "shards"
+        exitcodes = run_local(
+            3, frontier_path, output_dir, poll_interval=0.05, crawl=fake_crawl
+        )
+        assert exitcodes == [0, 0, 0]
+        with Frontier(frontier_path) as frontier:
+            assert frontier.counts() == {DONE: 40}
+
+        output_file = str(tmp_path / "detail.csv")
+        pd.DataFrame({"bv": ["BV0", "BVold"], "uid": "1", "click": 0}).to_csv(
+            output_file, index=False
+        )
+        assert merge_shards(output_dir, output_file) == 41
+        detail = pd.read_csv(output_file)
+        # 分片只追加在末尾，已有的视频跳过，已有的内容不变
+        assert detail["bv"].is_unique and len(detail) == 41
+        assert detail["bv"].tolist()[:2] == ["BV0", "BVold"]
+        assert detail.set_index("bv").loc["BV0", "click"] == 0
+        # 合并后分片被删除，再次合并时旧分片不会再次追加
+        assert os.listdir(output_dir) == []
+        pd.DataFrame({"bv": ["BVnew"], "uid": "1", "click": 2}).to_csv(
+            output_file, mode="a", header=False, index=False
+        )
+        assert merge_shards(output_dir, output_file) == 42
+        assert pd.read_csv(output_file)["bv"].tolist()[-1] == "BVnew"
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
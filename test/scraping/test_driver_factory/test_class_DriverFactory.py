@@ -0,0 +1,110 @@
+"""
+测试 DriverFactory 类
+位于 /scraping/driver_factory.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import threading
+import time
+import pytest
+from scraping.browser_pool import BrowserPool
+from scraping.driver_factory import DriverFactory, WARM_MARKER
+from scraping.scraping_utils import STARTUPS
+
+
+class FakeDriver:
+    """记录启动参数和打开过的页面"""
+
+    count = 0
+    lock = threading.Lock()
+
+    def __init__(self, lean, capture, user_data_dir=None):
+        time.sleep(0.05)
+        with FakeDriver.lock:
+            FakeDriver.count += 1
+            self.session_id = f"fake-{FakeDriver.count}"
+        self.user_data_dir = user_data_dir
+        self.visited = []
+        self.quitted = False
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def execute_script(self, script, *args):
+        return True
+
+    @property
+    def window_handles(self):
+        return ["main"]
+
+    def quit(self):
+        self.quitted = True
+
+
+@pytest.fixture
+def factory(tmp_path):
+    factory = DriverFactory("test", root=tmp_path, start=FakeDriver)
+    yield factory
+    factory.close()
+
+
+class TestDriverFactory:
+    def test_profile_is_warmed_once(self, factory, tmp_path):
+        first = factory()
+        assert first.user_data_dir == str(tmp_path / "test-0")
+        assert len(first.visited) == 1
+        assert os.path.exists(tmp_path / "test-0" / WARM_MARKER)
+        factory.release(first)
+
+        # 复用已预热的目录，不再打开预热页面
+        second = factory()
+        assert second.user_data_dir == first.user_data_dir
+        assert second.visited == []
+        assert STARTUPS.sessions[second.session_id] == "warm"
+
+    def test_profiles_are_exclusive(self, factory):
+        drivers = [factory() for _ in range(3)]
+        assert len({driver.user_data_dir for driver in drivers}) == 3
+        factory.release(drivers[1])
+        assert factory().user_data_dir == drivers[1].user_data_dir
+
+    def test_prewarm(self, factory):
+        factory.prewarm(2)
+        time.sleep(0.3)
+        start = time.monotonic()
+        drivers = [factory(), factory()]
+        # 预先启动的浏览器已就绪，取用时无需等待启动
+        assert time.monotonic() - start < 0.05
+        assert len({driver.user_data_dir for driver in drivers}) == 2
+        # 预先启动的浏览器已用完，再取用时立即启动一个
+        assert factory().user_data_dir.endswith("test-2")
+
+    def test_close_quits_unused(self, factory):
+        factory.prewarm(1)
+        driver = factory.ready.get()
+        factory.ready.put(driver)
+        factory.close()
+        assert driver.quitted
+        assert factory.in_use == set()
+
+    def test_browser_pool(self, factory):
+        pool = BrowserPool(1, factory=factory, max_pages=3, prewarm_ahead=1)
+        first = pool.acquire()
+        pool.release(first)
+        pool.release(pool.acquire())
+        # 距离页面数上限还剩 1 页时已在后台启动替换的浏览器
+        assert factory.available == 1
+        pool.release(pool.acquire())
+        second = pool.acquire()
+        assert pool.restarts == 1 and first.driver.quitted
+        assert second.driver.user_data_dir.endswith("test-1")
+        pool.release(second)
+        pool.close()
+        assert factory.in_use == set()
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
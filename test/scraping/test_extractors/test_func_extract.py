@@ -0,0 +1,90 @@
+"""
+测试页面提取规则
+位于 /scraping/extractors.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+from parsel import Selector
+from scraping.extractors import (
+    extract,
+    VIDEO_PAGE,
+    USER_SEARCH_PAGE,
+    SPACE_PAGE,
+)
+
+VIDEO_HTML = """
+<html><body>
+<h1 class="video-title special-text-indent"> 百大回馈，30万福利大放送！ </h1>
+<span class="pubdate-text">2024-01-12 18:10:00</span>
+<span class="view item">327万</span>
+<span class="dm item">83</span>
+<span class="video-like-info video-toolbar-item-text">5593</span>
+<span class="video-coin-info video-toolbar-item-text">491</span>
+<span class="video-fav-info video-toolbar-item-text">470</span>
+<span class="video-share-info-text">243</span>
+<span class="total-reply">290</span>
+<a class="tag-link">生活</a><a class="tag-link"> </a><a class="tag-link">日常</a>
+<script>window.__INITIAL_STATE__={"videoData":{"bvid":"BV1xx","duration":3725,"pages":[{"duration":3725}]}};</script>
+</body></html>
+"""
+
+USER_HTML = """
+<html><body>
+<a class="user-name cs_pointer v_align_middle" href="//space.bilibili.com/304578055">MR.迷瞪</a>
+<p class="b_text">粉丝：1756万 · 视频：284</p>
+</body></html>
+"""
+
+SPACE_HTML = """
+<html><body><ul>
+<li class="small-item list-item clearfix fakeDanmu-item" data-aid="BV1mk4y1Q73n"></li>
+<li class="small-item list-item clearfix fakeDanmu-item" data-aid="BV1mN4y1q71U"></li>
+</ul><span class="be-pager-total">共 12 页，</span></body></html>
+"""
+
+
+class TestExtract:
+    def test_video_page(self):
+        data = extract(Selector(text=VIDEO_HTML), VIDEO_PAGE.fields)
+        assert data["title"] == "百大回馈，30万福利大放送！"
+        assert data["pubtime"] == "2024-01-12 18:10:00"
+        # 计数保留页面上的原始文本，由 normalize 转换
+        assert data["click"] == "327万"
+        assert data["comment"] == "290"
+        assert data["tags"] == ["生活", "日常"]
+        assert data["duration"] == "01:02:05"
+        assert data["rating"] is None
+        assert data["error"] is None
+
+    def test_missing_fields(self):
+        data = extract(Selector(text="<html></html>"), VIDEO_PAGE.fields)
+        assert data["title"] is None
+        assert data["tags"] == []
+        assert data["duration"] is None
+
+    def test_initial_state_duration(self):
+        # 只读取 videoData 自身的时长，不受其他对象中 duration 键的影响
+        html = (
+            '<script>window.__INITIAL_STATE__={"upData":{"duration":1},'
+            '"videoData":{"duration":560}};(function(){var s;})();</script>'
+        )
+        data = extract(Selector(text=html), VIDEO_PAGE.fields)
+        assert data["duration"] == "00:09:20"
+
+    def test_user_search_page(self):
+        data = extract(Selector(text=USER_HTML), USER_SEARCH_PAGE.fields)
+        assert data["space"] == "https://space.bilibili.com/304578055"
+        assert data["fans"] == 17560000
+
+    def test_space_page(self):
+        data = extract(Selector(text=SPACE_HTML), SPACE_PAGE.fields)
+        assert data["bvs"] == ["BV1mk4y1Q73n", "BV1mN4y1q71U"]
+        assert data["pages"] == 12
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,78 @@
+"""
+测试 Frontier 类
+位于 /scraping/frontier.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+import pandas as pd
+from scraping.frontier import Frontier, PENDING, LEASED, DONE, USELESS, FAILED
+
+
+class TestFrontier:
+    @pytest.fixture
+    def frontier(self, tmp_path):
+        frontier = Frontier(tmp_path / "frontier.db", max_attempts=2)
+        yield frontier
+        frontier.close()
+
+    def test_add_ignores_duplicates(self, frontier):
+        assert frontier.add([("1", "BV1a"), ("1", "BV1b")]) == 2
+        assert frontier.add([("1", "BV1a"), ("2", "BV1c")]) == 1
+        assert frontier.counts() == {PENDING: 3}
+
+    def test_lease_in_insertion_order(self, frontier):
+        frontier.add([("1", "BV1a")])
+        frontier.add([("1", "BV1b")])
+        assert frontier.lease(1) == [("1", "BV1a")]
+        assert frontier.lease(5) == [("1", "BV1b")]
+        assert frontier.lease(5) == []
+        assert frontier.counts() == {LEASED: 2}
+
+    def test_mark_failed_until_max_attempts(self, frontier):
+        frontier.add([("1", "BV1a")])
+        frontier.lease(1)
+        frontier.mark_failed("1", "BV1a")
+        assert frontier.pending() == 1
+        frontier.lease(1)
+        frontier.mark_failed("1", "BV1a")
+        assert frontier.counts() == {FAILED: 1}
+
+    def test_reset_leased(self, frontier):
+        frontier.add([("1", "BV1a"), ("1", "BV1b")])
+        frontier.lease(2)
+        frontier.mark_done([("1", "BV1a")])
+        assert frontier.reset_leased() == 1
+        assert frontier.counts() == {DONE: 1, PENDING: 1}
+
+    def test_bv_index(self, frontier):
+        # 只按BV号的更新使用索引，不扫描全表
+        plan = frontier.conn.execute(
+            "EXPLAIN QUERY PLAN UPDATE frontier SET status = 'useless' WHERE bv = 'BV1a';"
+        ).fetchall()
+        assert any("idx_frontier_bv" in row[-1] for row in plan)
+
+    def test_import_csv(self, frontier, tmp_path):
+        space_bv = pd.DataFrame(
+            {"1": ["BV1a", "BV1b", "BV1c"], "2": ["BV2a", None, None]}
+        )
+        space_bv.to_csv(tmp_path / "space_bv.csv")
+        pd.DataFrame({"bv": ["BV1a"], "uid": ["1"]}).to_csv(
+            tmp_path / "detail.csv", index=False
+        )
+        pd.DataFrame({"bv": ["BV2a"]}).to_csv(tmp_path / "useless.csv")
+
+        added = frontier.import_csv(
+            tmp_path / "space_bv.csv", tmp_path / "detail.csv", tmp_path / "useless.csv"
+        )
+
+        assert added == 4
+        assert frontier.counts() == {DONE: 1, USELESS: 1, PENDING: 2}
+        assert sorted(frontier.lease(10)) == [("1", "BV1b"), ("1", "BV1c")]
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
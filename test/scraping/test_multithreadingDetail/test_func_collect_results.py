@@ -0,0 +1,86 @@
+"""
+测试写入线程按数量和时间分批写入
+位于 /scraping/multithreadingDetail.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import threading
+import time
+import pytest
+import pandas as pd
+from queue import Queue
+from scraping.multithreadingDetail import collect_results_and_write_to_file
+from scraping.frontier import Frontier, DONE
+
+
+def record(uid, bv):
+    return {
+        "uid": uid,
+        "bv": bv,
+        "title": "标题",
+        "duration": "00:01:00",
+        "pubtime": "2024-01-12 18:10:00",
+        "click": 1,
+        "bullet": 0,
+        "like": 0,
+        "coin": 0,
+        "favorite": 0,
+        "share": 0,
+        "comment": 0,
+        "tags": [],
+    }
+
+
+def start_writer(queue, path, frontier=None, batch_size=3, flush_interval=60.0):
+    thread = threading.Thread(
+        target=collect_results_and_write_to_file,
+        args=(queue, path, frontier, batch_size, flush_interval),
+    )
+    thread.start()
+    return thread
+
+
+class TestCollectResults:
+    def test_flush_by_size(self, tmp_path):
+        path = tmp_path / "detail.csv"
+        queue = Queue()
+        thread = start_writer(queue, path)
+        for i in range(4):
+            queue.put(record("1", f"BV{i}"))
+        queue.join()
+        # 攒够 3 条时写入一次，第 4 条仍在缓冲中
+        assert list(pd.read_csv(path, index_col=0).index) == ["BV0", "BV1", "BV2"]
+        queue.put(None)
+        thread.join()
+        assert len(pd.read_csv(path, index_col=0)) == 4
+
+    def test_flush_by_time(self, tmp_path):
+        path = tmp_path / "detail.csv"
+        queue = Queue()
+        thread = start_writer(queue, path, batch_size=100, flush_interval=0.1)
+        queue.put(record("1", "BV0"))
+        deadline = time.monotonic() + 5
+        while not path.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert list(pd.read_csv(path, index_col=0).index) == ["BV0"]
+        queue.put(None)
+        thread.join()
+
+    def test_mark_done_after_write(self, tmp_path):
+        frontier = Frontier(tmp_path / "frontier.db")
+        frontier.add([("1", "BV0"), ("1", "BV1")])
+        frontier.lease(2)
+        queue = Queue()
+        thread = start_writer(queue, tmp_path / "detail.csv", frontier, batch_size=1)
+        queue.put(record("1", "BV0"))
+        queue.put(None)
+        thread.join()
+        assert frontier.counts()[DONE] == 1
+        frontier.close()
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
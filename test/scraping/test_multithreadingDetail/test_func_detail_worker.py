@@ -0,0 +1,46 @@
+"""
+测试工作线程把获取失败报告给限速器
+位于 /scraping/multithreadingDetail.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+from queue import Queue
+import scraping.multithreadingDetail as multithreadingDetail
+from scraping.detail_backends import FetchError
+from scraping.frontier import Frontier, FAILED
+from scraping.rate_control import RateController
+
+
+class RateLimitedBackend:
+    """每次请求都被限流"""
+
+    def fetch(self, uid, bv):
+        raise FetchError(f"获取视频 {bv} 失败：-412")
+
+    def close(self):
+        pass
+
+
+def test_fetch_errors_lower_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(multithreadingDetail, "HttpBackend", RateLimitedBackend)
+    frontier = Frontier(tmp_path / "frontier.db")
+    frontier.add([("1", f"BV{i}") for i in range(10)])
+    controller = RateController(4, initial_workers=4, rate=1000, window=5)
+
+    output_queue = Queue()
+    multithreadingDetail.detail_worker(frontier, output_queue, controller=controller)
+
+    assert output_queue.empty()
+    assert frontier.counts()[FAILED] == 10
+    # 被限流的请求计为错误，并发数下降而不是上升
+    assert controller.decreases >= 2
+    assert controller.limit == 1
+    frontier.close()
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
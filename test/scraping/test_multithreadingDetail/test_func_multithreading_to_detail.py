@@ -0,0 +1,28 @@
+"""
+测试 multithreading_to_detail 函数的参数验证
+位于 /scraping/multithreadingDetail.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+from scraping.multithreadingDetail import multithreading_to_detail
+from scraping.frontier import Frontier, PENDING
+
+
+def test_unknown_backend(tmp_path):
+    frontier = Frontier(tmp_path / "frontier.db")
+    frontier.add([("1", "BV1")])
+    # 拼错的后端名称不会被当作 http 后端
+    with pytest.raises(ValueError):
+        multithreading_to_detail(
+            frontier, 10, backend="selenuim", output_file=tmp_path / "detail.csv"
+        )
+    assert frontier.counts() == {PENDING: 1}
+    frontier.close()
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
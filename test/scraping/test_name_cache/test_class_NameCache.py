@@ -0,0 +1,58 @@
+"""
+测试 NameCache 类
+位于 /scraping/name_cache.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+import pandas as pd
+from scraping.name_cache import NameCache
+
+DAY = 24 * 3600
+
+
+class TestNameCache:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = NameCache(tmp_path / "frontier.db", ttl_days=7)
+        yield cache
+        cache.close()
+
+    def test_put_and_get(self, cache):
+        cache.put("MR.迷瞪", "https://space.bilibili.com/304578055", 17560000)
+        hits = cache.get_many(["MR.迷瞪", "不存在"])
+        assert list(hits) == ["MR.迷瞪"]
+        assert hits["MR.迷瞪"]["uid"] == "304578055"
+        assert hits["MR.迷瞪"]["fans"] == 17560000
+
+    def test_misses_with_ttl(self, cache):
+        now = 100 * DAY
+        cache.put("新", "https://space.bilibili.com/1", 1, resolved_at=now - DAY)
+        cache.put("旧", "https://space.bilibili.com/2", 2, resolved_at=now - 8 * DAY)
+        assert cache.misses(["新", "旧", "无"], now) == ["旧", "无"]
+
+    def test_negative_ttl(self, cache):
+        # 没有找到主页地址的记录可能是页面加载超时，几小时后重新解析
+        now = 100 * DAY
+        cache.put("新", "", 0, resolved_at=now - 3600)
+        cache.put("旧", "", 0, resolved_at=now - DAY)
+        assert cache.misses(["新", "旧"], now) == ["旧"]
+
+    def test_seed_from_info(self, cache, tmp_path):
+        info = pd.DataFrame(
+            {
+                "name": ["MR.迷瞪", "蒜蒜蒜了八"],
+                "space": ["https://space.bilibili.com/304578055", None],
+                "fans": [17560000, None],
+            }
+        )
+        info.to_csv(tmp_path / "info.csv")
+        assert cache.seed_from_info(tmp_path / "info.csv") == 2
+        assert cache.misses(["MR.迷瞪", "蒜蒜蒜了八"]) == []
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
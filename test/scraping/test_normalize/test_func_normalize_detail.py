@@ -0,0 +1,141 @@
+"""
+测试 normalize_detail 与 renormalize 函数
+位于 /scraping/normalize.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import time
+import pytest
+import pandas as pd
+from scraping.normalize import (
+    append_detail,
+    normalize_detail,
+    parse_counts,
+    parse_durations,
+    parse_pubtimes,
+    raw_path,
+    renormalize,
+)
+from scraping.records import NUMERIC_COLUMNS
+from scraping.tag_index import TagIndex, tags_path
+
+NOW = pd.Timestamp("2024-03-01 12:00:00")
+
+
+def make_raw(n=1, click="1.5万", duration="5:12", pubtime="3小时前"):
+    raw = pd.DataFrame(
+        {
+            "uid": "304578055",
+            "bv": [f"BV{i}" for i in range(n)],
+            "title": "标题",
+            "duration": duration,
+            "pubtime": pubtime,
+            **{key: "290" for key in NUMERIC_COLUMNS},
+            "tags": "['生活']",
+        }
+    )
+    raw["click"] = click
+    return raw.set_index("bv")
+
+
+class TestParse:
+    def test_counts(self):
+        values = pd.Series(["1.5万", "327万", "5593", "2.3亿", "1,234", "点赞", None])
+        assert parse_counts(values).tolist() == [
+            15000,
+            3270000,
+            5593,
+            230000000,
+            1234,
+            0,
+            pd.NA,
+        ]
+
+    def test_integer_counts_unchanged(self):
+        values = pd.Series([3271234, 0])
+        assert parse_counts(values).tolist() == [3271234, 0]
+
+    def test_durations(self):
+        values = pd.Series(["5:12", "01:02:03", "560", "75:10", "05:03", "abc", None])
+        assert parse_durations(values).tolist() == [
+            "00:05:12",
+            "01:02:03",
+            "00:09:20",
+            "01:15:10",
+            "00:05:03",
+            "abc",
+            pd.NA,
+        ]
+
+    def test_pubtimes(self):
+        values = pd.Series(
+            ["刚刚", "3小时前", "昨天 18:10", "前天", "01-12", "2023-05-06", None]
+        )
+        assert parse_pubtimes(values, NOW).tolist() == [
+            "2024-03-01 12:00:00",
+            "2024-03-01 09:00:00",
+            "2024-02-29 18:10:00",
+            "2024-02-28 00:00:00",
+            "2024-01-12 00:00:00",
+            "2023-05-06 00:00:00",
+            pd.NA,
+        ]
+
+
+class TestNormalizeDetail:
+    def test_normalize(self):
+        df = normalize_detail(make_raw(), NOW)
+        assert df.loc["BV0", "click"] == 15000
+        assert df.loc["BV0", "duration"] == "00:05:12"
+        assert df.loc["BV0", "pubtime"] == "2024-03-01 09:00:00"
+
+    def test_fetched_at(self):
+        # 相对发布时间以每行的爬取时间为基准
+        raw = make_raw(2)
+        raw["fetched_at"] = ["2024-03-01 12:00:00", "2024-03-02 12:00:00"]
+        df = normalize_detail(raw)
+        assert "fetched_at" not in df
+        assert df["pubtime"].tolist() == ["2024-03-01 09:00:00", "2024-03-02 09:00:00"]
+
+    def test_speed(self):
+        raw = make_raw(100_000)
+        start = time.perf_counter()
+        normalize_detail(raw, NOW)
+        assert time.perf_counter() - start < 1
+
+
+class TestAppendDetail:
+    def test_tag_table(self, tmp_path):
+        output_file = str(tmp_path / "detail.csv")
+        append_detail(make_raw(2), output_file, NOW)
+        # 重新爬取的视频以最后写入的标签为准，新标签编号接在字典末尾
+        recrawled = make_raw(1)
+        recrawled["tags"] = "['vlog', '生活']"
+        append_detail(recrawled, output_file, NOW)
+        tags = TagIndex.load(tags_path(output_file))
+        assert tags.dictionary.tolist() == ["生活", "vlog"]
+        assert tags.to_lists(pd.Series(["BV0", "BV1"])) == [["vlog", "生活"], ["生活"]]
+
+
+class TestRenormalize:
+    def test_renormalize(self, tmp_path):
+        output_file = str(tmp_path / "detail.csv")
+        append_detail(make_raw(click="1.5万"), output_file, NOW)
+        assert os.path.exists(raw_path(output_file))
+        assert pd.read_csv(output_file)["click"].tolist() == [15000]
+
+        # 修改原始文本（相当于修改规则）后重新规范化，不需要重新爬取
+        raw = pd.read_csv(raw_path(output_file))
+        raw["click"] = "2.5万"
+        raw.to_csv(raw_path(output_file), index=False)
+        assert renormalize(output_file) == 1
+        detail = pd.read_csv(output_file)
+        assert detail["click"].tolist() == [25000]
+        assert detail["pubtime"].tolist() == ["2024-03-01 09:00:00"]
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
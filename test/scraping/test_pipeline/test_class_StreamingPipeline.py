@@ -0,0 +1,161 @@
+"""
+测试 StreamingPipeline 类
+位于 /scraping/pipeline.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import threading
+import time
+import pytest
+from scraping import pipeline as pipeline_module
+from scraping.pipeline import StreamingPipeline
+from scraping.frontier import Frontier, DONE, PENDING
+from scraping.name_cache import NameCache
+from scraping.rate_control import RateController
+
+
+class FakeDriver:
+    def quit(self):
+        pass
+
+
+def fake_resolve_name(driver, name):
+    return f"https://space.bilibili.com/{name[-1]}", 100
+
+
+def fake_list_page(driver, space, pn):
+    # 每个用户 3 页，每页 2 个视频，读取一页需要 0.05 秒
+    time.sleep(0.05)
+    uid = space.rsplit("/", 1)[-1]
+    return [f"BV{uid}{pn}a", f"BV{uid}{pn}b"], 3
+
+
+class TestStreamingPipeline:
+    @pytest.fixture
+    def pipeline(self, tmp_path, monkeypatch):
+        crawled = []
+
+        def fake_crawl(frontier, chunk_size, upstream, **kwargs):
+            while True:
+                leased = frontier.lease(chunk_size)
+                if not leased:
+                    if not upstream.is_set():
+                        upstream.wait(0.01)
+                        continue
+                    return
+                crawled.append((time.monotonic(), upstream.is_set()))
+                frontier.mark_done(leased)
+
+        monkeypatch.setattr(pipeline_module, "resolve_name", fake_resolve_name)
+        monkeypatch.setattr(pipeline_module, "list_page", fake_list_page)
+        monkeypatch.setattr(pipeline_module, "multithreading_to_detail", fake_crawl)
+
+        frontier = Frontier(tmp_path / "frontier.db")
+        cache = NameCache(tmp_path / "frontier.db")
+        pipeline = StreamingPipeline(
+            frontier,
+            cache,
+            space_workers=2,
+            controller=RateController(8, initial_workers=8, rate=1000),
+        )
+        pipeline.factory = lambda stage: FakeDriver
+        pipeline.crawled = crawled
+        yield pipeline
+        frontier.close()
+        cache.close()
+
+    def test_run(self, pipeline):
+        info, space_bv = pipeline.run(["up1", "up2", "up3"])
+        assert sorted(info["space"]) == [
+            "https://space.bilibili.com/1",
+            "https://space.bilibili.com/2",
+            "https://space.bilibili.com/3",
+        ]
+        assert list(space_bv["1"]) == [
+            "BV11a",
+            "BV11b",
+            "BV12a",
+            "BV12b",
+            "BV13a",
+            "BV13b",
+        ]
+        assert pipeline.frontier.counts() == {DONE: 18}
+
+    def test_stages_overlap(self, pipeline):
+        pipeline.run(["up1", "up2", "up3"])
+        # 列表阶段结束之前，视频信息阶段已经开始爬取
+        assert any(not listed for _, listed in pipeline.crawled)
+        assert pipeline.finished["detail"] - pipeline.finished["space"] < 0.5
+
+    def test_crawl_stopped(self, pipeline, monkeypatch):
+        def broken_crawl(**kwargs):
+            raise RuntimeError("浏览器池启动失败")
+
+        monkeypatch.setattr(pipeline_module, "multithreading_to_detail", broken_crawl)
+        pipeline.max_pending = 1
+        runner = threading.Thread(
+            target=pipeline.run, args=(["up1", "up2"],), daemon=True
+        )
+        runner.start()
+        # 视频信息阶段退出后，列表阶段不再等待爬取队列，run 正常返回
+        runner.join(10)
+        assert not runner.is_alive()
+        assert pipeline.frontier.counts() == {PENDING: 12}
+
+    def test_cache_expires_during_run(self, pipeline, tmp_path):
+        # 启动时全部命中缓存，运行中缓存过期，仍然可以打开用户搜索页解析
+        pipeline.cache.misses = lambda names: []
+        info, _ = pipeline.run(["up1"])
+        assert info["space"].tolist() == ["https://space.bilibili.com/1"]
+        assert pipeline.name_pool is not None
+
+    def test_resume(self, pipeline, tmp_path, monkeypatch):
+        def broken_list_page(driver, space, pn):
+            if space.endswith("2"):
+                raise RuntimeError("页面加载失败")
+            return fake_list_page(driver, space, pn)
+
+        info_path = tmp_path / "info.csv"
+        space_bv_path = tmp_path / "space_bv.csv"
+        monkeypatch.setattr(pipeline_module, "list_page", broken_list_page)
+        first = StreamingPipeline(
+            pipeline.frontier,
+            pipeline.cache,
+            controller=pipeline.controller,
+            info_path=info_path,
+            space_bv_path=space_bv_path,
+        )
+        first.factory = pipeline.factory
+        first.run(["up1", "up2"])
+        # 中途失败的用户不会记为已列完
+        assert first.completed == {"1"}
+        assert space_bv_path.exists() and info_path.exists()
+
+        listed = []
+
+        def recording_list_page(driver, space, pn):
+            listed.append(space)
+            return fake_list_page(driver, space, pn)
+
+        monkeypatch.setattr(pipeline_module, "list_page", recording_list_page)
+        second = StreamingPipeline(
+            pipeline.frontier,
+            pipeline.cache,
+            controller=pipeline.controller,
+            info_path=info_path,
+            space_bv_path=space_bv_path,
+        )
+        second.factory = pipeline.factory
+        info, space_bv = second.run(["up1", "up2"])
+        # 再次运行时只列出上次没有完成的用户
+        assert set(listed) == {"https://space.bilibili.com/2"}
+        assert sorted(info["name"]) == ["up1", "up2"]
+        assert sorted(space_bv.columns) == ["1", "2"]
+        assert len(space_bv["1"].dropna()) == len(space_bv["2"].dropna()) == 6
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
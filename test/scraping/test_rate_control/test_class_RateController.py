@@ -0,0 +1,81 @@
+"""
+测试 TokenBucket 与 RateController 类
+位于 /scraping/rate_control.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import threading
+import time
+import pytest
+from scraping.rate_control import RateController, TokenBucket
+
+
+class TestTokenBucket:
+    def test_rate(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        # 第一个令牌立即可用，其余 10 个按每秒 50 个补充
+        assert 0.15 <= time.monotonic() - start < 0.5
+
+
+class TestRateController:
+    def make(self, **kwargs):
+        options = dict(initial_workers=2, rate=100, max_rate=200, window=4)
+        return RateController(max_workers=8, **{**options, **kwargs})
+
+    def test_additive_increase(self):
+        controller = self.make()
+        for _ in range(8):
+            controller.call(lambda: None)
+        assert controller.limit == 4
+        assert controller.rate == pytest.approx(101)
+
+    def test_multiplicative_decrease_on_errors(self):
+        controller = self.make(initial_workers=8)
+        for _ in range(4):
+            with pytest.raises(ValueError):
+                controller.call(self.fail)
+        assert controller.limit == 4
+        assert controller.rate == pytest.approx(50)
+        assert controller.decreases == 1
+
+    def test_decrease_on_latency(self):
+        controller = self.make(initial_workers=8, target_latency=0.01)
+        for _ in range(4):
+            controller.call(time.sleep, 0.02)
+        assert controller.limit == 4
+
+    def test_limit_concurrency(self):
+        controller = self.make(window=100)
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def task():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+        threads = [
+            threading.Thread(target=controller.call, args=(task,)) for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert peak[0] == 2
+
+    @staticmethod
+    def fail():
+        raise ValueError("失败")
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,91 @@
+"""
+测试 VideoRecord 与 RecordBuffer 类
+位于 /scraping/records.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+from scraping.records import DETAIL_COLUMNS, RecordBuffer, VideoRecord
+
+
+def make_record(bv, tags, click=1):
+    return VideoRecord(
+        uid="304578055",
+        bv=bv,
+        title="标题",
+        duration="00:09:20",
+        pubtime="2024-01-12 18:10:00",
+        click=click,
+        bullet=2,
+        like=3,
+        coin=4,
+        favorite=5,
+        share=6,
+        comment=7,
+        tags=tags,
+    )
+
+
+class TestVideoRecord:
+    def test_slots(self):
+        record = make_record("BV1", ["生活"])
+        assert not hasattr(record, "__dict__")
+        with pytest.raises(AttributeError):
+            record.extra = 1
+
+    def test_dict_access(self):
+        record = make_record("BV1", ["生活"])
+        assert list(record.keys()) == DETAIL_COLUMNS
+        assert record["click"] == 1
+        assert VideoRecord.from_dict(record.as_dict()) == record
+
+
+class TestRecordBuffer:
+    @pytest.fixture
+    def buffer(self):
+        buffer = RecordBuffer()
+        buffer.append(make_record("BV1", ["生活", "日常"], click=3270000))
+        buffer.append(make_record("BV2", []).as_dict())
+        return buffer
+
+    def test_to_frame(self, buffer):
+        df = buffer.to_frame()
+        assert list(df.index) == ["BV1", "BV2"]
+        assert list(df.columns) == DETAIL_COLUMNS[:1] + DETAIL_COLUMNS[2:]
+        assert df["click"].dtype == "int64"
+        assert df.loc["BV1", "click"] == 3270000
+        assert df["tags"].tolist() == [["生活", "日常"], []]
+
+    def test_raw_counts(self, buffer):
+        # 从页面元素中解析的计数保留原始文本，该列改为 object 列
+        buffer.append(make_record("BV3", [], click="1.5万"))
+        df = buffer.to_frame()
+        assert df["click"].tolist() == [3270000, 1, "1.5万"]
+        assert df["like"].dtype == "int64"
+        assert buffer.to_arrow().column("click").to_pylist() == [
+            "3270000",
+            "1",
+            "1.5万",
+        ]
+
+    def test_interned_strings(self, buffer):
+        uids = buffer.strings["uid"]
+        assert uids[0] is uids[1]
+
+    def test_to_arrow(self, buffer):
+        table = buffer.to_arrow()
+        assert table.column_names == DETAIL_COLUMNS
+        assert table.column("tags").to_pylist() == [["生活", "日常"], []]
+
+    def test_clear(self, buffer):
+        assert list(buffer.pairs()) == [("304578055", "BV1"), ("304578055", "BV2")]
+        buffer.clear()
+        assert len(buffer) == 0
+        assert buffer.to_frame().empty
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
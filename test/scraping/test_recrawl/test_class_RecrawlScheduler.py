@@ -0,0 +1,108 @@
+"""
+测试 RecrawlScheduler 类
+位于 /scraping/recrawl.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+from analysis.analysis_utils import DataHandler
+from scraping.dataset import dataset_path, load_dataset
+from scraping.detail_backends import DetailBackend
+from scraping.recrawl import RecrawlScheduler, to_timestamp
+
+NOW = to_timestamp("2024-03-01 12:00:00")
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def record(uid: str, bv: str, pubtime: str, click: int) -> dict:
+    data = {"uid": uid, "bv": bv, "pubtime": pubtime, "click": click}
+    data.update(
+        dict.fromkeys(["bullet", "like", "coin", "favorite", "share", "comment"], 0)
+    )
+    return data
+
+
+class TestRecrawlScheduler:
+    @pytest.fixture
+    def scheduler(self, tmp_path):
+        scheduler = RecrawlScheduler(
+            tmp_path / "frontier.db", budget_per_hour=3, min_interval_hours=6
+        )
+        yield scheduler
+        scheduler.close()
+
+    def test_recent_pubtime_first(self, scheduler):
+        scheduler.record_many(
+            [
+                record("1", "old", "2020-01-01 00:00:00", 100),
+                record("1", "new", "2024-02-28 00:00:00", 100),
+            ],
+            fetched_at=NOW - DAY,
+        )
+        assert list(scheduler.priorities(NOW)["bv"]) == ["new", "old"]
+
+    def test_fast_uid_first(self, scheduler):
+        pubtime = "2024-02-01 00:00:00"
+        scheduler.record_many(
+            [record("slow", "a", pubtime, 1000), record("fast", "b", pubtime, 1000)],
+            fetched_at=NOW - 2 * DAY,
+        )
+        scheduler.record_many(
+            [record("slow", "a", pubtime, 1010), record("fast", "b", pubtime, 3000)],
+            fetched_at=NOW - DAY,
+        )
+        assert list(scheduler.priorities(NOW)["bv"]) == ["b", "a"]
+
+    def test_min_interval(self, scheduler):
+        scheduler.record_many(
+            [record("1", "a", "2024-02-28 00:00:00", 100)], fetched_at=NOW - HOUR
+        )
+        assert scheduler.priorities(NOW).empty
+
+    def test_budget(self, scheduler):
+        scheduler.record_many(
+            [record("1", str(i), "2024-02-28 00:00:00", 100) for i in range(5)],
+            fetched_at=NOW - DAY,
+        )
+        assert len(scheduler.next_batch(10, NOW)) == 3
+
+        scheduler.record_many(
+            [record("1", "0", "2024-02-28 00:00:00", 120)],
+            source="recrawl",
+            fetched_at=NOW - HOUR / 2,
+        )
+        batch = scheduler.next_batch(10, NOW)
+        assert len(batch) == 2
+        assert ("1", "0") not in batch
+
+    def test_run_writes_detail(self, scheduler, tmp_path):
+        class FakeBackend(DetailBackend):
+            def fetch(self, uid, bv):
+                if bv == "broken":
+                    raise RuntimeError("浏览器崩溃")
+                data = record(uid, bv, "2024-02-28 00:00:00", "1.2万")
+                return {**data, "title": "标题", "duration": "5:12", "tags": []}
+
+        output_file = str(tmp_path / "detail.csv")
+        scheduler.record_many(
+            [
+                record("1", "broken", "2024-02-28 00:00:00", 100),
+                record("1", "a", "2024-02-28 00:00:00", 100),
+            ],
+            fetched_at=to_timestamp("2024-02-01 00:00:00"),
+        )
+        scheduler.run(FakeBackend(), output_file=output_file)
+
+        # 出错的视频不影响其他视频，刷新的计数写回 detail.csv 和数据集
+        assert scheduler.used_budget() == 1
+        detail = DataHandler.parse(output_file, cache=False)
+        assert detail.set_index("bv").loc["a", "click"] == 12000
+        assert load_dataset(dataset_path(output_file))["click"].tolist() == [12000]
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
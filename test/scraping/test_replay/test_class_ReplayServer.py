@@ -0,0 +1,129 @@
+"""
+测试 Archive 与 ReplayServer 类
+位于 /scraping/replay.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import time
+import pytest
+import requests
+from scraping.detail_backends import HttpBackend
+from scraping.replay import (
+    REPLAY,
+    Archive,
+    ReplayServer,
+    archive_key,
+    replay_url,
+    start_recording,
+    stop_recording,
+    strip_external,
+    use_replay,
+)
+
+VIEW_URL = "https://api.bilibili.com/x/web-interface/view?bvid=BV1mk4y1Q73n"
+TAG_URL = "https://api.bilibili.com/x/web-interface/view/detail/tag?bvid=BV1mk4y1Q73n"
+VIEW = {
+    "code": 0,
+    "data": {
+        "title": "百大回馈，30万福利大放送！",
+        "duration": 560,
+        "pubdate": 1705054200,
+        "stat": {
+            "view": 3270000,
+            "danmaku": 83,
+            "like": 5593,
+            "coin": 491,
+            "favorite": 470,
+            "share": 243,
+            "reply": 290,
+        },
+    },
+}
+TAGS = {"code": 0, "data": [{"tag_name": "生活"}]}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = Archive(tmp_path / "replay")
+    archive.save(
+        "https://www.bilibili.com/video/BV1",
+        "<html>视频</html>",
+        "text/html; charset=utf-8",
+    )
+    return archive
+
+
+class TestArchive:
+    def test_key(self):
+        assert archive_key(VIEW_URL) == (
+            "api.bilibili.com/x/web-interface/view?bvid=BV1mk4y1Q73n"
+        )
+
+    def test_reload(self, archive):
+        # 重新打开存档时从 index.jsonl 读取
+        reopened = Archive(archive.path)
+        status, content_type, body = reopened.get("www.bilibili.com/video/BV1")
+        assert (status, content_type) == (200, "text/html; charset=utf-8")
+        assert body.decode("utf-8") == "<html>视频</html>"
+        assert reopened.get("www.bilibili.com/video/BV2") is None
+
+    def test_strip_external(self):
+        html = (
+            '<script src="//s1.hdslb.com/a.js"></script>'
+            "<script>window.__INITIAL_STATE__={}</script>"
+            '<link rel="stylesheet" href="//s1.hdslb.com/a.css">'
+        )
+        assert strip_external(html) == "<script>window.__INITIAL_STATE__={}</script>"
+
+
+class TestReplayServer:
+    def test_serve(self, archive):
+        with ReplayServer(archive) as server:
+            response = requests.get(f"{server.url}/www.bilibili.com/video/BV1")
+            assert response.status_code == 200
+            assert response.text == "<html>视频</html>"
+            assert requests.get(f"{server.url}/www.bilibili.com/x").status_code == 404
+            assert server.snapshot() == {
+                "requests": 2,
+                "pages": 1,
+                "errors": 0,
+                "misses": 1,
+            }
+
+    def test_latency_and_errors(self, archive):
+        with ReplayServer(archive, latency=0.05, error_rate=1.0) as server:
+            start = time.monotonic()
+            response = requests.get(f"{server.url}/www.bilibili.com/video/BV1")
+            assert time.monotonic() - start >= 0.05
+            assert response.status_code == 503
+            assert server.snapshot()["errors"] == 1
+
+    def test_record_and_replay_http_backend(self, tmp_path):
+        # 录制：接口响应经由 HttpBackend 保存到存档
+        archive = start_recording(tmp_path / "replay")
+        try:
+            REPLAY.record_response(VIEW_URL, VIEW)
+            REPLAY.record_response(TAG_URL, TAGS)
+        finally:
+            stop_recording()
+        assert len(archive) == 2
+
+        # 回放：HttpBackend 请求回放服务器，不访问线上接口
+        with ReplayServer(Archive(archive.path)) as server:
+            use_replay(server)
+            try:
+                assert replay_url(VIEW_URL).startswith(server.url)
+                with HttpBackend(retries=0) as backend:
+                    record = backend.fetch("1", "BV1mk4y1Q73n")
+            finally:
+                use_replay(None)
+        assert record["click"] == 3270000
+        assert record["tags"] == ["生活"]
+        assert replay_url(VIEW_URL) == VIEW_URL
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
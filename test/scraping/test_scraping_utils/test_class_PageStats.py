@@ -0,0 +1,52 @@
+"""
+测试页面流量统计与精简浏览器选项
+位于 /scraping/scraping_utils.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+from scraping import scraping_utils
+from scraping.scraping_utils import PageStats, lean_options, record_page_metrics
+
+
+class FakeDriver:
+    def __init__(self, profile, metrics):
+        self.profile = profile
+        self.metrics = metrics
+
+    def execute_script(self, script):
+        return self.metrics
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = PageStats()
+    monkeypatch.setattr(scraping_utils, "PAGES", stats)
+    return stats
+
+
+class TestPageStats:
+    def test_mean_by_profile(self, stats):
+        record_page_metrics(FakeDriver("default", [4096, 3.0, 200]), "video")
+        record_page_metrics(FakeDriver("default", [2048, 1.0, 100]), "video")
+        record_page_metrics(FakeDriver("lean", [1024, 0.5, 40]), "video")
+        assert stats.mean("default", "video") == {
+            "pages": 2,
+            "bytes": 3072,
+            "load": 2.0,
+            "resources": 150,
+        }
+        assert stats.mean("lean", "video")["bytes"] == 1024
+        assert stats.mean("lean", "space") is None
+
+    def test_lean_options(self):
+        arguments = lean_options().arguments
+        assert "--headless=new" in arguments
+        assert "--blink-settings=imagesEnabled=false" in arguments
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
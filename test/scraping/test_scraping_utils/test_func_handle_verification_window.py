@@ -0,0 +1,66 @@
+"""
+测试验证窗口检查与统计
+位于 /scraping/scraping_utils.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+from scraping import scraping_utils
+from scraping.scraping_utils import ChallengeStats, handle_verification_window
+
+
+class FakeDriver:
+    """execute_script 依次返回预设的验证窗口次数"""
+
+    current_url = "https://www.bilibili.com/"
+
+    def __init__(self, session_id, results):
+        self.session_id = session_id
+        self.results = list(results)
+        self.scripts = 0
+
+    def execute_script(self, script):
+        self.scripts += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = ChallengeStats()
+    monkeypatch.setattr(scraping_utils, "CHALLENGES", stats)
+    return stats
+
+
+class TestHandleVerificationWindow:
+    def test_single_check_per_page(self, stats):
+        driver = FakeDriver("a", [0, 2, 0])
+        assert [handle_verification_window(driver) for _ in range(3)] == [
+            False,
+            True,
+            False,
+        ]
+        # 每个页面只执行一次脚本，不轮询
+        assert driver.scripts == 3
+        assert stats.pages == {"a": 3}
+        assert stats.challenges == {"a": 2}
+
+    def test_per_driver_counters(self, stats):
+        handle_verification_window(FakeDriver("a", [1]))
+        handle_verification_window(FakeDriver("b", [0]))
+        assert stats.challenges == {"a": 1, "b": 0}
+        assert stats.rate() == 0.5
+
+    def test_script_error(self, stats):
+        driver = FakeDriver("a", [RuntimeError("no such window")])
+        assert handle_verification_window(driver) is False
+        assert stats.pages == {"a": 1}
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,59 @@
+"""
+测试增量获取用户投稿
+位于 /scraping/spaceToBV.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+import pandas as pd
+from scraping import spaceToBV
+
+# 模拟的投稿列表，每页两个视频，从新到旧
+PAGES = {1: ["BV6", "BV5"], 2: ["BV4", "BV3"], 3: ["BV2", "BV1"]}
+
+
+@pytest.fixture
+def visited(monkeypatch):
+    visited = []
+
+    def fake_list_page(driver, space, pn):
+        visited.append(pn)
+        return PAGES.get(pn, []), len(PAGES)
+
+    monkeypatch.setattr(spaceToBV, "list_page", fake_list_page)
+    return visited
+
+
+class TestIncremental:
+    def test_stop_at_known(self, visited):
+        new = spaceToBV.list_space_incremental(None, "space", {"BV4", "BV3"})
+        assert new == ["BV6", "BV5"]
+        assert visited == [1, 2]
+
+    def test_nothing_known(self, visited):
+        new = spaceToBV.list_space_incremental(None, "space", set())
+        assert new == ["BV6", "BV5", "BV4", "BV3", "BV2", "BV1"]
+        assert visited == [1, 2, 3]
+
+    def test_refresh_space_bv(self, monkeypatch, tmp_path):
+        path = tmp_path / "space_bv.csv"
+        pd.DataFrame({"1": ["BV2", "BV1"], "2": ["BVb", None]}).to_csv(path)
+
+        def fake_space_to_bv(spaces, known, max_workers, controller=None):
+            assert known == {"1": {"BV2", "BV1"}, "2": {"BVb"}}
+            return pd.DataFrame({"1": ["BV4", "BV3"], "2": [None, None]})
+
+        monkeypatch.setattr(spaceToBV, "space_to_bv", fake_space_to_bv)
+        new = spaceToBV.refresh_space_bv(pd.Series(["s/1", "s/2"]), path)
+
+        assert list(new["1"]) == ["BV4", "BV3"]
+        merged = pd.read_csv(path, index_col=0)
+        assert list(merged["1"]) == ["BV4", "BV3", "BV2", "BV1"]
+        assert list(merged["2"].dropna()) == ["BVb"]
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
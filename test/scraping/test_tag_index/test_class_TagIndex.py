@@ -0,0 +1,107 @@
+"""
+测试 TagIndex 类与 parse_tag_lists 函数
+位于 /scraping/tag_index.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import ast
+import pytest
+import pandas as pd
+from global_utils import ROOT_PATH
+from scraping.tag_index import TagIndex, parse_tag_lists
+
+TEST_CSV_PATH = os.path.join(ROOT_PATH, "test", "test_data.csv")
+
+
+@pytest.fixture
+def detail():
+    return pd.read_csv(TEST_CSV_PATH, dtype=str)
+
+
+@pytest.fixture
+def tags(detail):
+    return TagIndex.from_detail(detail)
+
+
+class TestParseTagLists:
+    def test_same_as_literal_eval(self, detail):
+        expected = [
+            ast.literal_eval(x) if pd.notnull(x) else [] for x in detail["tags"]
+        ]
+        assert parse_tag_lists(detail["tags"]) == expected
+
+    def test_special_values(self):
+        values = pd.Series(["['生活']", "[]", None, "[\"it's\", 'a, b']", "['生活']"])
+        assert parse_tag_lists(values) == [["生活"], [], [], ["it's", "a, b"], ["生活"]]
+
+
+class TestTagIndex:
+    def test_videos(self, tags, detail):
+        uid = detail["uid"].iloc[0]
+        expected = detail[
+            detail["tags"].str.contains("'日常'", regex=False) & (detail["uid"] == uid)
+        ]["bv"]
+        assert sorted(tags.videos("日常", uid)) == sorted(expected)
+        assert tags.videos("不存在的标签") == []
+
+    def test_dictionary_encoded(self, tags):
+        # 每个标签只在字典中保存一次，视频标签表只保存编号
+        assert tags.dictionary.is_unique
+        assert str(tags.bv_tags["tag_id"].dtype) == "int32"
+        assert tags.counts().sum() == len(
+            tags.bv_tags.drop_duplicates(["bv", "tag_id"])
+        )
+
+    def test_to_lists(self, tags, detail):
+        # 顺序和重复的标签都与原列表相同
+        expected = [
+            ast.literal_eval(x) if pd.notnull(x) else [] for x in detail["tags"]
+        ]
+        assert tags.to_lists(detail["bv"]) == expected
+        assert tags.tags_of(detail["bv"].iloc[0]) == expected[0]
+
+    def test_round_trip(self, tmp_path):
+        detail = pd.DataFrame(
+            {
+                "bv": ["BV1", "BV2", "BV3"],
+                "uid": "1",
+                "tags": [["日常", "生活", "日常"], ["vlog", "生活"], []],
+            }
+        )
+        tags = TagIndex.from_detail(detail)
+        tags.save(tmp_path / "tags")
+        loaded = TagIndex.load(tmp_path / "tags")
+        assert loaded.to_lists(detail["bv"]) == detail["tags"].tolist()
+        assert loaded.videos("日常") == ["BV1"]
+        assert loaded.counts()["生活"] == 2
+
+    def test_append(self, tmp_path):
+        path = tmp_path / "tags"
+        first = pd.DataFrame(
+            {"bv": ["BV1", "BV2"], "uid": "1", "tags": [["生活"], ["日常", "生活"]]}
+        )
+        second = pd.DataFrame({"bv": ["BV1"], "uid": "1", "tags": [["vlog"]]})
+        assert TagIndex.append(first, path) == 3
+        TagIndex.append(second, path)
+        loaded = TagIndex.load(path)
+        # 已有标签的编号不变，同一个视频以最后写入的一批为准
+        assert loaded.dictionary.tolist() == ["日常", "生活", "vlog"]
+        assert loaded.to_lists(pd.Series(["BV1", "BV2"])) == [
+            ["vlog"],
+            ["日常", "生活"],
+        ]
+        assert loaded.videos("生活") == ["BV2"]
+
+    def test_save_and_load(self, tags, tmp_path):
+        tags.save(tmp_path / "tags")
+        loaded = TagIndex.load(tmp_path / "tags")
+        assert loaded.dictionary.equals(tags.dictionary)
+        pd.testing.assert_frame_equal(loaded.bv_tags, tags.bv_tags)
+        assert loaded.videos("生活") == tags.videos("生活")
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
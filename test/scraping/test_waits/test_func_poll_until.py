@@ -0,0 +1,62 @@
+"""
+测试自适应等待
+位于 /scraping/waits.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.getcwd())
+import pytest
+from scraping import waits
+from scraping.waits import WaitStats, poll_until
+
+
+@pytest.fixture
+def stats():
+    return WaitStats()
+
+
+class TestPollUntil:
+    def test_ready_without_sleep(self, stats):
+        # 第一次轮询即就绪时不休眠
+        assert poll_until(lambda: True, 5, "video", stats)
+        assert stats.percentile("video", 50) < 0.05
+
+    def test_ready_after_polls(self, stats):
+        calls = []
+
+        def predicate():
+            calls.append(1)
+            return len(calls) >= 3
+
+        assert poll_until(predicate, 5, "space", stats)
+        assert len(calls) == 3
+        # 0.05 + 0.075，间隔指数增长
+        assert 0.1 < stats.percentile("space", 50) < 0.5
+
+    def test_timeout(self, stats):
+        assert not poll_until(lambda: False, 0.2, "search", stats)
+        assert stats.timeouts["search"] == 1
+        assert stats.percentile("search", 95) >= 0.2
+
+    def test_hard_ceiling(self, stats, monkeypatch):
+        monkeypatch.setattr(waits, "MAX_WAIT", 0.1)
+        assert not poll_until(lambda: False, 60, "search", stats)
+        assert stats.percentile("search", 50) < 0.5
+
+
+class TestWaitStats:
+    def test_percentiles_and_histogram(self, stats):
+        for elapsed in [0.05] * 90 + [3.0] * 10:
+            stats.record("video", elapsed, True)
+        assert stats.percentile("video", 50) == 0.05
+        assert stats.percentile("video", 95) == 3.0
+        histogram = stats.histogram("video")
+        assert histogram[0.1] == 90
+        assert histogram[4] == 10
+        assert stats.percentile("space", 50) is None
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])